@@ -1,22 +1,25 @@
-import sys, os, threading, time, gc, uuid, shutil, urllib.parse, pathlib, tempfile
+import sys, os, threading, uuid, shutil, urllib.parse, pathlib, tempfile, multiprocessing
 from datetime import datetime, timedelta
 
-import pandas as pd
-import openpyxl
-from openpyxl.utils.dataframe import dataframe_to_rows
+from billing import startup
 
-import pythoncom
-import win32com.client
+# BILLING_IMPORT_PROFILE 가 설정되면 창이 뜰 때까지의 모듈별 import 시간을 기록
+_import_timer = startup.install_from_env()
 
 from PySide6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QFileDialog,
     QMessageBox, QProgressBar, QGridLayout, QHBoxLayout, QDialog
 )
-from PySide6.QtCore import Qt, Signal, QObject
+from PySide6.QtCore import Qt, Signal, QObject, QTimer
 from PySide6.QtGui import QIcon
 
+from billing import trace
+from billing.cancel import Cancelled, discard
+from billing.progress import format_eta
+
+# pandas 와 보고서 모듈은 변환/메일 작업을 처음 시작할 때 import 한다 (창을 먼저 띄우기 위함)
+
 class WorkerSignals(QObject):
-    progress = Signal(int)
     finished = Signal(str)
     error = Signal(str)
 
@@ -28,6 +31,8 @@ class BillingWorker(threading.Thread):
         self.signals = signals
         self.stop_requested = False
         self.cancel_mode = False
+        # 진행률은 UI 가 QTimer 로 일정 간격마다 읽어 간다 (billing.progress.Progress)
+        self.tracker = None
         self.temp_output_file = os.path.join(tempfile.gettempdir(), f"{customer}_temp_result.xlsx")
 
         if os.path.exists(self.temp_output_file):
@@ -36,877 +41,127 @@ class BillingWorker(threading.Thread):
             except Exception as e:
                 print(f"⚠ Fail to remove: {e}")
 
+    def should_stop(self):
+        return self.stop_requested
+
     def finalize(self):
         if self.cancel_mode or self.stop_requested:
-            if os.path.exists(self.temp_output_file):
-                try:
-                    os.remove(self.temp_output_file)
-                except Exception as e:
-                    print(f"⚠️ Fail to remove: {e}")
+            discard(self.temp_output_file)
             self.signals.finished.emit("Canceled")
         else:
             self.signals.finished.emit(self.temp_output_file)
 
+    def load(self, customers=None):
+        from billing import jobs
+
+        # 읽은 바이트 기준 진행률
+        return jobs.load_export(self.file_path, customers, progress=self.tracker.reporter("read", 100),
+                                should_stop=self.should_stop)
+
     def run(self):
-        try:
-            pythoncom.CoInitialize()
-            self.signals.progress.emit(2)
-            df = pd.read_excel(self.file_path) if self.file_path.endswith(".xlsx") else pd.read_csv(self.file_path)
-            self.signals.progress.emit(5)
+        from billing import jobs
+        from billing.profiles import CSP_CUSTOMERS
 
-            total_rows = len(df)
-            for i, row in df.iterrows():
-                if self.stop_requested:
-                    break
-                self.signals.progress.emit(5 + int((i + 1) / total_rows * 45))
+        self.tracker = jobs.report_progress([self.customer], self.file_path)
+        try:
+            with trace.recording(self.customer):
+                df = self.load([self.customer] if self.customer in CSP_CUSTOMERS else None)
+                self.build_report(self.customer, df, self.temp_output_file)
 
-            today = datetime.today()
-            billing_month = today.replace(day=1) - timedelta(days=1)
-            year = billing_month.year
-            month = billing_month.month
-            month_name = f"{year}년 {month}월"
-
-            if self.customer == "CustomerA":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-                
-                df_filtered = df[df["CustomerName"] == "CustomerA"].copy()
-                df_filtered = df_filtered.loc[:, "PartnerId":"BenefitType"]
-                df_filtered["BillingPreTaxTotal"] = df_filtered["BillingPreTaxTotal"] * 1.15
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df_filtered.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    used_range = ws.UsedRange
-                    last_row = used_range.Rows.Count
-                    last_col = used_range.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A3"),
-                        TableName="CustomerA Pivot"
-                    )
-
-                    for field in ["CustomerName", "SubscriptionId", "MeterSubCategory", "MeterName"]:
-                        pivot_table.PivotFields(field).Orientation = 1
-
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("BillingPreTaxTotal"),
-                        "합계 BillingPreTaxTotal",
-                        -4157
-                    )
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    del wb, ws, pivot_ws
-                    pythoncom.CoUninitialize()
-                    gc.collect()
-                
+            if self.customer == "CustomerL":
+                self.signals.finished.emit("CustomerL Completed")
+            else:
                 self.finalize()
-                return
-                    
-            elif self.customer == "CustomerB":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-                
-                df_filtered = df[df["CustomerName"] == "CustomerB"].copy()
-                df_filtered = df_filtered.loc[:, "PartnerId":"BenefitType"]
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df_filtered.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    used_range = ws.UsedRange
-                    last_row = used_range.Rows.Count
-                    last_col = used_range.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A3"),
-                        TableName="CustomerB"
-                    )
-
-                    for field in ["CustomerName", "MeterCategory", "MeterSubCategory", "MeterName"]:
-                        pivot_table.PivotFields(field).Orientation = 1
-
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("BillingPreTaxTotal"),
-                        "합계 BillingPreTaxTotal",
-                        -4157
-                    )
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    del wb, ws, pivot_ws
-                    pythoncom.CoUninitialize()
-                    gc.collect()
 
-                self.finalize()
-                return
-            
-            elif self.customer == "CustomerC":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-                
-                df_filtered = df[df["CustomerName"] == "CustomerC"].copy()
-                df_filtered = df_filtered.loc[:, "PartnerId":"BenefitType"]
-                file_name = f"CustomerC {billing_month.year % 100}년 {billing_month.month:02d}월 Azure 사용량.xlsx"
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df_filtered.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    used_range = ws.UsedRange
-                    last_row = used_range.Rows.Count
-                    last_col = used_range.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A3"),
-                        TableName="CustomerCPivot"
-                    )
-
-                    for field in ["CustomerName", "SubscriptionId", "MeterCategory", "MeterSubCategory", "MeterName"]:
-                        pivot_table.PivotFields(field).Orientation = 1
-
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("BillingPreTaxTotal"),
-                        "합계 BillingPreTaxTotal",
-                        -4157
-                    )
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    del wb, ws, pivot_ws
-                    pythoncom.CoUninitialize()
-                    gc.collect()
+        except Cancelled:
+            self.finalize()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+            self.signals.finished.emit("Canceled. Please choose customer again.")
 
-                self.finalize()
-                return
-            
-            elif self.customer == "CustomerD":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-
-                df_filtered = df[df["CustomerName"] == "CustomerD"].copy()
-                df_filtered = df_filtered.loc[:, "PartnerId":"BenefitType"]
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df_filtered.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    used_range = ws.UsedRange
-                    last_row = used_range.Rows.Count
-                    last_col = used_range.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A3"),
-                        TableName="CustomerD_Pivot"
-                    )
-
-                    # 필터 (EntitlementDescription)
-                    pivot_table.PivotFields("EntitlementDescription").Orientation = 3  # Filter
-
-                    # 행
-                    for field in ["MeterCategory", "MeterName"]:
-                        pivot_table.PivotFields(field).Orientation = 1
-
-                    # 값
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("BillingPreTaxTotal"),
-                        "합계 BillingPreTaxTotal",
-                        -4157
-                    )
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    del wb, ws, pivot_ws
-                    pythoncom.CoUninitialize()
-                    gc.collect()
+    def build_report(self, customer, df, output_file, save_dir=None):
+        from billing import jobs
 
-                self.finalize()
-                return
-            
-            elif self.customer == "CustomerE":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-
-                df_filtered = df[df["CustomerName"] == "CustomerE"].copy()
-                df_filtered = df_filtered.loc[:, "PartnerId":"BenefitType"]
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df_filtered.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    last_row = ws.UsedRange.Rows.Count
-                    last_col = ws.UsedRange.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A1"),
-                        TableName="CustomerEPivot"
-                    )
-
-                    # 필터
-                    pivot_table.PivotFields("CustomerName").Orientation = 3  # Filter
-                    pivot_table.PivotFields("CustomerName").CurrentPage = "CustomerE"
-
-                    # 행
-                    for field in ["MeterCategory", "MeterName"]:
-                        pivot_table.PivotFields(field).Orientation = 1
-
-                    # 값
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("BillingPreTaxTotal"),
-                        "합계 BillingPreTaxTotal",
-                        -4157
-                    )
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    # 피벗 차트 생성
-                    chart = pivot_ws.Shapes.AddChart2(
-                        201,  # Clustered Column = xlColumnClustered
-                        51,    # xlChartInPlace
-                        250, 50, 500, 200  # (left, top, width, height)
-                    ).Chart
-                    chart.SetSourceData(pivot_table.TableRange1)
-                    chart.ChartTitle.Text = "CustomerE"
-                    chart.HasLegend = True
-                    chart.Parent.Top = pivot_ws.Range("D3").Top
-                    chart.Parent.Left = pivot_ws.Range("D3").Left
-                    chart.Axes(2).MinimumScaleIsAuto = True
-                    chart.Axes(2).MaximumScaleIsAuto = True
-                    chart.Axes(2).MajorUnit = 1000
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    pythoncom.CoUninitialize()
-                    gc.collect()
+        if jobs.profile_for(customer).split and save_dir is None:
+            save_dir = QFileDialog.getExistingDirectory(None, "저장 폴더 선택")
+            if not save_dir:
+                raise Exception("저장 폴더가 선택되지 않았습니다.")
+        return jobs.build_report(customer, df, output_file, save_dir=save_dir, should_stop=self.should_stop,
+                                 progress=self.tracker.update)
 
-                self.finalize()
-                return
-            
-            elif self.customer == "CustomerF":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-
-                df_filtered = df.copy()
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df_filtered.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    used_range = ws.UsedRange
-                    last_row = used_range.Rows.Count
-                    last_col = used_range.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A1"),
-                        TableName="CustomerFPivot"
-                    )
-
-                    # 필터
-                    pivot_table.PivotFields("청구계정이름 (BillingAccountName)").Orientation = 3
-                    pivot_table.PivotFields("청구계정이름 (BillingAccountName)").CurrentPage = "CustomerF"
-
-                    # 행
-                    pivot_table.PivotFields("미터범주 (MeterCategory)").Orientation = 1
-
-                    # 값
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("비용 (Cost)"),
-                        "합계 비용 (Cost)",
-                        -4157
-                    )
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    # 차트
-                    chart = pivot_ws.Shapes.AddChart2(
-                        201,  # Clustered Column = xlColumnClustered
-                        51,    # xlChartInPlace
-                        250, 50, 450, 300  # (left, top, width, height)
-                    ).Chart
-                    chart.SetSourceData(pivot_table.TableRange1)
-                    chart.ChartTitle.Text = "CustomerF"
-                    chart.HasLegend = True
-                    chart.Parent.Top = pivot_ws.Range("D3").Top
-                    chart.Parent.Left = pivot_ws.Range("D3").Left
-                    chart.Axes(2).MinimumScaleIsAuto = True
-                    chart.Axes(2).MaximumScaleIsAuto = True
-                    chart.Axes(2).MajorUnit = 100000
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    pythoncom.CoUninitialize()
-                    gc.collect()
+    def stop(self):
+        self.stop_requested = True
+        self.cancel_mode = True
 
-                self.finalize()
-                return
+class BillingBatchWorker(BillingWorker):
+    """Bill every CSP customer from one parse of the partner export."""
 
-            elif self.customer == "CustomerG":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    used_range = ws.UsedRange
-                    last_row = used_range.Rows.Count
-                    last_col = used_range.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A1"),
-                        TableName="CustomerGPivot"
-                    )
-
-                    # 필터
-                    pivot_table.PivotFields("구독이름 (SubscriptionName)").Orientation = 3
-                    pivot_table.PivotFields("구독이름 (SubscriptionName)").CurrentPage = "CustomerG"
-
-                    pivot_table.PivotFields("청구프로필이름 (BillingProfileName)").Orientation = 3
-                    pivot_table.PivotFields("청구프로필이름 (BillingProfileName)").CurrentPage = "CustomerG"
-
-                    pivot_table.PivotFields("청구프로필Id (BillingProfileId)").Orientation = 3
-                    pivot_table.PivotFields("청구프로필Id (BillingProfileId)").CurrentPage = 58075352
-
-                    # 열
-                    pivot_table.PivotFields("날짜 (Date)").Orientation = 2  # Column
-
-                    # 행
-                    pivot_table.PivotFields("제품 (Product)").Orientation = 1
-                    pivot_table.PivotFields("수량 (Quantity)").Orientation = 1
-
-                    # 값
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("비용 (Cost)"),
-                        "합계 비용 (Cost)",
-                        -4157
-                    )
-
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    pythoncom.CoUninitialize()
-                    gc.collect()
+    def __init__(self, customers, file_path, save_dir, signals):
+        super().__init__("Batch", file_path, signals)
+        self.customers = customers
+        self.save_dir = save_dir
+        self.results = {}
 
-                self.finalize()
-                return
-            
-            elif self.customer == "CustomerH":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-
-                df_filtered = df[df["계정소유자Id (AccountOwnerId)"] == "CustomerH"].copy()
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df_filtered.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    used_range = ws.UsedRange
-                    last_row = used_range.Rows.Count
-                    last_col = used_range.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A1"),
-                        TableName="CustomerHPivot"
-                    )
-
-                    # 필터
-                    pivot_table.PivotFields("구독이름 (SubscriptionName)").Orientation = 3
-                    pivot_table.PivotFields("구독이름 (SubscriptionName)").CurrentPage = "CustomerH"
-
-                    # 행
-                    pivot_table.PivotFields("미터범주 (MeterCategory)").Orientation = 1
-                    pivot_table.PivotFields("요금제이름 (MeterName)").Orientation = 1
-
-                    # 값
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("비용 (Cost)"),
-                        "합계 비용 (Cost)",
-                        -4157
-                    )
-
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    pythoncom.CoUninitialize()
-                    gc.collect()
+    def run(self):
+        from billing import jobs
 
-                self.finalize()
-                return
+        self.tracker = jobs.report_progress(self.customers, self.file_path)
+        try:
+            def on_report(customer, path):
+                self.results[customer] = path
+
+            with trace.recording("Batch"):
+                df = self.load(self.customers)
+                self.results = jobs.convert_all(
+                    df, self.customers, self.save_dir,
+                    should_stop=self.should_stop, on_report=on_report, progress=self.tracker.update,
+                )
+            done = sum(1 for v in self.results.values() if v)
+            self.signals.finished.emit(f"Batch Completed: {done}/{len(self.customers)}")
 
-            elif self.customer == "CustomerI":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    used_range = ws.UsedRange
-                    last_row = used_range.Rows.Count
-                    last_col = used_range.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A3"),
-                        TableName="CustomerIPivot"
-                    )
-
-                    # 행 필드
-                    for field in [
-                        "청구계정이름 (BillingAccountName)",
-                        "구독이름 (SubscriptionName)",
-                        "미터범주 (MeterCategory)",
-                        "미터하위범주 (MeterSubCategory)",
-                        "요금제이름 (MeterName)"
-                    ]:
-                        pivot_table.PivotFields(field).Orientation = 1
-
-                    # 값
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("비용 (Cost)"),
-                        "합계 비용 (Cost)",
-                        -4157
-                    )
-
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    pythoncom.CoUninitialize()
-                    gc.collect()
+        except Cancelled:
+            self.finalize()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+            self.signals.finished.emit("Canceled. Please choose customer again.")
 
-                self.finalize()
-                return
+class CspReportWorker(BillingWorker):
+    """Read the CustomerK CSP source files in parallel and write the merged report."""
 
-            elif self.customer == "CustomerJ":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-
-                df_marked = df.copy()
-                for col in ["유효가격 (EffectivePrice)", "비용 (Cost)", "단가 (UnitPrice)"]:
-                    if col in df_marked.columns:
-                        df_marked[col] = df_marked[col].apply(
-                            lambda x: x * 1.07 if isinstance(x, (int, float)) else x
-                        )
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df_marked.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    used_range = ws.UsedRange
-                    last_row = used_range.Rows.Count
-                    last_col = used_range.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A3"),
-                        TableName="CustomerJPivot"
-                    )
-
-                    for field in [
-                        "청구계정이름 (BillingAccountName)",
-                        "구독이름 (SubscriptionName)",
-                        "미터범주 (MeterCategory)",
-                        "미터하위범주 (MeterSubCategory)",
-                        "요금제이름 (MeterName)"
-                    ]:
-                        pivot_table.PivotFields(field).Orientation = 1
-
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("비용 (Cost)"),
-                        "합계 비용 (Cost)",
-                        -4157
-                    )
-
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    pythoncom.CoUninitialize()
-                    gc.collect()
+    # 원본 읽기가 대부분의 시간, 나머지는 보고서 작성
+    STAGES = {"read": 70, "write": 30}
 
-                self.finalize()
-                return
-            
-            elif self.customer == "CustomerK":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-
-                sheet_name = f"{month_name} Azure 사용량"
-                df.to_excel(self.temp_output_file, index=False, sheet_name=sheet_name)
-
-                excel = win32com.client.Dispatch("Excel.Application")
-                excel.Visible = False
-                wb = excel.Workbooks.Open(self.temp_output_file)
-
-                try:
-                    ws = wb.Sheets(sheet_name)
-                    used_range = ws.UsedRange
-                    last_row = used_range.Rows.Count
-                    last_col = used_range.Columns.Count
-
-                    header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                    header_range.Borders.LineStyle = -4142
-                    header_range.Font.Bold = False
-
-                    pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                    pivot_ws.Name = f"{month_name} Pivot"
-
-                    pivot_cache = wb.PivotCaches().Create(
-                        SourceType=1,
-                        SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                    )
-                    pivot_table = pivot_cache.CreatePivotTable(
-                        TableDestination=pivot_ws.Range("A3"),
-                        TableName="CustomerKPivot"
-                    )
-
-                    # 행 필드
-                    for field in [
-                        "청구계정이름 (BillingAccountName)",
-                        "구독이름 (SubscriptionName)",
-                        "미터범주 (MeterCategory)",
-                        "미터하위범주 (MeterSubCategory)",
-                        "요금제이름 (MeterName)"
-                    ]:
-                        pivot_table.PivotFields(field).Orientation = 1
-
-                    # 값 필드
-                    pivot_table.AddDataField(
-                        pivot_table.PivotFields("비용 (Cost)"),
-                        "합계 비용 (Cost)",
-                        -4157  # xlSum
-                    )
-
-                    # 스타일
-                    pivot_table.TableStyle2 = "PivotStyleLight20"
-
-                    # 값 포맷 (₩)
-                    for col in pivot_table.DataBodyRange.Columns:
-                        col.NumberFormat = "₩#,##0"
-
-                    wb.Save()
-                finally:
-                    wb.Close(SaveChanges=True)
-                    excel.Quit()
-                    pythoncom.CoUninitialize()
-                    gc.collect()
+    def __init__(self, paths, bill_month, signals):
+        super().__init__("CustomerK_CSP", None, signals)
+        self.paths = paths
+        self.bill_month = bill_month
 
-                self.finalize()
-                return
+    def run(self):
+        from billing.cache import default_cache
+        from billing.customerk import read_sources, write_csp_report
+        from billing.progress import Progress
 
-            elif self.customer == "CustomerL":
-                if self.stop_requested:
-                    self.finalize()
-                    return
-                
-                df_filtered = df[df["CustomerName"] == "CustomerL"].copy()
-                df_filtered = df_filtered.loc[:, "PartnerId":"BenefitType"]
-
-                insert_index = df_filtered.columns.get_loc("BillingPreTaxTotal")
-                df_filtered.insert(insert_index, "BillingTotal", df_filtered["BillingPreTaxTotal"] * 1.1)
-                df_filtered.loc[0, "BillingTotal"] = "BillingTotal"  # 첫 행은 문자열로 고정
-
-                df_filtered["ResourceGroup"] = df_filtered["ResourceGroup"].str.lower()
-
-                merge_temp_path = os.path.join(tempfile.gettempdir(), f"MergeCustomerL_{month}.xlsx")
-                df_filtered.to_excel(merge_temp_path, index=False)
-
-                groups = {
-                    "CustomerL": "CustomerL {month}월 비용보고서(CustomerL).xlsx",
-                    "CustomerL-1": "CustomerL {month}월 비용보고서(CustomerL).xlsx",
-                    "CustomerL-2": "CustomerL {month}월 비용보고서(CustomerL).xlsx"
-                }
-
-                save_dir = QFileDialog.getExistingDirectory(None, "저장 폴더 선택")
-                if not save_dir:
-                    raise Exception("저장 폴더가 선택되지 않았습니다.")
-
-                for rg, file_pattern in groups.items():
-                    sub_df = df_filtered[df_filtered["ResourceGroup"] == rg]
-                    if sub_df.empty:
-                        continue
-
-                    if rg == "CustomerL-2" and sub_df["PricingPreTaxTotal"].sum() <= 0:
-                        continue
-
-                    file_name = file_pattern.format(month=month)
-                    save_path = os.path.join(save_dir, file_name)
-                    sub_df.to_excel(save_path, index=False, sheet_name=f"{month_name} Azure 사용량")
-
-                    excel = win32com.client.Dispatch("Excel.Application")
-                    excel.Visible = False
-                    wb = excel.Workbooks.Open(save_path)
-
-                    try:
-                        ws = wb.Sheets(f"{month_name} Azure 사용량")
-                        last_row = ws.UsedRange.Rows.Count
-                        last_col = ws.UsedRange.Columns.Count
-
-                        header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                        header_range.Borders.LineStyle = -4142
-                        header_range.Font.Bold = False
-
-                        pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                        pivot_ws.Name = f"{month_name} Pivot"
-
-                        pivot_cache = wb.PivotCaches().Create(
-                            SourceType=1,
-                            SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                        )
-                        pivot_table = pivot_cache.CreatePivotTable(
-                            TableDestination=pivot_ws.Range("A3"),
-                            TableName=f"{rg}_Pivot"
-                        )
-
-                        for field in ["CustomerName", "ResourceGroup", "MeterCategory", "MeterSubCategory", "MeterName"]:
-                            pivot_table.PivotFields(field).Orientation = 1
-
-                        pivot_table.AddDataField(
-                            pivot_table.PivotFields("BillingTotal"),
-                            "합계 BillingTotal",
-                            -4157
-                        )
-                        pivot_table.TableStyle2 = "PivotStyleLight20"
-
-                        for col in pivot_table.DataBodyRange.Columns:
-                            col.NumberFormat = "₩#,##0"
-
-                        wb.Save()
-                    finally:
-                        wb.Close(SaveChanges=True)
-                        excel.Quit()
-                        pythoncom.CoUninitialize()
-                        gc.collect()
-
-                if os.path.exists(merge_temp_path):
-                    os.remove(merge_temp_path)
+        self.tracker = Progress(self.STAGES)
+        read_pct = dict.fromkeys(self.paths, 0)
 
-                self.signals.finished.emit("CustomerL Completed")
-                return
+        def on_read(path, pct):
+            # 파일마다 받은 진행률의 평균
+            read_pct[path] = pct
+            self.tracker.update("read", sum(read_pct.values()) / (100 * len(self.paths)))
 
+        try:
+            with trace.recording("CustomerK CSP"):
+                frames = read_sources(self.paths, cache=default_cache, sheet_name="Data",
+                                      should_stop=self.should_stop, progress=on_read)
+                self.tracker.update("write", 0)
+                write_csp_report(self.temp_output_file, frames, self.bill_month, should_stop=self.should_stop)
+            self.finalize()
+
+        except Cancelled:
+            self.finalize()
         except Exception as e:
+            discard(self.temp_output_file)
             self.signals.error.emit(str(e))
-            self.signals.finished.emit("Canceled. Please choose customer again.")
-
-    def stop(self):
-        self.stop_requested = True
-        self.cancel_mode = True
 
 class BillingMasterApp(QWidget):
     def __init__(self):
@@ -930,6 +185,16 @@ class BillingMasterApp(QWidget):
         outlook_btn.clicked.connect(self.show_outlook_client_selector)
         self.layout.addWidget(outlook_btn)
 
+        mail_all_btn = QPushButton("Draft All Emails")
+        mail_all_btn.setFixedHeight(30)
+        mail_all_btn.clicked.connect(self.send_all_emails)
+        self.layout.addWidget(mail_all_btn)
+
+        batch_btn = QPushButton("Convert All CSP Customers")
+        batch_btn.setFixedHeight(30)
+        batch_btn.clicked.connect(self.start_batch_conversion)
+        self.layout.addWidget(batch_btn)
+
         self.customers = ["CustomerA", "CustomerB", "CustomerC", "CustomerD", "CustomerE", "CustomerF", "CustomerG", "CustomerH", "CustomerI", "CustomerJ", "CustomerK", "CustomerL", "CustomerM", "CustomerN"]
         grid_layout = QGridLayout()
         grid_layout.setHorizontalSpacing(20)
@@ -964,6 +229,11 @@ class BillingMasterApp(QWidget):
         self.progress_bar.setValue(0)
         self.progress_bar.setVisible(False)
 
+        # 작업 스레드의 진행률을 초당 5번만 읽어 화면에 반영
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(200)
+        self.progress_timer.timeout.connect(self.refresh_progress)
+
         status_layout = QVBoxLayout()
         status_layout.setContentsMargins(0, 0, 0, 0)
         status_layout.setSpacing(3)
@@ -1001,465 +271,41 @@ class BillingMasterApp(QWidget):
         dialog.exec()
 
     def send_outlook_email(self, customer):
-        today = datetime.today()
-        billing_month = today.replace(day=1) - timedelta(days=1)
-        send_year = billing_month.year
-        send_month = billing_month.month
-
-        if customer == "CustomerA":
-            filename = f"CustomerA {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            file_path, _ = QFileDialog.getOpenFileName(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not file_path:
-                return
-
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerA] {send_year % 100}년 {send_month:02d}월 Azure 사용량 송부 건"
-
-                mail.Attachments.Add(file_path)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    Mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
-
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
-
-        elif customer == "CustomerB":
-            filename = f"CustomerB {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
-
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerB] {send_month:02d}월 비용보고서&점검 보고서 전달드립니다"
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
-
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
-
-        elif customer == "CustomerC/D":
-            filename = f"CustomerC/D {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
-
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerC/D] {send_year % 100}.{send_month:02d}월 빌링 안내"
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
-
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
-
-        elif customer == "CustomerE":
-            filename = f"CustomerE {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
+        from billing.mail import MAIL_TEMPLATES, OutlookDraftSink, send_batch, template_fields
 
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerE] {send_year % 100}년 {send_month:02d}월 사용량 보고서"
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
-
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
-
-        elif customer == "CustomerF":
-            filename = f"CustomerF {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
-
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerF] {send_year % 100}년 {send_month:02d}월 Azure 사용량 송부의 건"
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
-
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
-
-        elif customer == "CustomerG":
-            filename = f"CustomerG {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
-
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerG] Azure {send_year % 100}년 {send_month:02d}월 사용량 파일 전달"
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
-
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
-
-        elif customer == "CustomerH":
-            filename = f"CustomerH {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
-
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerH] Azure {send_year % 100}년 {send_month:02d}월 한달 사용비용"
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
-
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
-
-        elif customer == "CustomerI":
-            filename = f"CustomerI {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
-
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerI] {send_year % 100}.{send_month:02d} Microsoft Azure 사용량"
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
-
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
-
-        elif customer == "CustomerJ":
-            filename = f"CustomerJ {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
-
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[Azure 청구 금액] CustomerJ {send_year % 100}년 {send_month:02d}월"
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
-
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
-
-        elif customer == "CustomerK":
-            filename = f"CustomerK {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
-
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerK] {send_year % 100}년 {send_month:02d}월 사용 비용"
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
-
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
-
-        elif customer == "CustomerL":
-            filename = f"CustomerL {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
-
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerL] {send_month:02d}월 비용보고서 전달드립니다."
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
+        template = MAIL_TEMPLATES.get(customer)
+        if template is None:
+            return
+        billing_month = datetime.today().replace(day=1) - timedelta(days=1)
+        filename = template.attachment.format(**template_fields(customer, billing_month))
+        files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
+        if not files:
+            return
 
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
+        try:
+            send_batch([customer], billing_month, {customer: files}, OutlookDraftSink(display=True))
+        except Exception as e:
+            QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
 
-        elif customer == "CustomerM":
-            filename = f"CustomerM {send_year}년 {send_month:02d}월 Azure 사용량.xlsx"
-            files, _ = QFileDialog.getOpenFileNames(self, "첨부할 파일을 선택하세요", filename, "Excel Files (*.xlsx)")
-            if not files:
-                return
+    def send_all_emails(self):
+        from billing.mail import MAIL_TEMPLATES, OutlookDraftSink, attachment_index, resolve_attachments, send_batch
 
-            try:
-                outlook = win32com.client.Dispatch("Outlook.Application")
-                mail = outlook.CreateItem(0)
-                mail.To = "abcd@abcd.com"
-                mail.CC = "abcd@abcd.com"
-                mail.Subject = f"[CustomerM] {send_month:02d}월 비용보고서 전달드립니다."
-
-                for f in files:
-                    mail.Attachments.Add(f)
-                mail.Display(False)
-
-                for _ in range(50):
-                    pythoncom.PumpWaitingMessages()   # GUI 메세지 처리
-                    if mail.HTMLBody and "</html>" in mail.HTMLBody.lower():
-                        break
-                    time.sleep(0.1)
-
-                signature = mail.HTMLBody
-                
-                custom_body = f"""
-                <div style="font-family:'맑은 고딕'; font-size:10pt;">
-                    mail content
-                </div>
-                """
-
-                mail.HTMLBody = custom_body + signature
-
-                mail.Display(True)
+        folder = QFileDialog.getExistingDirectory(self, "보고서 폴더 선택")
+        if not folder:
+            return
+        billing_month = datetime.today().replace(day=1) - timedelta(days=1)
+        attachments = resolve_attachments(attachment_index(folder), billing_month)
 
-            except Exception as e:
-                QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
+        try:
+            results = send_batch(list(MAIL_TEMPLATES), billing_month, attachments, OutlookDraftSink())
+        except Exception as e:
+            QMessageBox.critical(self, "오류", f"Outlook 실행 실패: {str(e)}")
+            return
+        missing = [c for c in MAIL_TEMPLATES if c not in results]
+        message = f"{len(results)}건의 메일을 임시 보관함에 저장했습니다."
+        if missing:
+            message += f"\n첨부 파일 없음: {', '.join(missing)}"
+        QMessageBox.information(self, "완료", message)
 
     def open_file_dialog(self, customer):
         self.customer = customer
@@ -1512,18 +358,19 @@ class BillingMasterApp(QWidget):
             self.file_path = file_path
             self.start_conversion()
 
+    @trace.traced("CustomerK PEC")
     def CustomerK(self, file_path):
+        from billing.cache import default_cache
+        from billing.customerk import pec_file_name, pec_rows, write_pec_report
+        from billing.readers import read_export
+
         try:
             self.status_label.setText("PEC 변환 중입니다...")
             self.progress_bar.setVisible(True)
             self.progress_bar.setValue(5)
             self.cancel_button.setVisible(True)
 
-            df = pd.read_excel(file_path) if file_path.endswith(".xlsx") else pd.read_csv(file_path)
-            df_filtered = df[df["CustomerName"] == "CustomerB"].copy()
-            if df_filtered.empty:
-                raise Exception("CustomerB 데이터가 없습니다.")
-
+            df_filtered = pec_rows(read_export(file_path, cache=default_cache))
             self.progress_bar.setValue(10)
 
             today = datetime.today()
@@ -1535,57 +382,9 @@ class BillingMasterApp(QWidget):
 
             temp_file = os.path.join(tempfile.gettempdir(), f"cw_pec_{year_month}.xlsx")
             self.temp_output_file = temp_file
-            df_filtered.to_excel(temp_file, index=False, sheet_name="Data")
-
-            pythoncom.CoInitialize()
-            excel = win32com.client.Dispatch("Excel.Application")
-            excel.Visible = False
-            wb = excel.Workbooks.Open(temp_file)
+            write_pec_report(temp_file, df_filtered)
 
-            try:
-                ws = wb.Sheets("Data")
-                last_row = ws.UsedRange.Rows.Count
-                last_col = ws.UsedRange.Columns.Count
-
-                header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                header_range.Borders.LineStyle = -4142
-                header_range.Font.Bold = False
-
-                pivot_ws = wb.Sheets.Add(After=ws)
-                pivot_ws.Name = "Summary"
-
-                pivot_cache = wb.PivotCaches().Create(
-                    SourceType=1,
-                    SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                )
-                pivot_table = pivot_cache.CreatePivotTable(
-                    TableDestination=pivot_ws.Range("A3"),
-                    TableName="CW_PEC_Pivot"
-                )
-
-                pivot_table.PivotFields("EntitlementDescription").Orientation = 3  # Filter
-                pivot_table.PivotFields("EntitlementDescription").CurrentPage = "CustomerB"
-
-                for field in ["MeterCategory", "MeterName"]:
-                    pivot_table.PivotFields(field).Orientation = 1
-
-                pivot_table.AddDataField(
-                    pivot_table.PivotFields("BillingPreTaxTotal"),
-                    "합계 BillingPreTaxTotal",
-                    -4157
-                )
-                pivot_table.TableStyle2 = "PivotStyleLight20"
-                for col in pivot_table.DataBodyRange.Columns:
-                    col.NumberFormat = "₩#,##0"
-
-                wb.Save()
-            finally:
-                wb.Close(SaveChanges=True)
-                excel.Quit()
-                pythoncom.CoUninitialize()
-                gc.collect()
-
-            save_path = os.path.join(self.cw_save_dir, f"{year_month}_CustomerB.xlsx")
+            save_path = os.path.join(self.cw_save_dir, pec_file_name(billing_month))
             os.replace(temp_file, save_path)
             self.status_label.setText("PEC 저장 완료. CostManagement 파일 업로드 하세요.")
 
@@ -1605,7 +404,12 @@ class BillingMasterApp(QWidget):
             self.cancel_button.setVisible(False)
             self.notice_label.setText("")
 
+    @trace.traced("CustomerK Cost")
     def CustomerK(self):
+        from billing.cache import default_cache
+        from billing.customerk import write_cost_report
+        from billing.readers import read_export
+
         try:
             self.status_label.setText("CostManagement 변환 중입니다...")
             self.progress_bar.setVisible(True)
@@ -1616,57 +420,12 @@ class BillingMasterApp(QWidget):
             if not file_path:
                 raise Exception("파일이 선택되지 않았습니다.")
 
-            df = pd.read_excel(file_path, sheet_name="Data") if file_path.endswith(".xlsx") else pd.read_csv(file_path)
+            df = read_export(file_path, cache=default_cache, sheet_name="Data") if file_path.endswith(".xlsx") else read_export(file_path, cache=default_cache)
             self.progress_bar.setValue(10)
 
             temp_file = os.path.join(tempfile.gettempdir(), f"cw_cost_temp_{uuid.uuid4().hex}.xlsx")
             self.temp_output_file = temp_file
-            df.to_excel(temp_file, index=False, sheet_name="Data")
-
-            pythoncom.CoInitialize()
-            excel = win32com.client.Dispatch("Excel.Application")
-            excel.Visible = False
-            wb = excel.Workbooks.Open(temp_file)
-
-            try:
-                ws = wb.Sheets("Data")
-                last_row = ws.UsedRange.Rows.Count
-                last_col = ws.UsedRange.Columns.Count
-
-                header_range = ws.Range(ws.Cells(1, 1), ws.Cells(1, last_col))
-                header_range.Borders.LineStyle = -4142
-                header_range.Font.Bold = False
-
-                pivot_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                pivot_ws.Name = "Billing"
-
-                pivot_cache = wb.PivotCaches().Create(
-                    SourceType=1,
-                    SourceData=ws.Range(ws.Cells(1, 1), ws.Cells(last_row, last_col))
-                )
-                pivot_table = pivot_cache.CreatePivotTable(
-                    TableDestination=pivot_ws.Range("A3"),
-                    TableName="CW_Cost_Pivot"
-                )
-
-                for field in ["ServiceName", "Meter"]:
-                    pivot_table.PivotFields(field).Orientation = 1
-
-                pivot_table.AddDataField(
-                    pivot_table.PivotFields("Cost"),
-                    "합계 Cost",
-                    -4157
-                )
-                pivot_table.TableStyle2 = "PivotStyleLight20"
-                for col in pivot_table.DataBodyRange.Columns:
-                    col.NumberFormat = "₩#,##0"
-
-                wb.Save()
-            finally:
-                wb.Close(SaveChanges=True)
-                excel.Quit()
-                pythoncom.CoUninitialize()
-                gc.collect()
+            write_cost_report(temp_file, df)
 
             save_path = os.path.join(self.cw_save_dir, os.path.basename(file_path))
             os.replace(temp_file, save_path)
@@ -1685,7 +444,11 @@ class BillingMasterApp(QWidget):
             self.cancel_button.setVisible(False)
             self.notice_label.setText("")
 
+    @trace.traced("CustomerK EA")
     def CustomerK(self):
+        from billing.cache import default_cache
+        from billing.customerk import ea_file_name, ea_rows, read_source, write_ea_report
+
         try:
             src, _ = QFileDialog.getOpenFileName(
             self,
@@ -1700,145 +463,36 @@ class BillingMasterApp(QWidget):
             self.progress_bar.setValue(15)
             self.status_label.setText("🔍 데이터 로드 중…")
             
-            ext = os.path.splitext(src)[1].lower()
-            if ext in [".xlsx", ".xls"]:
-                df = pd.read_excel(src, engine="openpyxl")
-            else:           # csv
-                try:
-                    df = pd.read_csv(src, encoding="utf-8")
-                except UnicodeDecodeError:
-                    df = pd.read_csv(src, encoding="cp949")
-
-            df = df[df["계정이름 (AccountName)"] == "CustomerK"]
-            df["구독이름 (SubscriptionName)"] = (
-            df["구독이름 (SubscriptionName)"].str.strip().str.lower()
-            )
+            df = ea_rows(read_source(src, cache=default_cache))
             if df.empty:
                 QMessageBox.information(self, "데이터 없음", "EA 대상 계정 데이터가 없습니다.")
                 self.progress_bar.setVisible(False)
                 return
-            
+
             dst_dir = QFileDialog.getExistingDirectory(self, "저장 폴더 선택")
             if not dst_dir:
                 self.progress_bar.setVisible(False)
                 return
 
             bill_month = datetime.today().replace(day=1) - timedelta(days=1)
-            final_path = os.path.join(
-                dst_dir, f"CustomerB {bill_month.year}{bill_month.month:02d} 비용.xlsx")
-            yymm = f"{bill_month.year%100:02d}{bill_month.month:02d}"
-            main_sheet  = f"CustomerB{yymm}_비용데이터"
 
             self.progress_bar.setValue(30)
-            self.status_label.setText("📑 Excel 세션 생성…")
-            
-            pythoncom.CoInitialize()
-            excel = win32com.client.Dispatch("Excel.Application")
-            excel.Visible = False
-            tmp_xlsx = os.path.join(tempfile.gettempdir(),
-                        f"CustomerB{os.getpid()}.xlsx")
-            wb_tmp = openpyxl.Workbook()
-            ws_tmp = wb_tmp.active
-            ws_tmp.title = main_sheet
-            for r in dataframe_to_rows(df, index=False, header=True):
-                ws_tmp.append(r)
-            wb_tmp.save(tmp_xlsx)
-            wb_tmp.close()
-
-            pythoncom.CoInitialize()
-            excel = win32com.client.Dispatch("Excel.Application")
-            excel.Visible = False
-            wb = excel.Workbooks.Open(tmp_xlsx)
-            ws_main = wb.Sheets(main_sheet)
-
-            piv_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-            piv_ws.Name = "CustomerB"
-            piv_ws.Range("A2").Value = "1. CustomerB"
-            a2 = piv_ws.Range("A2")
-            a2.Font.Name, a2.Font.Size, a2.Font.Bold = "맑은 고딕", 14, True
-
-            cache = wb.PivotCaches().Create(SourceType=1, SourceData=ws_main.UsedRange)
-            pvt   = cache.CreatePivotTable(TableDestination=piv_ws.Range("A3"), TableName="EA_Summary")
-            pvt.PivotFields("구독이름 (SubscriptionName)").Orientation = 1
-            pvt.AddDataField(pvt.PivotFields("비용 (Cost)"), "합계 Cost", -4157)
-            pvt.TableStyle2 = "PivotStyleLight20"
-            for col in pvt.DataBodyRange.Columns:
-                col.NumberFormat = "₩#,##0"
-
-            sub_col = ws_main.Range("1:1").Find("구독이름 (SubscriptionName)").Column
-            def split_and_pivot(sub, cell):
-                sub_df = df[df["구독이름 (SubscriptionName)"]
-                  .str.strip().str.lower().eq(sub)]
-                if sub_df.empty:
-                    return False
-                
-                new_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count))
-                new_ws.Name = sub
-                for r_idx, r in enumerate(dataframe_to_rows(sub_df, index=False,
-                                                header=True), start=1):
-                    for c_idx, v in enumerate(r, start=1):
-                        new_ws.Cells(r_idx, c_idx).Value = v
-
-                cache = wb.PivotCaches().Create(SourceType=1,
-                                    SourceData=new_ws.UsedRange)
-                pv = cache.CreatePivotTable(TableDestination=piv_ws.Range(cell),
-                                TableName=f"{sub}_Pivot")
-                pv.PivotFields("리소스그룹 (ResourceGroup)").Orientation = 1
-                pv.AddDataField(pv.PivotFields("비용 (Cost)"), "합계 Cost", -4157)
-                pv.TableStyle2 = "PivotStyleLight20"
-                for col in pv.DataBodyRange.Columns:
-                    col.NumberFormat = "₩#,##0"
-                return True
-
-            for sub, where in [
-                    ("CustomerB", "A15"),
-                    ("CustomerB-1", "E15"),
-                    ("CustomerB-2", "I15")]:
-                split_and_pivot(sub, where)
-
-            piv_ws.Range("A14").Value = "2. CustomerB"
-            order = [
-                "CustomerB",                 # 요약 시트
-                main_sheet,                   
-                "CustomerB",
-                "CustomerB-1",
-                "CustomerB-2",
-            ]
-            last_pos = 1
-            for name in order[::-1]:          # 뒤에서부터 앞으로 이동하면 index 어긋남 없음
-                try:
-                    wb.Worksheets(name).Move(Before=wb.Worksheets(1))
-                except Exception:
-                    pass 
-            a14 = piv_ws.Range("A14")
-            a14.Font.Name, a14.Font.Size, a14.Font.Bold = "맑은 고딕", 14, True
-
-            self.progress_bar.setValue(90)
-            self.status_label.setText("💾 최종 저장 중…")
-
-            if os.path.exists(final_path):
-                os.remove(final_path)
+            self.status_label.setText("💾 통합 문서 작성 중…")
 
+            dst_dir = urllib.parse.unquote(dst_dir)
+            final_path = pathlib.Path(dst_dir) / ea_file_name(bill_month)
             tmp_save = os.path.join(tempfile.gettempdir(),
                                     f"CustomerK_{uuid.uuid4().hex}.xlsx")
-            wb.SaveAs(tmp_save)
-            wb.Close(SaveChanges=False)
-            excel.Quit()
-            pythoncom.CoUninitialize()
-
-            self.progress_bar.setValue(95)
-            self.status_label.setText("🗜️  파일 이동 중…")
-            dst_dir   = urllib.parse.unquote(dst_dir)
-            final_path = pathlib.Path(dst_dir) / \
-                         f"CustomerB{bill_month:%Y%m}비용.xlsx"
-            if final_path.exists():
-                final_path.unlink()
-
-            shutil.move(tmp_save, final_path)
-            if os.path.exists(tmp_save):
-                os.remove(tmp_save)
-            if os.path.exists(tmp_xlsx):
-                os.remove(tmp_xlsx)
+            try:
+                write_ea_report(tmp_save, df, bill_month)
+                self.progress_bar.setValue(95)
+                self.status_label.setText("🗜️  파일 이동 중…")
+                if final_path.exists():
+                    final_path.unlink()
+                shutil.move(tmp_save, final_path)
+            finally:
+                if os.path.exists(tmp_save):
+                    os.remove(tmp_save)
 
             self.progress_bar.setValue(100)
             self.status_label.setText("✅ 완료!")
@@ -1851,152 +505,115 @@ class BillingMasterApp(QWidget):
             self.progress_bar.setVisible(False)
 
     def CustomerK(self):
-        try:
-            paths, _ = QFileDialog.getOpenFileNames(
-                self, "CSP Billing 원본 파일(들) 선택", "",
-                "Excel / CSV Files (*.xlsx *.xls *.csv);;All Files (*)")
-            if len(paths) < 2:
-                QMessageBox.warning(self, "선택 오류",
-                                    "두 개 이상의 CSP 원본 파일을 선택해 주세요.")
-                return
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setValue(10)
-            self.status_label.setText("📑 원본 병합 중…")
-
-            tmp_merge = os.path.join(tempfile.gettempdir(),"merge_result_csp.xlsx")
-            wb_tmp = openpyxl.Workbook(); wb_tmp.remove(wb_tmp.active)
-
-            for p in paths:
-                ext = os.path.splitext(p)[1].lower()
-                if ext in (".xlsx", ".xls"):
-                    df_src = pd.read_excel(p, sheet_name="Data", engine="openpyxl")
-                else:
-                    try:
-                        df_src = pd.read_csv(p, encoding="utf-8")
-                    except UnicodeDecodeError:
-                        df_src = pd.read_csv(p, encoding="cp949")
-                sh = wb_tmp.create_sheet()
-                for r in dataframe_to_rows(df_src, index=False, header=True):
-                    sh.append(r)
-            wb_tmp.save(tmp_merge); wb_tmp.close()
-
-            self.progress_bar.setValue(25)
-
-            pythoncom.CoInitialize()
-            excel = win32com.client.Dispatch("Excel.Application"); excel.Visible=False
-            wb = excel.Workbooks.Open(tmp_merge)
-
-            # ────────────────────────────── 시트명 정리
-            for sht in wb.Sheets:
-                g2 = sht.Range("G2").Value
-                if g2 == "CustomerB":
-                    sht.Name = "CustomerB"
-                elif g2 == "CustomerB":
-                    sht.Name = "CustomerB"
-
-            ws_aoai   = wb.Sheets("CustomerB")
-            ws_entraid = wb.Sheets("CustomerB")
-
-            self.progress_bar.setValue(35); self.status_label.setText("📄 데이터 합치기…")
-            y, m = (datetime.today().replace(day=1)-timedelta(days=1)).strftime("%Y"), \
-                   (datetime.today().replace(day=1)-timedelta(days=1)).strftime("%m")
-            data_sht_name = f"CustomerB{y}{m}_비용데이터"
-            ws_data = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count)); ws_data.Name = data_sht_name
-
-            def copy_used(src_ws, dst_ws, dst_row, skip_header=False):
-                used = src_ws.UsedRange
-                r_cnt = used.Rows.Count
-                c_cnt = used.Columns.Count
-                start = 2 if skip_header else 1
-                rng = src_ws.Range(src_ws.Cells(start,1),
-                                src_ws.Cells(r_cnt, c_cnt))
-                rng.Copy(dst_ws.Cells(dst_row, 1))
-                return r_cnt - (1 if skip_header else 0)
-
-            rows1 = copy_used(ws_aoai, ws_data, 1)
-            copy_used(ws_entraid, ws_data, rows1+1, skip_header=True)
-
-            # ────────────────────────────── Pivot 시트
-            self.progress_bar.setValue(50); self.status_label.setText("📊 PivotSheet 생성…")
-            piv_sht_name = f"CustomerB{y}{m}"
-            piv_ws = wb.Sheets.Add(After=wb.Sheets(wb.Sheets.Count)); piv_ws.Name = piv_sht_name
-            piv_ws.Cells.Font.Name = "맑은 고딕"
-
-            def make_pivot(src_range, dst_cell, t_name,
-                        rows, data_field):
-                pc = wb.PivotCaches().Create(1, src_range)
-                pt = pc.CreatePivotTable(TableDestination=piv_ws.Range(dst_cell), TableName=t_name)
-                for r in rows:
-                    pt.PivotFields(r).Orientation = 1
-                pt.AddDataField(pt.PivotFields(data_field[0]),
-                                data_field[1], -4157)
-                for col in pt.DataBodyRange.Columns:
-                    col.NumberFormat = "₩#,##0"
-                pt.TableStyle2 = "PivotStyleLight20"
-
-            piv_ws.Range("A2").Value = "1. CustomerB"
-            piv_ws.Range("A2").Font.Bold, piv_ws.Range("A2").Font.Size = True,14
-            make_pivot(ws_data.UsedRange,"A3","PivotSumCost",
-                       ["SubscriptionName"],("Cost","합계 Cost"))
-
-            piv_ws.Range("A12").Value="2. CustomerB"
-            piv_ws.Range("A12").Font.Bold, piv_ws.Range("A12").Font.Size = True,14
-
-            make_pivot(ws_entraid.UsedRange,"A13","PivotEntraid",
-                       ["SubscriptionName","ServiceName","Product"],("Cost","합계 Cost"))
-            make_pivot(ws_aoai.UsedRange,"D13","PivotAOAI",
-                       ["SubscriptionName","ServiceName","Product"],("Cost","합계 Cost"))
-
-            # ────────────────────────────── 시트 순서
-            for nm in [piv_sht_name, data_sht_name,
-                       "CustomerB","CustomerB1"][::-1]:
-                wb.Worksheets(nm).Move(Before=wb.Worksheets(1))
-
-            self.progress_bar.setValue(70); self.status_label.setText("💾 임시 저장…")
-            tmp_save = os.path.join(tempfile.gettempdir(), f"CustomerB_{uuid.uuid4().hex}.xlsx")
-            wb.SaveAs(tmp_save); wb.Close(SaveChanges=False); excel.Quit(); pythoncom.CoUninitialize()
-
-            # ────────────────────────────── 최종 저장
-            self.progress_bar.setValue(85); self.status_label.setText("📂 저장 위치 선택…")
-            target, _ = QFileDialog.getSaveFileName(self,"최종 파일 저장",
-                          f"CustomerB {int(m)}월 비용.xlsx","Excel Files (*.xlsx)")
-            if not target:
-                os.remove(tmp_save); os.remove(tmp_merge); self.progress_bar.setVisible(False); return
-            shutil.move(tmp_save, target)
-
-            # temp 파일 정리
-            for f in (tmp_save, tmp_merge):
-                if os.path.exists(f): os.remove(f)
+        if getattr(self, "worker", None) is not None and self.worker.is_alive():
+            QMessageBox.warning(self, "작업 중", "진행 중인 변환이 끝난 뒤 다시 시도해 주세요.")
+            return
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "CSP Billing 원본 파일(들) 선택", "",
+            "Excel / CSV Files (*.xlsx *.xls *.csv);;All Files (*)")
+        if len(paths) < 2:
+            QMessageBox.warning(self, "선택 오류",
+                                "두 개 이상의 CSP 원본 파일을 선택해 주세요.")
+            return
+        self.csp_bill_month = datetime.today().replace(day=1) - timedelta(days=1)
 
-            self.progress_bar.setValue(100)
-            self.status_label.setText("✅ 완료!")
-            QMessageBox.information(self,"완료",f"작업이 완료되었습니다.")
+        # 원본은 작업 스레드에서 병렬로 읽고, 진행률은 다른 변환처럼 QTimer 로 읽어 간다
+        self.running_text = "📑 CSP 원본 읽는 중…"
+        self.status_label.setText(self.running_text)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.cancel_button.setVisible(True)
+
+        self.signals = WorkerSignals()
+        self.signals.finished.connect(self.csp_done)
+        self.signals.error.connect(self.show_error)
 
+        self.worker = CspReportWorker(paths, self.csp_bill_month, self.signals)
+        self.worker.start()
+        self.progress_timer.start()
+
+    def csp_done(self, temp_file):
+        from billing.customerk import csp_file_name
+
+        self.progress_timer.stop()
+        self.progress_bar.setVisible(False)
+        self.cancel_button.setVisible(False)
+
+        if temp_file == "Canceled":
+            self.status_label.setText("취소가 완료되었습니다.")
+            return
+
+        # ────────────────────────────── 최종 저장
+        target, _ = QFileDialog.getSaveFileName(self, "최종 파일 저장",
+                                                csp_file_name(self.csp_bill_month), "Excel Files (*.xlsx)")
+        if not target:
+            discard(temp_file)
+            self.status_label.setText("")
+            return
+        try:
+            shutil.move(temp_file, target)
         except Exception as err:
-            QMessageBox.critical(self,"CSP 오류",str(err))
-            for f in ("tmp_save","tmp_merge"):
-                try:
-                    path = locals().get(f); 
-                    if path and os.path.exists(path): os.remove(path)
-                except: pass
-        finally:
-            self.progress_bar.setVisible(False)
+            discard(temp_file)
+            QMessageBox.critical(self, "CSP 오류", str(err))
+            return
+        self.status_label.setText("✅ 완료!")
+        QMessageBox.information(self, "완료", f"작업이 완료되었습니다.")
+
+    def refresh_progress(self):
+        tracker = getattr(getattr(self, "worker", None), "tracker", None)
+        if tracker is None or self.worker.stop_requested:
+            return
+        snapshot = tracker.snapshot()
+        self.progress_bar.setValue(snapshot.percent)
+        eta = format_eta(snapshot.eta)
+        self.status_label.setText(f"{self.running_text} (남은 시간 {eta})" if eta else self.running_text)
 
     def start_conversion(self):
-        self.status_label.setText("변환 중입니다...")
+        self.running_text = "변환 중입니다..."
+        self.status_label.setText(self.running_text)
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         self.cancel_button.setVisible(True)
 
         self.signals = WorkerSignals()
-        self.signals.progress.connect(self.progress_bar.setValue)
         self.signals.finished.connect(self.conversion_done)
         self.signals.error.connect(self.show_error)
 
         self.worker = BillingWorker(self.customer, self.file_path, self.signals)
         self.worker.start()
+        self.progress_timer.start()
+
+    def start_batch_conversion(self):
+        from billing.profiles import CSP_CUSTOMERS
+
+        self.status_label.setText("")
+        self.notice_label.setText("")
+        file_path, _ = QFileDialog.getOpenFileName(self, "CSP 파트너 파일 업로드", "", "Excel or CSV Files (*.xlsx *.csv)")
+        if not file_path:
+            return
+        save_dir = QFileDialog.getExistingDirectory(self, "저장 폴더 선택")
+        if not save_dir:
+            return
+
+        self.customer = "Batch"
+        self.running_text = "전체 고객사 변환 중입니다..."
+        self.status_label.setText(self.running_text)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.cancel_button.setVisible(True)
+
+        self.signals = WorkerSignals()
+        self.signals.finished.connect(self.conversion_done)
+        self.signals.error.connect(self.show_error)
+
+        self.worker = BillingBatchWorker(CSP_CUSTOMERS, file_path, save_dir, self.signals)
+        self.worker.start()
+        self.progress_timer.start()
 
     def conversion_done(self, temp_file):
+        from billing.profiles import report_file_name
+
+        self.progress_timer.stop()
         self.progress_bar.setVisible(False)
         self.cancel_button.setVisible(False)
 
@@ -2004,39 +621,21 @@ class BillingMasterApp(QWidget):
             self.status_label.setText("취소가 완료되었습니다. 고객사를 다시 선택해주세요")
             return
 
+        if temp_file.startswith("Batch Completed"):
+            skipped = [c for c, path in self.worker.results.items() if not path]
+            message = f"작업이 완료되었습니다. ({temp_file.split(': ')[1]})"
+            if skipped:
+                message += f" 데이터 없음: {', '.join(skipped)}"
+            self.status_label.setText(message)
+            return
+
         if self.customer == "CustomerB" and temp_file == "CustomerB 완료":
             self.status_label.setText("작업이 완료되었습니다.")
             return
 
         today = datetime.today()
         billing_month = today.replace(day=1) - timedelta(days=1)
-
-        if self.customer == "CustomerA":
-            file_name = f"iCustomerA {billing_month.year}년 {billing_month.month:02d}월 Azure 사용량.xlsx"
-        elif self.customer == "CustomerB":
-            file_name = f"CustomerB {billing_month.month}월 비용보고서.xlsx"
-        elif self.customer == "CustomerC":
-            file_name = f"CustomerC {billing_month.year % 100}년 {billing_month.month:02d}월 Azure 사용량.xlsx"
-        elif self.customer == "CustomerD":
-            today = datetime.today()
-            file_name = f"{today.strftime('%Y%m%d')}_{billing_month.month:02d}월Billing.xlsx"
-        elif self.customer == "CustomerE":
-            file_name = f"CustomerF {billing_month.year}년 {billing_month.month}월 Azure 사용량.xlsx"
-        elif self.customer == "CustomerG":
-            file_name = f"{billing_month.year % 100}년 {billing_month.month}월 사용 금액_Stand Egg (Azure Portal).xlsx"
-        elif self.customer == "CustomerH":
-            today = datetime.today()
-            file_name = f"CustomerI {billing_month.year}년 {billing_month.month}월_{today.strftime('%Y%m%d')}.xlsx"
-        elif self.customer == "CustomerJ":
-            file_name = f"CustomerK {billing_month.year}{billing_month.month:02d}비용.xlsx"
-        elif self.customer == "CustomerL":
-            file_name = f"CustomerM {billing_month.month}월 비용보고서.xlsx"
-        elif self.customer == "CustomerN":
-            file_name = f"CustomerO {billing_month.month}월 비용보고서.xlsx"
-        elif self.customer == "CustomerP":
-            file_name = f"CustomerQ {billing_month.month:02d}월 비용.xlsx"
-        else:
-            file_name = f"{self.customer} {billing_month.year}-{billing_month.month:02d}.xlsx"
+        file_name = report_file_name(self.customer, billing_month, today)
 
         save_path, _ = QFileDialog.getSaveFileName(self, "저장 위치 선택", file_name, "Excel Files (*.xlsx)")
         if save_path:
@@ -2053,14 +652,19 @@ class BillingMasterApp(QWidget):
             self.progress_bar.setVisible(True)
 
     def show_error(self, message):
+        self.progress_timer.stop()
         QMessageBox.critical(self, "에러", f"오류 발생: {message}")
         self.status_label.setText("")
         self.progress_bar.setVisible(False)
         self.cancel_button.setVisible(False)
 
 if __name__ == "__main__":
+    # 원본 파일을 병렬로 읽는 작업 프로세스가 exe 에서 창을 다시 띄우지 않도록
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon(r"C:\Projects\BillingMaster\Logo.ico"))
     window = BillingMasterApp()
     window.show()
+    # 첫 이벤트 루프에서 창이 그려진 뒤 시작 시간 보고서를 남긴다
+    QTimer.singleShot(0, lambda: startup.finish(_import_timer, "window shown"))
     sys.exit(app.exec())
\ No newline at end of file
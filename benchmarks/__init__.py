@@ -0,0 +1 @@
+"""End-to-end benchmarks over synthetic exports; see :mod:`benchmarks.bench`."""
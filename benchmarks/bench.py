@@ -0,0 +1,265 @@
+"""End-to-end benchmarks of the report paths.
+
+Every case runs what a button does, minus the dialogs, against synthetic
+exports from :mod:`benchmarks.synthetic`:
+
+* ``csp:<customer>`` - BillingWorker on the CSP partner csv
+  (filtered read + :func:`billing.jobs.build_report`);
+* ``csp-all`` - BillingBatchWorker over every CSP customer;
+* ``ea:<customer>`` - BillingWorker on the EA csv;
+* ``customerk-pec``, ``customerk-cost``, ``customerk-ea``,
+  ``customerk-csp`` - the CustomerK flows of :mod:`billing.customerk`.
+
+Charts go to the in-process :class:`billing.automation.FakeExcel`, so the
+numbers are the Python side only. Each case runs in a fresh interpreter,
+which keeps the caches and the peak memory of one case out of the next.
+Generated inputs are kept in ``benchmarks/data`` and reused::
+
+    python -m benchmarks.bench --rows 10k,100k
+    python -m benchmarks.bench --rows 1M --cases "csp:*" customerk-csp --json 1m.json
+
+``--trace DIR`` also writes a Chrome trace of every run's stages
+(:mod:`billing.trace`) to ``DIR/<case>-<rows>.json``.
+
+Peak memory is the process's maximum RSS, and ``rss before`` what the
+interpreter held before the case started; ``worker MB`` is the largest
+RSS of a reader process (``customerk-csp`` parses its files in parallel). Where :mod:`resource` is missing
+(Windows) tracemalloc's peak of Python allocations is reported instead.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.synthetic import GENERATORS, parse_rows, write_export
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "benchmarks", "data")
+BILLING_MONTH = datetime(2024, 5, 31)
+# 엑셀 시트 한 장의 최대 행 수 (머리글 포함)
+XLSX_MAX_ROWS = 1_048_576
+EA_CUSTOMERS = ["CustomerF", "CustomerG", "CustomerH", "CustomerI", "CustomerJ", "CustomerK"]
+
+
+def input_path(schema, rows, data_dir=DATA_DIR, seed=0):
+    """The generated export for ``schema``, created on first use.
+
+    The CostManagement sheet is an xlsx as downloaded from the portal,
+    unless it would not fit on one sheet.
+    """
+    ext = ".xlsx" if schema == "cost" and rows < XLSX_MAX_ROWS else ".csv"
+    path = os.path.join(data_dir, f"{schema}_{rows}_{seed}{ext}")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        started = time.perf_counter()
+        df = GENERATORS[schema](rows, seed=seed)
+        partial = path + ".part" + ext
+        write_export(df, partial)
+        os.replace(partial, path)
+        print(f"generated {os.path.basename(path)} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return path
+
+
+def _customers():
+    from billing.profiles import CSP_CUSTOMERS
+    return CSP_CUSTOMERS
+
+
+def case_names():
+    return ([f"csp:{c}" for c in _customers()] + ["csp-all"] + [f"ea:{c}" for c in EA_CUSTOMERS]
+            + ["customerk-pec", "customerk-cost", "customerk-ea", "customerk-csp"])
+
+
+def inputs_for(case):
+    """``[(schema, seed)]`` the case reads."""
+    if case.startswith(("csp", "customerk-pec")):
+        return [("csp", 0)]
+    if case.startswith(("ea:", "customerk-ea")):
+        return [("ea", 0)]
+    if case == "customerk-cost":
+        return [("cost", 0)]
+    # CustomerK CSP 는 원본 두 개를 합친다
+    return [("cost", 1), ("cost", 2)]
+
+
+def _run_worker(customer, path, out_dir):
+    from billing import jobs
+    from billing.profiles import CSP_CUSTOMERS
+
+    df = jobs.load_export(path, [customer] if customer in CSP_CUSTOMERS else None, cache=None)
+    output = os.path.join(out_dir, f"{customer}_temp_result.xlsx")
+    jobs.build_report(customer, df, output, save_dir=out_dir, billing_month=BILLING_MONTH)
+    return len(df)
+
+
+def run_case(case, paths, out_dir):
+    """Run ``case`` on ``paths``; returns the number of source rows it handled."""
+    from billing import customerk, jobs
+    from billing.readers import read_export
+
+    if case.startswith(("csp:", "ea:")):
+        return _run_worker(case.partition(":")[2], paths[0], out_dir)
+    if case == "csp-all":
+        df = jobs.load_export(paths[0], _customers(), cache=None)
+        jobs.convert_all(df, _customers(), out_dir, billing_month=BILLING_MONTH)
+        return len(df)
+    if case == "customerk-pec":
+        rows = customerk.pec_rows(read_export(paths[0]))
+        customerk.write_pec_report(os.path.join(out_dir, customerk.pec_file_name(BILLING_MONTH)), rows)
+        return len(rows)
+    if case == "customerk-cost":
+        df = customerk.read_source(paths[0], sheet_name="Data")
+        customerk.write_cost_report(os.path.join(out_dir, "CustomerK_Cost.xlsx"), df)
+        return len(df)
+    if case == "customerk-ea":
+        rows = customerk.ea_rows(customerk.read_source(paths[0]))
+        customerk.write_ea_report(os.path.join(out_dir, customerk.ea_file_name(BILLING_MONTH)), rows,
+                                  BILLING_MONTH)
+        return len(rows)
+    if case == "customerk-csp":
+        frames = customerk.read_sources(paths, sheet_name="Data")
+        customerk.write_csp_report(os.path.join(out_dir, customerk.csp_file_name(BILLING_MONTH)), frames,
+                                   BILLING_MONTH)
+        return sum(len(f) for f in frames)
+    raise ValueError(f"unknown case: {case}")
+
+
+def _maxrss_mb(who):
+    import resource
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _rss_mb():
+    """``(current or None, peak)`` RSS of this process in MB."""
+    import resource
+    peak = _maxrss_mb(resource.RUSAGE_SELF)
+    try:
+        with open("/proc/self/statm") as fh:
+            current = int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        current = None
+    return current, peak
+
+
+def measure(case, paths, trace_path=None):
+    """Time and memory of one run of ``case``, in this process."""
+    from billing import trace
+    from billing.automation import FakeExcel, set_backend
+
+    set_backend(FakeExcel())
+    try:
+        before, _ = _rss_mb()
+        traced = False
+    except ImportError:
+        import tracemalloc
+        tracemalloc.start()
+        before, traced = None, True
+
+    with tempfile.TemporaryDirectory(prefix="billing-bench-") as out_dir:
+        wall, cpu = time.perf_counter(), time.process_time()
+        with trace.recording(case, trace_path):
+            rows = run_case(case, paths, out_dir)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        written = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(out_dir) for f in files)
+
+    if traced:
+        peak, workers = tracemalloc.get_traced_memory()[1] / 1024 ** 2, None
+    else:
+        import resource
+        peak, workers = _rss_mb()[1], _maxrss_mb(resource.RUSAGE_CHILDREN) or None
+    return {"case": case, "rows": rows, "wall": wall, "cpu": cpu, "rss_before_mb": before, "peak_mb": peak,
+            "worker_peak_mb": workers, "peak_kind": "tracemalloc" if traced else "rss",
+            "output_mb": written / 1024 ** 2}
+
+
+def _spawn(case, paths, trace_path=None):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    cmd = [sys.executable, "-m", "benchmarks.bench", "--run-case", case, "--paths", *paths]
+    if trace_path:
+        cmd += ["--trace-file", trace_path]
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, encoding="utf-8")
+    if proc.returncode != 0:
+        return {"case": case, "error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _select(patterns):
+    names = case_names()
+    if not patterns:
+        return names
+    return [n for n in names if any(fnmatch.fnmatchcase(n, p) for p in patterns)]
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else "-"
+
+
+def print_table(results, stream=sys.stdout):
+    print(f"{'rows':>8} {'case':<18} {'handled':>9} {'wall s':>8} {'cpu s':>8} {'rows/s':>10} "
+          f"{'rss before':>10} {'peak MB':>8} {'worker MB':>9} {'out MB':>7}", file=stream)
+    for r in results:
+        if "error" in r:
+            print(f"{r['input_rows']:>8} {r['case']:<18} error: {r['error']}", file=stream)
+            continue
+        rate = r["rows"] / r["wall"] if r["wall"] else 0
+        print(f"{r['input_rows']:>8} {r['case']:<18} {r['rows']:>9,} {r['wall']:>8.2f} {r['cpu']:>8.2f} "
+              f"{rate:>10,.0f} {_fmt(r['rss_before_mb'], '>10.0f')} {r['peak_mb']:>8.0f} "
+              f"{_fmt(r.get('worker_peak_mb'), '>9.0f')} "
+              f"{r['output_mb']:>7.1f}", file=stream)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10k,100k", help="comma separated, e.g. 10k,100k,1M,5M")
+    parser.add_argument("--cases", nargs="*", help="names or patterns, e.g. 'csp:*' customerk-csp")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--data", default=DATA_DIR, help="where generated inputs are kept")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--trace", help="write a Chrome trace of each run to this folder")
+    parser.add_argument("--list", action="store_true", help="print the case names and exit")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--paths", nargs="*", help=argparse.SUPPRESS)
+    parser.add_argument("--trace-file", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(measure(args.run_case, args.paths, args.trace_file)))
+        return 0
+    if args.list:
+        print("\n".join(case_names()))
+        return 0
+
+    cases = _select(args.cases)
+    if not cases:
+        parser.error("no case matches --cases")
+    if args.trace:
+        os.makedirs(args.trace, exist_ok=True)
+    results = []
+    for rows in [parse_rows(r) for r in args.rows.split(",")]:
+        for case in cases:
+            half = rows // 2 if case == "customerk-csp" else rows
+            paths = [input_path(schema, half, args.data, seed) for schema, seed in inputs_for(case)]
+            for _ in range(args.repeat):
+                trace_path = None
+                if args.trace:
+                    name = case.replace(":", "-")
+                    trace_path = os.path.abspath(os.path.join(args.trace, f"{name}-{rows}.json"))
+                result = _spawn(case, paths, trace_path)
+                result["input_rows"] = rows
+                results.append(result)
+                print_table([result], sys.stderr)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, ensure_ascii=False, indent=2)
+    return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
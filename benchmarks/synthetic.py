@@ -0,0 +1,208 @@
+"""Synthetic Azure usage exports for benchmarking.
+
+Three schemas are generated, with the columns the report flows read:
+
+* ``csp`` - the CSP partner export (``PartnerId`` ... ``BenefitType``),
+  one file for the whole partner with many customers;
+* ``ea`` - the Korean-header EA export (``비용 (Cost)``,
+  ``구독이름 (SubscriptionName)``, ...);
+* ``cost`` - the CostManagement ``Data`` sheet.
+
+Rows are spread over customers with a Zipf-like skew: with ``skew=0`` every
+customer has about the same number of rows, with ``skew=1.2`` the first
+customer has several times more than the tenth. The billed customers of
+:mod:`billing.profiles` and CustomerK always come first, so they get the
+most rows. Values are drawn from small per-column pools, as in the real
+exports, and everything is seeded so a run is reproducible.
+
+    python -m benchmarks.synthetic csp --rows 1M --out csp_1m.csv
+    python -m benchmarks.synthetic cost --rows 100k --out cost_100k.xlsx
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from billing.profiles import CSP_CUSTOMERS
+from billing.xlsx import write_frames
+
+SCHEMAS = ("csp", "ea", "cost")
+METER_CATEGORIES = ["Virtual Machines", "Storage", "Bandwidth", "Azure App Service", "SQL Database",
+                    "Azure Cosmos DB", "Azure OpenAI", "Log Analytics", "Microsoft Defender for Cloud",
+                    "Azure Monitor", "Backup", "Virtual Network"]
+REGIONS = ["KR Central", "KR South", "JA East", "US East", "EU West"]
+
+
+def parse_rows(text):
+    """``"10k"``, ``"1M"`` or ``"5000"`` as an int."""
+    text = str(text).strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def customer_weights(count, skew):
+    weights = 1.0 / np.arange(1, count + 1) ** skew
+    return weights / weights.sum()
+
+
+def _pool(prefix, size):
+    return np.array([f"{prefix}{i:03d}" for i in range(size)], dtype=object)
+
+
+def _pick(rng, pool, n):
+    return pool[rng.integers(0, len(pool), n)]
+
+
+def _meters(rng, n):
+    category = rng.integers(0, len(METER_CATEGORIES), n)
+    categories = np.array(METER_CATEGORIES, dtype=object)[category]
+    sub = np.char.add("Tier ", (category * 3 + rng.integers(0, 3, n)).astype(str)).astype(object)
+    name = np.char.add("Meter ", (category * 10 + rng.integers(0, 10, n)).astype(str)).astype(object)
+    return categories, sub, name
+
+
+def _costs(rng, n):
+    # 사용량 비용은 작은 값이 대부분이고 가끔 큰 값이 섞인 분포
+    return np.round(rng.lognormal(mean=0.0, sigma=2.0, size=n), 6)
+
+
+def _dates(rng, n, billing_month):
+    start = pd.Timestamp(billing_month).to_period("M").start_time
+    days = start.days_in_month
+    return (start + pd.to_timedelta(rng.integers(0, days, n), unit="D")).strftime("%Y-%m-%d").to_numpy()
+
+
+def csp_export(rows, customers=40, skew=1.1, seed=0, billing_month="2024-05"):
+    """A CSP partner export with ``rows`` rows over ``customers`` customers."""
+    rng = np.random.default_rng(seed)
+    names = np.array(list(dict.fromkeys(CSP_CUSTOMERS + ["CustomerB"]))
+                     + [f"Tenant{i:03d}" for i in range(max(0, customers - len(CSP_CUSTOMERS) - 1))],
+                     dtype=object)[:max(customers, 1)]
+    who = rng.choice(len(names), size=rows, p=customer_weights(len(names), skew))
+    customer = names[who]
+    categories, sub, meter = _meters(rng, rows)
+    groups = np.array(["CustomerL", "customerl-1", "CustomerL-2", "rg-app", "rg-data", "rg-shared"], dtype=object)
+    pricing = _costs(rng, rows)
+    return pd.DataFrame({
+        "PartnerId": "1a2b3c4d-0000-4000-8000-000000000001",
+        "PartnerName": "Partner Co., Ltd.",
+        "CustomerId": np.char.add("cid-", who.astype(str)).astype(object),
+        "CustomerName": customer,
+        "CustomerDomainName": np.char.add(customer.astype(str), ".onmicrosoft.com").astype(object),
+        "SubscriptionId": np.char.add(np.char.add("sub-", who.astype(str)), np.char.add("-", rng.integers(0, 4, rows).astype(str))).astype(object),
+        "UsageDate": _dates(rng, rows, billing_month),
+        "MeterCategory": categories,
+        "MeterSubCategory": sub,
+        "MeterName": meter,
+        "MeterRegion": _pick(rng, np.array(REGIONS, dtype=object), rows),
+        "ResourceGroup": _pick(rng, groups, rows),
+        "ChargeType": "new",
+        "UnitPrice": np.round(rng.random(rows), 6),
+        "Quantity": np.round(rng.random(rows) * 100, 6),
+        "PricingPreTaxTotal": pricing,
+        "BillingPreTaxTotal": np.round(pricing * 1350, 2),
+        "BillingCurrency": "KRW",
+        "EntitlementId": np.char.add("ent-", who.astype(str)).astype(object),
+        "EntitlementDescription": customer,
+        "PartnerEarnedCreditPercentage": rng.choice([0, 15], rows),
+        "BenefitType": None,
+    })
+
+
+EA_ACCOUNTS = ["CustomerK", "CustomerF", "CustomerG", "CustomerH", "CustomerI", "CustomerJ"]
+
+
+def ea_export(rows, accounts=20, skew=1.1, seed=0, billing_month="2024-05"):
+    """A Korean-header EA export with ``rows`` rows over ``accounts`` accounts."""
+    rng = np.random.default_rng(seed)
+    names = np.array(EA_ACCOUNTS + [f"Account{i:03d}" for i in range(max(0, accounts - len(EA_ACCOUNTS)))],
+                     dtype=object)[:max(accounts, 1)]
+    who = rng.choice(len(names), size=rows, p=customer_weights(len(names), skew))
+    account = names[who]
+    # CustomerK 는 구독 분할 보고서에 쓰는 세 구독을 받는다
+    suffix = rng.choice(np.array(["", "-1", "-2", "-dev"], dtype=object), rows)
+    subscription = np.where(account == "CustomerK", np.char.add("CustomerB", suffix.astype(str)).astype(object),
+                            np.char.add(account.astype(str), suffix.astype(str)).astype(object))
+    categories, sub, meter = _meters(rng, rows)
+    price = np.round(rng.random(rows) * 10, 6)
+    quantity = np.round(rng.random(rows) * 100, 6)
+    return pd.DataFrame({
+        "계정이름 (AccountName)": account,
+        "계정소유자Id (AccountOwnerId)": account,
+        "청구계정이름 (BillingAccountName)": account,
+        "청구프로필이름 (BillingProfileName)": account,
+        "청구프로필Id (BillingProfileId)": 58075352,
+        "구독이름 (SubscriptionName)": subscription,
+        "날짜 (Date)": _dates(rng, rows, billing_month),
+        "제품 (Product)": np.char.add(categories.astype(str), " - Standard").astype(object),
+        "미터범주 (MeterCategory)": categories,
+        "미터하위범주 (MeterSubCategory)": sub,
+        "요금제이름 (MeterName)": meter,
+        "리소스그룹 (ResourceGroup)": _pick(rng, _pool("rg-", 12), rows),
+        "수량 (Quantity)": quantity,
+        "단가 (UnitPrice)": price,
+        "유효가격 (EffectivePrice)": np.round(price * 0.95, 6),
+        "비용 (Cost)": np.round(price * quantity * 0.95, 6),
+    })
+
+
+def cost_export(rows, subscriptions=30, skew=1.1, seed=0, billing_month="2024-05", customer="CustomerB"):
+    """A CostManagement ``Data`` sheet; column G holds ``customer`` on every row."""
+    rng = np.random.default_rng(seed)
+    names = np.array([customer] + [f"{customer}-{i}" for i in range(1, max(subscriptions, 1))], dtype=object)
+    who = rng.choice(len(names), size=rows, p=customer_weights(len(names), skew))
+    categories, sub, meter = _meters(rng, rows)
+    cost = _costs(rng, rows)
+    return pd.DataFrame({
+        "UsageDate": _dates(rng, rows, billing_month),
+        "BillingAccountName": "Partner Co., Ltd.",
+        "BillingProfileName": customer,
+        "InvoiceSectionName": "Default",
+        "ResourceGroupName": _pick(rng, _pool("rg-", 12), rows),
+        "ResourceLocation": _pick(rng, np.array(REGIONS, dtype=object), rows),
+        "CustomerName": customer,
+        "SubscriptionName": names[who],
+        "ServiceName": categories,
+        "ServiceTier": sub,
+        "Meter": meter,
+        "Product": np.char.add(categories.astype(str), " - Standard").astype(object),
+        "Quantity": np.round(rng.random(rows) * 100, 6),
+        "Cost": np.round(cost * 1350, 2),
+        "CostUSD": cost,
+        "Currency": "KRW",
+    })
+
+
+GENERATORS = {"csp": csp_export, "ea": ea_export, "cost": cost_export}
+
+
+def write_export(df, path, sheet_name="Data", encoding="utf-8-sig"):
+    """Write ``df`` as csv (``encoding``, e.g. ``cp949``) or as an xlsx sheet."""
+    if path.lower().endswith(".xlsx"):
+        return write_frames(path, {sheet_name: df})
+    df.to_csv(path, index=False, encoding=encoding)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.synthetic", description=__doc__.splitlines()[0])
+    parser.add_argument("schema", choices=SCHEMAS)
+    parser.add_argument("--rows", default="100k", help="e.g. 10k, 100k, 1M, 5M")
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--month", default="2024-05")
+    parser.add_argument("--encoding", default="utf-8-sig", help="csv only, e.g. cp949")
+    parser.add_argument("--out", required=True, help=".csv or .xlsx")
+    args = parser.parse_args(argv)
+
+    df = GENERATORS[args.schema](parse_rows(args.rows), skew=args.skew, seed=args.seed, billing_month=args.month)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    write_export(df, args.out, encoding=args.encoding)
+    print(f"{args.out}: {len(df):,} rows, {os.path.getsize(args.out) / 1024 ** 2:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Report building blocks shared by BillingProgram and its batch tooling."""
@@ -0,0 +1,128 @@
+"""Hierarchical subtotal aggregation in one vectorized pass.
+
+Every level of the hierarchy is reduced to integer codes ordered the way a
+pivot table orders its items. The rows are sorted once by those codes;
+every subtotal level is then a ``bincount`` over group ids taken from the
+boundaries of the sorted codes. Leaf sums, subtotals and the grand total
+come out of the same pass, with no per-level groupby.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+def ordered_codes(series):
+    """Integer codes for ``series`` in pivot item order, plus the items.
+
+    Blank values (NaN/None) become the last item, shown as "(비어 있음)".
+    """
+    from billing.xlsx import item_sort_key
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    items = list(uniques)
+    order = sorted(range(len(items)), key=lambda i: item_sort_key(items[i]))
+    rank = np.empty(len(items) + 1, dtype=np.int64)
+    rank[order] = np.arange(len(items))
+    items = [items[i] for i in order]
+    if (codes < 0).any():
+        rank[-1] = len(items)
+        items.append(None)
+    return rank[codes], items
+
+
+@dataclass
+class HierarchyTotals:
+    """Sums for each row-level prefix, in display (pre-order) sequence.
+
+    ``entries`` holds ``(depth, item, values)`` tuples; ``values`` has one
+    sum per column item (``None`` where no rows fall in that cell) followed
+    by the row total when column fields are used, otherwise just the total.
+    ``grand`` is laid out the same way.
+    """
+    col_keys: list
+    entries: list
+    grand: list
+
+
+def hierarchy_totals(frame, rows, value, columns=()):
+    """Sum ``value`` over every prefix of ``rows`` (and each ``columns`` item).
+
+    Non-numeric values count as zero, like a pivot's 합계.
+    """
+    values = pd.to_numeric(frame[value], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    values = np.nan_to_num(values, nan=0.0)
+    n = len(rows)
+
+    row_codes, row_items = [], []
+    for name in rows:
+        codes, items = ordered_codes(frame[name])
+        row_codes.append(codes)
+        row_items.append(items)
+
+    if columns:
+        col_parts = [ordered_codes(frame[name]) for name in columns]
+        # 열 필드가 여러 개면 조합을 하나의 코드로 합친다
+        combined = np.zeros(len(frame), dtype=np.int64)
+        for codes, items in col_parts:
+            combined = combined * (len(items) or 1) + codes
+        col_code, col_index = np.unique(combined, return_inverse=True)
+        col_keys = []
+        for code in col_code:
+            key = []
+            for codes, items in reversed(col_parts):
+                code, rem = divmod(int(code), len(items) or 1)
+                key.append(items[rem])
+            col_keys.append(tuple(reversed(key)))
+        ncol = len(col_keys)
+    else:
+        col_index = np.zeros(len(frame), dtype=np.int64)
+        col_keys = [()]
+        ncol = 1
+
+    if len(frame) == 0 or n == 0:
+        grand = np.bincount(col_index, weights=values, minlength=ncol)
+        counts = np.bincount(col_index, minlength=ncol)
+        return HierarchyTotals(col_keys, [], _layout(grand, counts, columns))
+
+    order = np.lexsort(row_codes[::-1])
+    sorted_codes = [c[order] for c in row_codes]
+    sorted_values = values[order]
+    sorted_cols = col_index[order]
+
+    # level d starts a new group wherever any of the first d+1 codes changes
+    change = np.zeros(len(frame), dtype=bool)
+    change[0] = True
+    starts, depth_sums, depth_counts = [], [], []
+    for d in range(n):
+        change[1:] |= sorted_codes[d][1:] != sorted_codes[d][:-1]
+        group_id = np.cumsum(change) - 1
+        groups = int(group_id[-1]) + 1
+        cell = group_id * ncol + sorted_cols
+        starts.append(np.flatnonzero(change))
+        depth_sums.append(np.bincount(cell, weights=sorted_values, minlength=groups * ncol).reshape(groups, ncol))
+        if columns:
+            depth_counts.append(np.bincount(cell, minlength=groups * ncol).reshape(groups, ncol))
+
+    # pre-order: sort every group start by (position, depth)
+    positions = np.concatenate(starts)
+    depths = np.concatenate([np.full(len(s), d) for d, s in enumerate(starts)])
+    index = np.concatenate([np.arange(len(s)) for s in starts])
+    seq = np.lexsort((depths, positions))
+
+    entries = []
+    for k in seq:
+        d, g, pos = int(depths[k]), int(index[k]), int(positions[k])
+        item = row_items[d][sorted_codes[d][pos]]
+        counts = depth_counts[d][g] if columns else None
+        entries.append((d, item, _layout(depth_sums[d][g], counts, columns)))
+    grand = depth_sums[0].sum(axis=0)
+    counts = depth_counts[0].sum(axis=0) if columns else None
+    return HierarchyTotals(col_keys, entries, _layout(grand, counts, columns))
+
+
+def _layout(sums, counts, columns):
+    if columns:
+        cells = [float(v) if c else None for v, c in zip(sums, counts)]
+        return cells + [float(sums.sum())]
+    return [float(sums.sum())]
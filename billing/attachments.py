@@ -0,0 +1,130 @@
+"""Index of finished reports by (customer, billing month).
+
+The output folder is listed once and every file name is parsed against the
+customers' file name templates (:func:`billing.profiles.file_name_templates`
+and the mail attachment names), so finding a customer's attachments is a
+dict lookup instead of a file dialog or another directory walk.
+
+A file belongs to the customer whose report template it matches; the
+extra mail attachment names only claim files no report template matches.
+A file that still matches several customers is an error rather than a
+guess.
+
+Templates that carry no year (``"{month}월 비용보고서.xlsx"``) are dated
+as the most recent such month on or before the ``{today}`` stamp in the
+name, or else the file's modification time.
+"""
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from string import Formatter
+
+from billing.profiles import file_name_templates
+
+_FIELD_PATTERNS = {
+    "year": r"(?P<year>\d{4})",
+    "yy": r"(?P<yy>\d{2})",
+    "month": r"(?P<month>\d{1,2})",
+    "mm": r"(?P<mm>\d{2})",
+    "month_name": r"(?P<month_name>\d{4}년 \d{1,2}월)",
+    "today": r"(?P<today>\d{8})",
+}
+
+
+def template_regex(template, customer):
+    """Compile a file name template into a regex with one group per field."""
+    parts = []
+    seen = set()
+    for literal, name, _, _ in Formatter().parse(template):
+        parts.append(re.escape(literal))
+        if name is None:
+            continue
+        if name == "customer":
+            parts.append(re.escape(customer))
+        elif name in seen:
+            parts.append(f"(?P={name})")
+        elif name in _FIELD_PATTERNS:
+            parts.append(_FIELD_PATTERNS[name])
+            seen.add(name)
+        else:
+            raise ValueError(f"알 수 없는 파일명 필드: {{{name}}} ({template})")
+    return re.compile("".join(parts), re.IGNORECASE)
+
+
+def _billing_month(match, mtime):
+    fields = match.groupdict()
+    month = year = None
+    if fields.get("month_name"):
+        y, m = re.findall(r"\d+", fields["month_name"])
+        year, month = int(y), int(m)
+    if fields.get("mm") or fields.get("month"):
+        month = int(fields.get("mm") or fields["month"])
+    if fields.get("year"):
+        year = int(fields["year"])
+    elif fields.get("yy"):
+        year = 2000 + int(fields["yy"])
+    if month is None or not 1 <= month <= 12:
+        return None
+    if year is None:
+        # 연도가 없으면 작성일({today}) 또는 수정 시각 기준으로 가장 최근의 그 달
+        try:
+            stamp = datetime.strptime(fields["today"], "%Y%m%d") if fields.get("today") else None
+        except ValueError:
+            stamp = None
+        stamp = stamp or datetime.fromtimestamp(mtime)
+        year = stamp.year if month <= stamp.month else stamp.year - 1
+    return year, month
+
+
+class AttachmentIndex:
+    """Files in ``folder`` keyed by ``(customer, year, month)``."""
+
+    def __init__(self, folder, customers, extra_templates=None):
+        self.folder = folder
+        # (우선순위, 고객사, 패턴): 0 = 보고서 파일명, 1 = 메일 첨부 파일명
+        self._patterns = []
+        for customer in customers:
+            templates = list(file_name_templates(customer))
+            extra = [t for t in (extra_templates or {}).get(customer, ()) if t not in templates]
+            self._patterns += [(0, customer, template_regex(t, customer)) for t in templates]
+            self._patterns += [(1, customer, template_regex(t, customer)) for t in extra]
+        self._index = defaultdict(list)
+        self._stamp = None
+        self.refresh()
+
+    def refresh(self, force=False):
+        """Re-list the folder if it changed since the last scan."""
+        stamp = os.stat(self.folder).st_mtime_ns
+        if stamp == self._stamp and not force:
+            return
+        index = defaultdict(list)
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                mtime = entry.stat().st_mtime
+                matches = {}
+                for rank, customer, pattern in self._patterns:
+                    match = pattern.fullmatch(entry.name)
+                    if match is None:
+                        continue
+                    month = _billing_month(match, mtime)
+                    if month is not None:
+                        matches.setdefault(rank, {}).setdefault(customer, month)
+                if not matches:
+                    continue
+                owners = matches[min(matches)]
+                if len(owners) > 1:
+                    raise Exception(f"{entry.name}: 여러 고객사의 파일명과 일치합니다 ({', '.join(owners)}).")
+                (customer, month), = owners.items()
+                index[(customer, *month)].append((mtime, entry.path))
+        for files in index.values():
+            files.sort(reverse=True)
+        self._index = index
+        self._stamp = stamp
+
+    def lookup(self, customer, billing_month):
+        """Paths for ``customer`` in ``billing_month``, newest first."""
+        files = self._index.get((customer, billing_month.year, billing_month.month), ())
+        return list(dict.fromkeys(path for _, path in files))
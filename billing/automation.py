@@ -0,0 +1,308 @@
+"""Spreadsheet/Outlook automation behind a swappable backend.
+
+Reports are written natively (:mod:`billing.xlsx`); Excel is only driven for
+the few things that need it, such as pivot charts. Those calls go through a
+backend instead of a fresh ``Dispatch("Excel.Application")`` per file:
+
+* :class:`ExcelSessionPool` owns one or more warm Excel instances, each on
+  its own long-lived thread (COM objects are apartment-bound), and runs
+  jobs on them until the process exits.
+* :class:`FakeExcel` runs the same code in-process and records every call
+  and assignment, so pipelines can be benchmarked and checked headless.
+* :class:`CancellableBackend` wraps either one so a waiting caller gets
+  :class:`billing.cancel.Cancelled` within ``poll`` seconds of a cancel,
+  and a job that is already running closes its workbook without saving.
+
+A job is a function taking the opened workbook; see :func:`add_pivot_chart`.
+
+``pythoncom``/``win32com`` are imported on first use, so this module - and
+everything that imports it - loads on machines without pywin32.
+
+``BILLING_EXCEL_BACKEND=com|fake`` overrides the platform default. The
+fake is only used when asked for, here or through :func:`set_backend`;
+without Excel, :func:`default_backend` raises :class:`ExcelUnavailable`.
+"""
+import atexit
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from billing import trace
+from billing.cancel import Cancelled, checkpoint
+
+
+def _com():
+    import pythoncom
+    import win32com.client
+    return pythoncom, win32com.client
+
+
+def dispatch(prog_id):
+    """``win32com.client.Dispatch`` for the calling thread (e.g. Outlook)."""
+    pythoncom, client = _com()
+    pythoncom.CoInitialize()
+    return client.Dispatch(prog_id)
+
+
+def pump_messages():
+    pythoncom, _ = _com()
+    pythoncom.PumpWaitingMessages()
+
+
+class ExcelSessionPool:
+    """Long-lived ``Excel.Application`` sessions serving a shared job queue."""
+
+    def __init__(self, size=1, visible=False):
+        self.size = size
+        self.visible = visible
+        self._jobs = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.size:
+                t = threading.Thread(target=self._serve, name=f"excel-session-{len(self._threads)}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _launch(self, client):
+        # DispatchEx: own process, not whatever Excel the user has open
+        app = client.DispatchEx("Excel.Application")
+        app.Visible = self.visible
+        app.DisplayAlerts = False
+        return app
+
+    def _serve(self):
+        pythoncom, client = _com()
+        pythoncom.CoInitialize()
+        app = None
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                fn, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if app is None or not _alive(app):
+                        with trace.span("excel start", "excel"):
+                            app = self._launch(client)
+                    future.set_result(fn(app))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            if app is not None:
+                try:
+                    app.Quit()
+                except Exception:
+                    pass
+            pythoncom.CoUninitialize()
+
+    def submit(self, fn):
+        """Run ``fn(app)`` on a session thread; returns a Future."""
+        self._start()
+        future = Future()
+        self._jobs.put((fn, future))
+        return future
+
+    def edit(self, path, fn, save=True):
+        """Open ``path``, call ``fn(workbook)``, save and close it; returns ``fn``'s result."""
+        return self.edit_async(path, fn, save).result()
+
+    def edit_async(self, path, fn, save=True):
+        """:meth:`edit` without waiting; returns a Future."""
+        path = os.path.abspath(path)
+
+        def job(app):
+            name = os.path.basename(path)
+            with trace.span("excel open", "excel", file=name) as s:
+                wb = app.Workbooks.Open(path)
+                s.bytes = os.path.getsize(path)
+            try:
+                result = fn(wb)
+                if save:
+                    with trace.span("excel save", "excel", file=name):
+                        wb.Save()
+                return result
+            finally:
+                with trace.span("excel close", "excel", file=name):
+                    wb.Close(SaveChanges=False)
+
+        return self.submit(job)
+
+    def shutdown(self, timeout=10):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._jobs.put(None)
+        for t in threads:
+            t.join(timeout)
+
+
+def _alive(app):
+    try:
+        app.Visible
+        return True
+    except Exception:
+        return False
+
+
+class Recorder:
+    """Stand-in COM object: every attribute is another recorder, every call is logged."""
+
+    def __init__(self, log, path):
+        object.__setattr__(self, "_log", log)
+        object.__setattr__(self, "_path", path)
+
+    def __getattr__(self, name):
+        return Recorder(self._log, f"{self._path}.{name}")
+
+    def __setattr__(self, name, value):
+        self._log.append(("set", f"{self._path}.{name}", value))
+
+    def __call__(self, *args, **kwargs):
+        self._log.append(("call", self._path, args, kwargs))
+        return Recorder(self._log, f"{self._path}()")
+
+    def __iter__(self):
+        return iter(())
+
+    def __repr__(self):
+        return f"<Recorder {self._path}>"
+
+
+class FakeExcel:
+    """In-process backend that records operations instead of running Excel."""
+
+    def __init__(self):
+        self.operations = []
+        self._lock = threading.Lock()
+
+    def edit(self, path, fn, save=True):
+        log = [("call", "Workbooks.Open", (os.path.abspath(path),), {})]
+        try:
+            result = fn(Recorder(log, "Workbook"))
+            if save:
+                log.append(("call", "Workbook.Save", (), {}))
+            return result
+        finally:
+            log.append(("call", "Workbook.Close", (), {"SaveChanges": False}))
+            with self._lock:
+                self.operations.extend(log)
+
+    def edit_async(self, path, fn, save=True):
+        future = Future()
+        try:
+            future.set_result(self.edit(path, fn, save))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self):
+        pass
+
+
+class CancellableBackend:
+    """Gives up on a backend's jobs as soon as ``should_stop()`` is true.
+
+    COM calls cannot be interrupted, so a job that is already running is
+    left to finish on its session thread; it is checked again before the
+    workbook is saved and is closed unsaved instead.
+    """
+
+    def __init__(self, backend, should_stop, poll=0.1):
+        self.backend = backend
+        self.should_stop = should_stop
+        self.poll = poll
+
+    def edit(self, path, fn, save=True):
+        checkpoint(self.should_stop)
+
+        def guarded(wb):
+            checkpoint(self.should_stop)
+            result = fn(wb)
+            checkpoint(self.should_stop)
+            return result
+
+        future = self.backend.edit_async(path, guarded, save)
+        while True:
+            try:
+                return future.result(timeout=self.poll)
+            except TimeoutError:
+                if self.should_stop():
+                    future.cancel()
+                    raise Cancelled()
+
+    def edit_async(self, path, fn, save=True):
+        return self.backend.edit_async(path, fn, save)
+
+    def shutdown(self):
+        self.backend.shutdown()
+
+
+_default = None
+
+
+class ExcelUnavailable(Exception):
+    """There is no Excel to drive and no fake backend was asked for."""
+
+
+def default_backend():
+    """The process-wide backend: a COM session pool on Windows, the fake only on request."""
+    global _default
+    if _default is None:
+        kind = os.environ.get("BILLING_EXCEL_BACKEND") or ("com" if sys.platform == "win32" else None)
+        if kind == "com":
+            _default = ExcelSessionPool()
+        elif kind == "fake":
+            _default = FakeExcel()
+        elif kind is None:
+            raise ExcelUnavailable("Excel automation unavailable: 피벗 차트는 Windows 의 Excel 이 필요합니다. "
+                                   "(BILLING_EXCEL_BACKEND=fake 로 차트 없이 실행)")
+        else:
+            raise ValueError(f"알 수 없는 BILLING_EXCEL_BACKEND: {kind!r} (com|fake)")
+    return _default
+
+
+def set_backend(backend):
+    """Replace the process-wide backend (returns the previous one)."""
+    global _default
+    previous, _default = _default, backend
+    return previous
+
+
+def add_pivot_chart(path, sheet_name, chart_spec, backend=None, should_stop=None):
+    """Add a clustered column chart for the first pivot on ``sheet_name``."""
+    def build(wb):
+        pivot_ws = wb.Sheets(sheet_name)
+        pivot_table = pivot_ws.PivotTables(1)
+        with trace.span("pivot refresh", "excel", sheet=sheet_name):
+            pivot_table.RefreshTable()
+
+        with trace.span("pivot chart", "excel", sheet=sheet_name):
+            draw(pivot_ws, pivot_table)
+
+    def draw(pivot_ws, pivot_table):
+        chart = pivot_ws.Shapes.AddChart2(
+            201,  # Clustered Column = xlColumnClustered
+            51,    # xlChartInPlace
+            250, 50, chart_spec.width, chart_spec.height  # (left, top, width, height)
+        ).Chart
+        chart.SetSourceData(pivot_table.TableRange1)
+        chart.ChartTitle.Text = chart_spec.title
+        chart.HasLegend = True
+        chart.Parent.Top = pivot_ws.Range("D3").Top
+        chart.Parent.Left = pivot_ws.Range("D3").Left
+        chart.Axes(2).MinimumScaleIsAuto = True
+        chart.Axes(2).MaximumScaleIsAuto = True
+        chart.Axes(2).MajorUnit = chart_spec.major_unit
+
+    backend = backend or default_backend()
+    if should_stop is not None:
+        backend = CancellableBackend(backend, should_stop)
+    backend.edit(path, build)
@@ -0,0 +1,250 @@
+"""Content-addressed columnar cache of parsed exports.
+
+The first parse of an input file is stored as an Arrow IPC (Feather) file
+keyed by a hash of the file's bytes, so re-running a customer, retrying or
+re-sending the same export loads a memory-mapped copy instead of parsing
+the workbook again. The cache is bounded by a size cap and evicts the least
+recently used entries first.
+
+    python -m billing.cache stats
+    python -m billing.cache clear [FILE ...]
+"""
+import hashlib
+import os
+import sys
+import time
+
+import pandas as pd
+
+from billing import trace
+from billing.cancel import checkpoint
+
+try:
+    from pyarrow import feather
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.expanduser("~/.cache"), "BillingMaster", "exports"
+)
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# 쓰는 도중 끝난 프로세스가 남긴 임시 파일은 이만큼 (초) 지나면 지운다
+STALE_TMP_SECONDS = 3600
+_HASH_BLOCK = 4 * 1024 * 1024
+
+
+def file_digest(path, should_stop=None):
+    """blake2b digest of the file's bytes (hex, 32 chars)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK), b""):
+            checkpoint(should_stop)
+            h.update(block)
+    return h.hexdigest()
+
+
+class ExportCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        # 같은 실행 안에서는 (경로, 크기, 수정시각) 으로 해시를 재사용
+        self._digests = {}
+
+    def _digest(self, path, should_stop=None):
+        st = os.stat(path)
+        stamp = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        if stamp not in self._digests:
+            self._digests[stamp] = file_digest(path, should_stop)
+        return self._digests[stamp]
+
+    def _entry(self, digest, variant):
+        tag = hashlib.blake2b(variant.encode("utf-8"), digest_size=4).hexdigest()
+        return os.path.join(self.root, f"{digest}-{tag}")
+
+    def fetch(self, path, loader, variant="", should_stop=None):
+        """Return the cached frame for ``path`` or call ``loader()`` and store it.
+
+        ``variant`` distinguishes different reads of the same file (sheet,
+        projection, ...). A cancelled ``loader`` stores nothing.
+        """
+        base = self._base(path, variant, should_stop)
+        df = self._cached(base)
+        if df is not None:
+            return df
+
+        df = loader()
+        with trace.span("cache store", "cache") as s:
+            self.store(base, df)
+            s.rows = len(df)
+        return df
+
+    def lookup(self, path, variant="", should_stop=None):
+        """The cached frame for ``path``, or ``None`` if it hasn't been stored."""
+        return self._cached(self._base(path, variant, should_stop))
+
+    def _base(self, path, variant, should_stop=None):
+        with trace.span("digest", "cache") as s:
+            base = self._entry(self._digest(path, should_stop), variant)
+            s.bytes = os.path.getsize(path)
+        return base
+
+    def _cached(self, base):
+        for ext in (".feather", ".pkl"):
+            if os.path.exists(base + ext):
+                with trace.span("cache load", "cache") as s:
+                    try:
+                        df = self._load(base + ext)
+                    except Exception:
+                        self._remove(base + ext)
+                        return None
+                    s.rows, s.bytes = len(df), os.path.getsize(base + ext)
+                os.utime(base + ext)
+                return df
+        return None
+
+    def store(self, base, df):
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            save_frame(base, df)
+        except Exception as e:
+            # 캐시 실패는 변환을 막지 않는다
+            print(f"⚠ Cache store failed: {e}")
+            return
+        self.evict()
+
+    @staticmethod
+    def _load(entry):
+        return load_frame(entry)
+
+    def _entries(self):
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for name in os.listdir(self.root):
+            if name.endswith((".feather", ".pkl")):
+                full = os.path.join(self.root, name)
+                st = os.stat(full)
+                out.append((st.st_mtime, st.st_size, full))
+        return out
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits ``max_bytes``."""
+        self.sweep()
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, full in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(full)
+            total -= size
+
+    def sweep(self, age=STALE_TMP_SECONDS):
+        """Remove temporary files older than ``age`` seconds, left by a writer that was killed."""
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - age
+        removed = 0
+        for name in os.listdir(self.root):
+            full = os.path.join(self.root, name)
+            if name.endswith(".tmp") and os.path.getmtime(full) <= cutoff:
+                self._remove(full)
+                removed += 1
+        return removed
+
+    def invalidate(self, path=None):
+        """Forget one source file (by content) or, with no path, everything."""
+        prefix = self._digest(path) if path else ""
+        removed = 0
+        for _, _, full in self._entries():
+            if os.path.basename(full).startswith(prefix):
+                self._remove(full)
+                removed += 1
+        if path is None:
+            removed += self.sweep(age=0)
+        return removed
+
+    @staticmethod
+    def _remove(full):
+        try:
+            os.remove(full)
+        except OSError as e:
+            print(f"⚠ Fail to remove: {e}")
+
+
+def save_frame(base, df):
+    """Write ``df`` to ``base.feather`` (``base.pkl`` where Arrow can't hold it); returns the path.
+
+    The file is written under a temporary name and moved into place, so
+    readers never see a partial frame.
+    """
+    tmp = f"{base}.{os.getpid()}.tmp"
+    try:
+        path = None
+        if HAVE_ARROW and _arrow_safe(df):
+            try:
+                df.reset_index().to_feather(tmp)
+                path = base + ".feather"
+            except Exception:
+                # Arrow 가 못 담는 값이면 아래에서 pickle 로 쓴다
+                pass
+        if path is None:
+            df.to_pickle(tmp)
+            path = base + ".pkl"
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def load_frame(path, memory_map=True):
+    """Read a frame written by :func:`save_frame`.
+
+    Pass ``memory_map=False`` for a file that is about to be replaced:
+    Windows won't replace a file that is still mapped.
+    """
+    if path.endswith(".feather"):
+        df = feather.read_table(path, memory_map=memory_map).to_pandas()
+        return df.set_index(df.columns[0]).rename_axis(None)
+    return pd.read_pickle(path)
+
+
+def _arrow_safe(df):
+    # Feather 는 문자열 열 이름과 열마다 단일 타입만 허용한다
+    if not all(isinstance(c, str) for c in df.columns) or df.index.name in df.columns:
+        return False
+    for col in df.columns[df.dtypes == object]:
+        # 열 전체를 본다 (infer_dtype 은 벡터화되어 있다); "mixed..." 는 여러 타입이 섞인 열
+        if pd.api.types.infer_dtype(df[col], skipna=True).startswith(("mixed", "unknown")):
+            return False
+    return True
+
+
+default_cache = ExportCache()
+
+
+def main(argv):
+    if not argv or argv[0] not in ("stats", "clear"):
+        print(__doc__)
+        return 2
+    if argv[0] == "stats":
+        entries = default_cache._entries()
+        print(f"{default_cache.root}: {len(entries)} entries, "
+              f"{sum(s for _, s, _ in entries) / 1024 ** 2:.1f} MB "
+              f"(cap {default_cache.max_bytes / 1024 ** 2:.0f} MB)")
+        for mtime, size, full in sorted(entries, reverse=True):
+            print(f"  {time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime))}  "
+                  f"{size / 1024 ** 2:8.1f} MB  {os.path.basename(full)}")
+        return 0
+    paths = argv[1:] or [None]
+    removed = sum(default_cache.invalidate(p) for p in paths)
+    print(f"{removed} cache entries removed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,49 @@
+"""Cooperative cancellation.
+
+Long-running steps take a ``should_stop`` callable (e.g.
+``lambda: self.stop_requested``) and call :func:`checkpoint` at their chunk
+boundaries: every block the readers pull off disk, every profile and
+transform step of a plan, every few thousand rows the xlsx writer streams
+and every Excel job. :class:`Cancelled` then unwinds the stack within a
+fraction of a second; writers delete the file they were writing, and the
+caller removes its own temp files with :func:`discard`.
+"""
+import os
+import time
+
+
+class Cancelled(Exception):
+    """Raised at a cancellation point once ``should_stop()`` is true."""
+
+    def __init__(self, message="취소되었습니다."):
+        super().__init__(message)
+
+
+def checkpoint(should_stop):
+    if should_stop is not None and should_stop():
+        raise Cancelled()
+
+
+def discard(*paths, timeout=1.0):
+    """Remove ``paths`` that exist, retrying while Excel may still hold them open.
+
+    Returns the paths that could not be removed within ``timeout`` seconds.
+    """
+    pending = [p for p in paths if p and os.path.exists(p)]
+    deadline = time.monotonic() + timeout
+    while pending:
+        left = []
+        for path in pending:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                left.append(path)
+        pending = left
+        if not pending or time.monotonic() >= deadline:
+            break
+        time.sleep(0.05)
+    for path in pending:
+        print(f"⚠ Fail to remove: {path}")
+    return pending
@@ -0,0 +1,298 @@
+"""Command line for scheduled month-end runs, without Qt.
+
+    python -m billing convert --customer CustomerA --input export.xlsx --out reports
+    python -m billing convert-all --input partner.csv --out reports
+    python -m billing mail --reports reports --dry-run
+    python -m billing ingest --input daily.csv
+    python -m billing finalize --out reports
+
+Every result is printed to stdout as one JSON object per line, e.g.
+``{"command": "convert", "customer": "CustomerA", "status": "ok", ...}``.
+With ``--progress`` the conversions also write ``"status": "progress"``
+records (stage, percent, ETA in seconds) to stderr, at most once a second.
+A report written without its pivot chart because Excel isn't available
+gets ``"status": "warning"`` and the reason in ``"warnings"``.
+``--trace FILE`` records the stages as a Chrome trace (:mod:`billing.trace`).
+The exit status is 0 when everything succeeded, 1 when any step failed and
+2 for usage errors. pandas and the report writers are imported by the
+subcommands, so ``--help`` and argument errors return immediately.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+
+def _emit(record, stream=None):
+    stream = stream or sys.stdout
+    stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    stream.flush()
+
+
+def _month(text):
+    try:
+        return datetime.strptime(text, "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {text!r}")
+
+
+def _tracker(jobs, args, customers):
+    sink = None
+    if args.progress:
+        sink = lambda snap: _emit({"command": args.command, "status": "progress", "stage": snap.stage,
+                                   "percent": snap.percent, "eta": None if snap.eta is None else round(snap.eta, 1)},
+                                  sys.stderr)
+    return jobs.report_progress(customers, args.input, sink=sink, interval=1.0)
+
+
+def _paths(result):
+    if result is None:
+        return []
+    return list(result) if isinstance(result, (list, tuple)) else [result]
+
+
+class _Charts:
+    """:func:`billing.automation.add_pivot_chart`, reporting a missing Excel per report instead of failing."""
+
+    def __init__(self):
+        self.skipped = {}
+
+    def __call__(self, path, sheet_name, chart_spec, should_stop=None):
+        from billing.automation import ExcelUnavailable, add_pivot_chart
+
+        try:
+            add_pivot_chart(path, sheet_name, chart_spec, should_stop=should_stop)
+        except ExcelUnavailable as e:
+            self.skipped[path] = f"pivot chart skipped: {e}"
+
+    def mark(self, record):
+        """``record`` with ``status: warning`` and the reasons when a chart of its paths was skipped."""
+        warnings = [self.skipped[p] for p in record.get("paths", []) if p in self.skipped]
+        if warnings:
+            record.update(status="warning", warnings=warnings)
+        return record
+
+
+def cmd_convert(args):
+    from billing import jobs
+
+    started = time.perf_counter()
+    profile = jobs.profile_for(args.customer)
+    os.makedirs(args.out, exist_ok=True)
+    tracker = _tracker(jobs, args, [args.customer])
+    df = jobs.load_export(args.input, [args.customer] if profile.filter_column == "CustomerName" else None,
+                          progress=tracker.reporter("read", 100))
+    charts = _Charts()
+    result = jobs.build_report(args.customer, df, args.output, save_dir=args.out, billing_month=args.month,
+                               chart=charts, progress=tracker.update, output_format=args.format)
+    tracker.finish()
+    _emit(charts.mark({"command": "convert", "customer": args.customer, "status": "ok", "rows": len(df),
+                       "paths": _paths(result), "seconds": round(time.perf_counter() - started, 3)}))
+    return 0
+
+
+def cmd_convert_all(args):
+    from billing import jobs
+    from billing.profiles import CSP_CUSTOMERS
+
+    customers = args.customers or CSP_CUSTOMERS
+    started = time.perf_counter()
+    os.makedirs(args.out, exist_ok=True)
+    tracker = _tracker(jobs, args, customers)
+    df = jobs.load_export(args.input, customers, progress=tracker.reporter("read", 100))
+    last = [time.perf_counter()]
+    charts = _Charts()
+
+    def on_report(customer, path):
+        now = time.perf_counter()
+        _emit(charts.mark({"command": "convert-all", "customer": customer, "status": "ok",
+                           "paths": _paths(path), "seconds": round(now - last[0], 3)}))
+        last[0] = now
+
+    results = jobs.convert_all(df, customers, args.out, chart=charts, on_report=on_report,
+                               billing_month=args.month, progress=tracker.update, output_format=args.format)
+    tracker.finish()
+    for customer, path in results.items():
+        if path is None:
+            _emit({"command": "convert-all", "customer": customer, "status": "empty", "paths": []})
+    _emit({"command": "convert-all", "status": "done", "rows": len(df),
+           "written": sum(1 for p in results.values() if p), "customers": len(customers),
+           "seconds": round(time.perf_counter() - started, 3)})
+    return 0
+
+
+def cmd_ingest(args):
+    from billing.incremental import DailyStore
+
+    started = time.perf_counter()
+    store = DailyStore(args.store) if args.store else DailyStore()
+    result = store.ingest(args.input, args.customers, billing_month=args.month)
+    if result.skipped:
+        _emit({"command": "ingest", "status": "skipped", "month": result.month, "input": args.input})
+        return 0
+    for customer, delta in result.customers.items():
+        _emit({"command": "ingest", "customer": customer, "status": "ok", "month": result.month,
+               "added": delta.added, "changed": delta.changed, "removed": delta.removed,
+               "unchanged": delta.unchanged, "rows": delta.rows})
+    _emit({"command": "ingest", "status": "done", "month": result.month, "customers": len(result.customers),
+           "seconds": round(time.perf_counter() - started, 3)})
+    return 0
+
+
+def cmd_preview(args):
+    from billing.incremental import DailyStore
+
+    store = DailyStore(args.store) if args.store else DailyStore()
+    month = store.month(args.month)
+    for customer in args.customers or store.customers(month):
+        totals = store.preview(customer, month)
+        if totals is None:
+            _emit({"command": "preview", "customer": customer, "status": "empty", "month": month})
+            continue
+        record = {"command": "preview", "customer": customer, "status": "ok", "month": month,
+                  "total": round(float(totals["total"].sum()), 2), "rows": int(totals["rows"].sum())}
+        if args.detail:
+            record["items"] = [{"item": list(idx) if isinstance(idx, tuple) else idx,
+                                "total": round(float(row.total), 2), "rows": int(row.rows)}
+                               for idx, row in totals.iterrows()]
+        _emit(record)
+    return 0
+
+
+def cmd_finalize(args):
+    from billing.incremental import DailyStore
+
+    started = time.perf_counter()
+    store = DailyStore(args.store) if args.store else DailyStore()
+    month = store.month(args.month)
+    os.makedirs(args.out, exist_ok=True)
+
+    charts = _Charts()
+
+    def on_report(customer, path):
+        _emit(charts.mark({"command": "finalize", "customer": customer, "status": "ok", "month": month,
+                           "paths": _paths(path)}))
+
+    results = store.finalize(args.out, month, args.customers, chart=charts, on_report=on_report)
+    for customer, path in results.items():
+        if path is None:
+            _emit({"command": "finalize", "customer": customer, "status": "empty", "paths": []})
+    _emit({"command": "finalize", "status": "done", "month": month,
+           "written": sum(1 for p in results.values() if p), "seconds": round(time.perf_counter() - started, 3)})
+    return 0
+
+
+class _DryRunSink:
+    """Composes every message but hands nothing to Outlook or SMTP."""
+
+    def signature(self):
+        return None
+
+    def emit(self, message):
+        return "dry-run"
+
+
+def _sink(args):
+    from billing import mail
+
+    if args.dry_run:
+        return _DryRunSink()
+    if args.sink == "eml":
+        return mail.EmlSink(args.eml_dir or args.reports)
+    if args.sink == "smtp":
+        return mail.SmtpSink(args.smtp_host, args.smtp_port)
+    return mail.OutlookDraftSink()
+
+
+def cmd_mail(args):
+    from billing import jobs, mail
+
+    billing_month, _ = jobs.billing_period(billing_month=args.month)
+    index = mail.attachment_index(args.reports)
+    attachments = mail.resolve_attachments(index, billing_month)
+    customers = args.customers or list(mail.MAIL_TEMPLATES)
+    sink = _sink(args)
+    # 한 번만 만들어 목록 출력과 전송에 같이 쓴다
+    composer = mail.MailComposer(signature=sink.signature())
+    messages = {m.customer: m for m in composer.compose(customers, billing_month, attachments)}
+    results = mail.emit_batch(messages.values(), sink)
+    for customer in customers:
+        message = messages.get(customer)
+        if message is None:
+            _emit({"command": "mail", "customer": customer, "status": "no-attachment"})
+            continue
+        _emit({"command": "mail", "customer": customer, "status": "dry-run" if args.dry_run else "ok",
+               "subject": message.subject, "to": list(message.to), "cc": list(message.cc),
+               "attachments": message.attachments, "result": results.get(customer)})
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="billing", description="Month-end billing reports without the GUI.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="build one customer's report")
+    convert.add_argument("--customer", required=True)
+    convert.add_argument("--input", required=True, help="usage export (.xlsx or .csv)")
+    convert.add_argument("--out", required=True, help="output folder")
+    convert.add_argument("--output", help="report path (defaults to the profile's file name in --out)")
+    convert.set_defaults(func=cmd_convert)
+
+    convert_all = sub.add_parser("convert-all", help="build every CSP customer's report from one export")
+    convert_all.add_argument("--input", required=True)
+    convert_all.add_argument("--out", required=True)
+    convert_all.add_argument("--customers", nargs="+", help="defaults to every CSP customer")
+    convert_all.set_defaults(func=cmd_convert_all)
+
+    mail = sub.add_parser("mail", help="draft or send the report mails")
+    mail.add_argument("--reports", required=True, help="folder holding the written reports")
+    mail.add_argument("--sink", choices=["outlook", "eml", "smtp"], default="outlook")
+    mail.add_argument("--eml-dir", help="where the eml sink writes (defaults to --reports)")
+    mail.add_argument("--smtp-host", default="localhost")
+    mail.add_argument("--smtp-port", type=int, default=1025)
+    mail.add_argument("--customers", nargs="+", help="defaults to every mail template")
+    mail.add_argument("--dry-run", action="store_true", help="resolve subjects and attachments only")
+    mail.set_defaults(func=cmd_mail)
+
+    ingest = sub.add_parser("ingest", help="merge a daily export into the running month")
+    ingest.add_argument("--input", required=True, help="daily usage export (.xlsx or .csv)")
+    ingest.add_argument("--customers", nargs="+", help="defaults to every customer the export has columns for")
+    ingest.set_defaults(func=cmd_ingest)
+
+    preview = sub.add_parser("preview", help="running totals of the ingested days")
+    preview.add_argument("--customers", nargs="+", help="defaults to every ingested customer")
+    preview.add_argument("--detail", action="store_true", help="include the totals per pivot row item")
+    preview.set_defaults(func=cmd_preview)
+
+    finalize = sub.add_parser("finalize", help="write the reports from the ingested days")
+    finalize.add_argument("--out", required=True, help="output folder")
+    finalize.add_argument("--customers", nargs="+", help="defaults to every ingested customer")
+    finalize.set_defaults(func=cmd_finalize)
+
+    for p in (ingest, preview, finalize):
+        p.add_argument("--store", help="where the daily data is kept (defaults to the user cache)")
+    for p in (convert, convert_all, mail):
+        p.add_argument("--month", type=_month, help="billing month YYYY-MM (defaults to last month)")
+    ingest.add_argument("--month", type=_month, help="billing month YYYY-MM (defaults to the export's latest date)")
+    for p in (preview, finalize):
+        p.add_argument("--month", type=_month, help="billing month YYYY-MM (defaults to the latest ingested)")
+    for p in (convert, convert_all):
+        p.add_argument("--format", choices=["pivot", "summary"],
+                       help="pivot table or static summary sheet (defaults to each profile's output)")
+        p.add_argument("--progress", action="store_true", help="report progress and ETA on stderr")
+        p.add_argument("--trace", help="write a Chrome trace of the run's stages to this file")
+    return parser
+
+
+def main(argv=None):
+    from billing import trace
+
+    args = build_parser().parse_args(argv)
+    try:
+        with trace.recording(args.command, getattr(args, "trace", None)):
+            return args.func(args)
+    except Exception as e:
+        _emit({"command": args.command, "status": "error", "error": str(e), "type": type(e).__name__})
+        return 1
@@ -0,0 +1,272 @@
+"""CustomerK's four report flows, free of any UI.
+
+CustomerK is billed from several exports rather than one profile:
+
+* PEC - the partner export's CustomerB rows with a CW_PEC_Pivot,
+* CostManagement - the portal's ``Data`` sheet with a CW_Cost_Pivot,
+* EA - the Korean-header EA export split per subscription
+  (:mod:`billing.subscriptions`),
+* CSP - two or more source files, read in parallel, merged into one workbook
+  (:mod:`billing.merge`).
+
+BillingMasterApp asks for the files and the save location and calls these;
+the benchmarks call them directly.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from queue import Empty
+
+from billing import trace
+from billing.cancel import checkpoint
+from billing.merge import csp_layout, write_merged_workbook
+from billing.readers import cached_export, read_export
+from billing.subscriptions import SubscriptionSplit, normalize_subscriptions, write_subscription_workbook
+from billing.xlsx import PivotSpec, write_pivot_report
+
+PEC_CUSTOMER = "CustomerB"
+PEC_PIVOT = PivotSpec("CW_PEC_Pivot", ["MeterCategory", "MeterName"], "BillingPreTaxTotal",
+                      filters={"EntitlementDescription": "CustomerB"})
+COST_PIVOT = PivotSpec("CW_Cost_Pivot", ["ServiceName", "Meter"], "Cost", "합계 Cost")
+EA_ACCOUNT_COLUMN = "계정이름 (AccountName)"
+EA_ACCOUNT = "CustomerK"
+
+
+def _source_options(path, sheet_name=None):
+    if sheet_name is not None and os.path.splitext(path)[1].lower() in (".xlsx", ".xls"):
+        return {"sheet_name": sheet_name}
+    return {}
+
+
+def read_source(path, cache=None, sheet_name=None, should_stop=None, progress=None):
+    """Read one CustomerK source: an xlsx sheet, or a csv in UTF-8 or CP949.
+
+    The csv's encoding is detected from its first bytes
+    (:func:`billing.readers.detect_encoding`), so it is parsed only once.
+    """
+    return read_export(path, progress=progress, cache=cache, should_stop=should_stop,
+                       **_source_options(path, sheet_name))
+
+
+# 파싱 중 메모리: 작업 프로세스 하나의 기본 크기 + 파일 크기의 몇 배 (측정값에 여유를 둔 어림값)
+_WORKER_BYTES = 150 * 1024 ** 2
+_PARSE_FACTOR = {".xlsx": 30, ".xls": 30, ".csv": 8}
+
+
+def parse_estimate(path):
+    """Rough peak memory of a worker process parsing ``path``."""
+    factor = _PARSE_FACTOR.get(os.path.splitext(path)[1].lower(), 8)
+    return _WORKER_BYTES + os.path.getsize(path) * factor
+
+
+def available_memory():
+    """Bytes of memory available to new processes, or ``None`` where unknown."""
+    try:
+        with open("/proc/meminfo") as fh:
+            for line in fh:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if sys.platform == "win32":
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong)] + [
+                (name, ctypes.c_ulonglong) for name in (
+                    "ullTotalPhys", "ullAvailPhys", "ullTotalPageFile", "ullAvailPageFile",
+                    "ullTotalVirtual", "ullAvailVirtual", "ullAvailExtendedVirtual")]
+
+        status = MemoryStatus(dwLength=ctypes.sizeof(MemoryStatus))
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+    return None
+
+
+# 작업 프로세스 안에서 쓰는 진행률 큐와 취소 이벤트 (_init_worker 가 채운다)
+_queue = None
+_stop = None
+
+
+def _init_worker(queue, stop):
+    global _queue, _stop
+    _queue, _stop = queue, stop
+    # 부모가 더 읽지 않는 진행률 때문에 종료가 막히지 않도록
+    _queue.cancel_join_thread()
+
+
+def _read_job(index, path, cache, sheet_name):
+    def report(pct):
+        # 100 은 결과를 받은 부모가 알린다
+        if pct < 100:
+            _queue.put((index, pct))
+
+    return read_source(path, cache=cache, sheet_name=sheet_name, should_stop=_stop.is_set, progress=report)
+
+
+def read_sources(paths, cache=None, sheet_name=None, should_stop=None, progress=None, max_workers=None,
+                 memory_budget=None):
+    """:func:`read_source` every file of ``paths`` in parallel; frames come back in ``paths`` order.
+
+    Parsing a workbook holds the GIL, so each file is read in its own process
+    (one per core at most) and N files take about as long as the slowest.
+    Files already in ``cache`` are loaded directly. The biggest files start
+    first, and a file only starts while the estimated peak of the running
+    parses (:func:`parse_estimate`) fits ``memory_budget`` - by default
+    half of :func:`available_memory` - so at least one always runs.
+    ``progress(path, percent)`` is called per file as it is read.
+    """
+    frames = [None] * len(paths)
+    pending = []
+    for i, path in enumerate(paths):
+        checkpoint(should_stop)
+        if cache is not None:
+            frames[i] = cached_export(path, cache, should_stop, **_source_options(path, sheet_name))
+        if frames[i] is None:
+            pending.append(i)
+        elif progress:
+            progress(path, 100)
+
+    workers = min(len(pending), max_workers or os.cpu_count() or 1)
+    with trace.span("read sources", "io", files=len(paths), parsed=len(pending), workers=workers) as s:
+        if workers <= 1:
+            for i in pending:
+                report = (lambda pct, p=paths[i]: progress(p, pct)) if progress else None
+                frames[i] = read_source(paths[i], cache=cache, sheet_name=sheet_name, should_stop=should_stop,
+                                        progress=report)
+        else:
+            _read_parallel(paths, frames, pending, workers, cache, sheet_name, should_stop, progress,
+                           memory_budget)
+        s.rows = sum(len(f) for f in frames)
+        s.bytes = sum(os.path.getsize(p) for p in paths)
+    return frames
+
+
+def _read_parallel(paths, frames, pending, workers, cache, sheet_name, should_stop, progress, memory_budget):
+    if memory_budget is None:
+        available = available_memory()
+        memory_budget = available // 2 if available else float("inf")
+    estimate = {i: parse_estimate(paths[i]) for i in pending}
+    queued = sorted(pending, key=estimate.get, reverse=True)
+
+    # Windows 와 같은 spawn 방식: GUI 스레드가 있는 프로세스를 fork 하지 않는다
+    context = multiprocessing.get_context("spawn")
+    queue, stop = context.Queue(), context.Event()
+    running = {}
+    before = set(multiprocessing.active_children())
+    # with 블록을 쓰지 않는다: 취소할 때 실행 중인 파싱이 끝나기를 기다리지 않기 위해
+    pool = ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(queue, stop))
+    try:
+        while queued or running:
+            while queued and len(running) < workers and (
+                    not running or sum(estimate[i] for i in running.values()) + estimate[queued[0]]
+                    <= memory_budget):
+                i = queued.pop(0)
+                running[pool.submit(_read_job, i, paths[i], cache, sheet_name)] = i
+            done, _ = wait(running, timeout=0.1, return_when=FIRST_COMPLETED)
+            _drain(queue, paths, frames, progress)
+            for future in done:
+                i = running.pop(future)
+                frames[i] = future.result()
+                if progress:
+                    progress(paths[i], 100)
+            checkpoint(should_stop)
+    except BaseException:
+        # 작업 프로세스는 stop 을 보고 다음 읽기에서 Cancelled 로 끝난다; 기다리지 않고 돌아간다
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        stragglers = [p for p in multiprocessing.active_children() if p not in before]
+        # 큐와 이벤트는 작업 프로세스가 모두 끝날 때까지 살려 둔다 (시작 중인 프로세스가 아직 연다)
+        threading.Thread(target=_reap, args=(stragglers, _STOP_GRACE, (queue, stop)), daemon=True).start()
+        raise
+    pool.shutdown()
+
+
+# 취소 뒤 작업 프로세스가 스스로 끝나기를 기다리는 시간 (초); 넘기면 강제로 끝낸다
+_STOP_GRACE = 10.0
+
+
+def _reap(processes, grace, keep=()):
+    deadline = time.monotonic() + grace
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+    for process in processes:
+        if process.is_alive():
+            # 캐시에 쓰다 만 임시 파일은 ExportCache 가 치운다
+            process.terminate()
+
+
+def _drain(queue, paths, frames, progress):
+    while True:
+        try:
+            i, pct = queue.get_nowait()
+        except Empty:
+            return
+        # 다 읽은 파일에 늦게 도착한 진행률은 버린다
+        if progress and frames[i] is None:
+            progress(paths[i], pct)
+
+
+def pec_file_name(billing_month):
+    return f"{billing_month:%Y%m}_CustomerB.xlsx"
+
+
+def pec_rows(df):
+    """The partner export's CustomerB rows."""
+    with trace.span("filter", customer=PEC_CUSTOMER) as s:
+        rows = df[df["CustomerName"] == PEC_CUSTOMER]
+        s.rows = len(df)
+    if rows.empty:
+        raise Exception("CustomerB 데이터가 없습니다.")
+    return rows
+
+
+def write_pec_report(path, rows, should_stop=None):
+    """:func:`pec_rows` with the CW_PEC_Pivot."""
+    return write_pivot_report(path, rows, "Data", "Summary", PEC_PIVOT, should_stop)
+
+
+def write_cost_report(path, df, should_stop=None):
+    """The CostManagement ``Data`` sheet with the CW_Cost_Pivot."""
+    return write_pivot_report(path, df, "Data", "Billing", COST_PIVOT, should_stop)
+
+
+def ea_rows(df):
+    """CustomerK's rows of an EA export, subscription names normalised."""
+    with trace.span("filter", customer=EA_ACCOUNT) as s:
+        rows = df[df[EA_ACCOUNT_COLUMN] == EA_ACCOUNT]
+        s.rows = len(df)
+        return normalize_subscriptions(rows) if not rows.empty else rows
+
+
+def ea_split(billing_month):
+    yymm = f"{billing_month.year % 100:02d}{billing_month.month:02d}"
+    return SubscriptionSplit(
+        summary_sheet="CustomerB",
+        main_sheet=f"CustomerB{yymm}_비용데이터",
+        subscriptions={"CustomerB": "A15", "CustomerB-1": "E15", "CustomerB-2": "I15"},
+        summary_title="1. CustomerB",
+        detail_title="2. CustomerB",
+    )
+
+
+def ea_file_name(billing_month):
+    return f"CustomerB{billing_month:%Y%m}비용.xlsx"
+
+
+def write_ea_report(path, rows, billing_month, should_stop=None):
+    """Subscription-split workbook from :func:`ea_rows`."""
+    return write_subscription_workbook(path, rows, ea_split(billing_month), should_stop)
+
+
+def csp_file_name(billing_month):
+    return f"CustomerB {billing_month.month}월 비용.xlsx"
+
+
+def write_csp_report(path, frames, billing_month, should_stop=None):
+    """Merge the CSP source frames into the CustomerK CSP workbook."""
+    layout = csp_layout(f"{billing_month:%Y}", f"{billing_month:%m}")
+    return write_merged_workbook(path, frames, layout, should_stop)
@@ -0,0 +1,393 @@
+"""Incremental processing of the daily usage exports.
+
+The daily exports are cumulative: each file holds the month so far, and
+earlier days are sometimes revised. :class:`DailyStore` ingests them one by
+one and keeps, per billing month and customer,
+
+* the customer's rows - the partition BillingWorker would cut from the
+  month-end export;
+* a signature per usage key, i.e. per (date, subscription, meter): the row
+  count and an order-independent hash of the key's rows;
+* running totals of the customer's pivot value per pivot item.
+
+Only keys whose signature is new or different are merged, and the totals are
+updated by the difference. A file is authoritative for the dates it
+contains: keys of those dates that it no longer lists are removed, keys of
+other dates are kept, so cumulative and single-day files can be mixed.
+A file that was ingested before (same bytes) is skipped.
+
+At month end :meth:`DailyStore.finalize` writes the reports from the stored
+rows without parsing the export again; :meth:`DailyStore.preview` reads the
+running totals, so a mid-month figure costs one small file read.
+
+    python -m billing ingest --input daily.csv
+    python -m billing preview
+    python -m billing finalize --out reports
+"""
+import json
+import os
+import shutil
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from billing import trace
+from billing.automation import add_pivot_chart
+from billing.cache import file_digest, load_frame, save_frame
+from billing.cancel import checkpoint
+from billing.jobs import build_report, load_export
+from billing.plan import compile_plan, transform
+from billing.profiles import CSP_CUSTOMERS, CUSTOMER_PROFILES, PROFILES
+from billing.readers import detect_encoding
+
+DEFAULT_STORE_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.expanduser("~/.cache"), "BillingMaster", "daily"
+)
+KEY_COLUMN = "__usage_key"
+
+
+@dataclass
+class UsageKey:
+    """Columns naming one usage line: its date, subscription and meter."""
+    date: str
+    subscription: str
+    meter: tuple
+
+    @property
+    def columns(self):
+        return [self.date, self.subscription, *self.meter]
+
+
+USAGE_KEYS = [
+    # CSP 파트너 export (MeterId 가 없으면 미터 이름 열로 구분)
+    UsageKey("UsageDate", "SubscriptionId", ("MeterId",)),
+    UsageKey("UsageDate", "SubscriptionId", ("MeterCategory", "MeterSubCategory", "MeterName")),
+    # EA export
+    UsageKey("날짜 (Date)", "구독이름 (SubscriptionName)",
+             ("미터범주 (MeterCategory)", "미터하위범주 (MeterSubCategory)", "요금제이름 (MeterName)")),
+    # CostManagement
+    UsageKey("UsageDate", "SubscriptionName", ("ServiceName", "Meter")),
+]
+
+
+def usage_key(columns):
+    """The first :data:`USAGE_KEYS` entry whose columns are all in ``columns``."""
+    columns = set(columns)
+    for key in USAGE_KEYS:
+        if columns.issuperset(key.columns):
+            return key
+    raise Exception("날짜/구독/미터 열을 찾을 수 없어 일별 처리를 할 수 없습니다.")
+
+
+def usage_dates(series):
+    return pd.to_datetime(series, errors="coerce").dt.normalize()
+
+
+def file_dates(frame):
+    """The distinct usage dates (as days) in ``frame``; a file is authoritative for these."""
+    dates = usage_dates(frame[usage_key(frame.columns).date]).dropna()
+    return np.unique(dates.to_numpy())
+
+
+def key_ids(frame, key):
+    """A uint64 id per row for its (date, subscription, meter), dates compared as days."""
+    keys = frame[key.columns].assign(**{key.date: usage_dates(frame[key.date])})
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def signatures(ids, hashes, dates):
+    """Per key id: the wrapping sum of its rows' hashes, its row count and its date."""
+    if len(ids) == 0:
+        return pd.DataFrame({"signature": np.array([], dtype=np.uint64), "rows": np.array([], dtype=np.int64),
+                             "date": pd.Series([], dtype="datetime64[ns]")},
+                            index=pd.Index(np.array([], dtype=np.uint64), name="key"))
+    order = np.argsort(ids, kind="stable")
+    sorted_ids = ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    # 합은 2^64 로 감긴다: 행 순서와 무관한 그룹 해시
+    signature = np.add.reduceat(hashes[order], starts)
+    rows = np.diff(np.r_[starts, len(ids)])
+    return pd.DataFrame({"signature": signature, "rows": rows, "date": dates[order][starts]},
+                        index=pd.Index(sorted_ids[starts], name="key"))
+
+
+def _fields(profile):
+    """Pivot fields the running totals are kept by (filters too, so previews can apply them)."""
+    pivot = profile.pivot
+    return list(dict.fromkeys([*pivot.rows, *pivot.columns, *pivot.filters]))
+
+
+def running_totals(profile, frame):
+    """Sum and row count of the pivot's value field per pivot item of ``frame``."""
+    fields = _fields(profile)
+    frame = transform(profile, frame)
+    values = pd.to_numeric(frame[profile.pivot.value_field], errors="coerce").fillna(0.0)
+    grouped = values.groupby([frame[f] for f in fields], dropna=False, sort=False)
+    return pd.DataFrame({"total": grouped.sum(), "rows": grouped.size()})
+
+
+def _combine(totals, gone, fresh, fields):
+    parts = [t for t in (totals, None if gone is None else -gone, fresh) if t is not None and len(t)]
+    if not parts:
+        return fresh
+    merged = pd.concat(parts).groupby(level=list(range(len(fields))), dropna=False, sort=False).sum()
+    return merged[merged["rows"] > 0]
+
+
+@dataclass
+class Delta:
+    """What one ingest changed for one customer (counts of usage keys)."""
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    rows: int = 0
+
+
+@dataclass
+class IngestResult:
+    month: str
+    customers: dict
+    skipped: bool = False
+
+
+def _applies(profile, columns):
+    if profile.filter_column is not None and profile.filter_column not in columns:
+        return False
+    pivot = profile.pivot
+    return all(f in columns for f in [*pivot.rows, *pivot.columns, *pivot.filters])
+
+
+class DailyStore:
+    """Per-month, per-customer row stores and running totals under ``root``."""
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+
+    # ── layout ────────────────────────────────────────────────────────────
+    def _month_dir(self, month):
+        return os.path.join(self.root, month)
+
+    def _customer_dir(self, month, customer):
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in customer)
+        return os.path.join(self.root, month, safe)
+
+    def months(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(m for m in os.listdir(self.root) if os.path.exists(os.path.join(self.root, m, "files.json")))
+
+    def month(self, billing_month=None):
+        """``"YYYY-MM"`` of ``billing_month``, or the latest month ingested."""
+        if billing_month is not None:
+            return f"{billing_month:%Y-%m}"
+        months = self.months()
+        if not months:
+            raise Exception("일별 처리된 데이터가 없습니다.")
+        return months[-1]
+
+    def files(self, month):
+        """Files ingested for ``month``, oldest first."""
+        path = os.path.join(self._month_dir(month), "files.json")
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def customers(self, month):
+        directory = self._month_dir(month)
+        if not os.path.isdir(directory):
+            return []
+        found = []
+        for name in sorted(os.listdir(directory)):
+            state = os.path.join(directory, name, "state.json")
+            if os.path.exists(state):
+                with open(state, encoding="utf-8") as fh:
+                    found.append(json.load(fh)["customer"])
+        return found
+
+    # ── frames ────────────────────────────────────────────────────────────
+    @staticmethod
+    def _frame(directory, name):
+        for ext in (".feather", ".pkl"):
+            path = os.path.join(directory, name + ext)
+            if os.path.exists(path):
+                return load_frame(path, memory_map=False)
+        return None
+
+    def _load(self, month, customer):
+        directory = self._customer_dir(month, customer)
+        if not os.path.exists(os.path.join(directory, "state.json")):
+            return None, None, None
+        rows, keys = self._frame(directory, "rows"), self._frame(directory, "keys")
+        totals = self._frame(directory, "totals")
+        totals = totals.set_index(_fields(CUSTOMER_PROFILES[customer]))
+        keys.index = keys.index.astype(np.uint64)
+        return rows, keys.rename_axis("key"), totals
+
+    def _save(self, month, customer, rows, keys, totals, state):
+        directory = self._customer_dir(month, customer)
+        tmp, old = f"{directory}.{os.getpid()}.tmp", f"{directory}.old"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        try:
+            save_frame(os.path.join(tmp, "rows"), rows)
+            save_frame(os.path.join(tmp, "keys"), keys)
+            save_frame(os.path.join(tmp, "totals"), totals.reset_index())
+            with open(os.path.join(tmp, "state.json"), "w", encoding="utf-8") as fh:
+                json.dump(state, fh, ensure_ascii=False, indent=1)
+            # 이전 상태는 새 디렉터리가 자리를 잡은 뒤에 지운다
+            shutil.rmtree(old, ignore_errors=True)
+            if os.path.exists(directory):
+                os.replace(directory, old)
+            os.replace(tmp, directory)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            shutil.rmtree(old, ignore_errors=True)
+
+    def rows(self, customer, month):
+        """``customer``'s stored rows of ``month`` in date order."""
+        rows, _, _ = self._load(month, customer)
+        if rows is None:
+            return None
+        rows = rows.drop(columns=KEY_COLUMN)
+        order = np.argsort(usage_dates(rows[usage_key(rows.columns).date]).to_numpy(), kind="stable")
+        return rows.iloc[order].reset_index(drop=True)
+
+    # ── ingest ────────────────────────────────────────────────────────────
+    def _ingested(self, digest):
+        return next((m for m in self.months() if any(f["digest"] == digest for f in self.files(m))), None)
+
+    def ingest(self, path, customers=None, billing_month=None, should_stop=None, progress=None):
+        """Merge the daily export at ``path`` into the store.
+
+        ``customers`` defaults to every profile the export has the columns
+        for. The billing month defaults to the month of the export's latest
+        usage date. Returns an :class:`IngestResult` with a :class:`Delta`
+        per customer.
+        """
+        digest = file_digest(path, should_stop)
+        month = self._ingested(digest)
+        if month is not None:
+            return IngestResult(month, {}, skipped=True)
+
+        if customers is None and path.lower().endswith(".csv"):
+            header = pd.read_csv(path, nrows=0, encoding=detect_encoding(path).encoding).columns
+            customers = [p.customer for p in PROFILES if _applies(p, header)]
+        csp_only = bool(customers) and all(c in CSP_CUSTOMERS for c in customers)
+        # 고객사 행만 남기며 읽는 csv 는 걸러지기 전의 청크에서 파일의 날짜를 모은다
+        chunk_dates = []
+        df = load_export(path, customers if csp_only else None, progress=progress, cache=None,
+                         should_stop=should_stop,
+                         on_chunk=lambda chunk: chunk_dates.append(file_dates(chunk)))
+        if customers is None:
+            customers = [p.customer for p in PROFILES if _applies(p, df.columns)]
+        if not customers:
+            raise Exception("일별 처리할 고객사 데이터가 없습니다.")
+
+        key = usage_key(df.columns)
+        if billing_month is None:
+            latest = usage_dates(df[key.date]).max()
+            if pd.isna(latest):
+                raise Exception(f"{key.date} 열에 날짜가 없습니다.")
+            billing_month = latest
+        month = f"{billing_month:%Y-%m}"
+        dates = np.unique(np.concatenate(chunk_dates)) if chunk_dates else file_dates(df)
+
+        deltas = {}
+        plan = compile_plan([CUSTOMER_PROFILES[c] for c in customers])
+        for source in plan.sources:
+            parts = source.partitions(df)
+            for profile in source.profiles:
+                checkpoint(should_stop)
+                with trace.span("ingest", customer=profile.customer) as s:
+                    deltas[profile.customer] = self._merge(month, profile, parts[profile.filter_value], path,
+                                                          dates)
+                    s.rows = len(parts[profile.filter_value])
+                    s.note(**asdict(deltas[profile.customer]))
+
+        files = self.files(month)
+        files.append({"file": os.path.basename(path), "digest": digest, "rows": len(df),
+                      "ingested": datetime.now().isoformat(timespec="seconds")})
+        os.makedirs(self._month_dir(month), exist_ok=True)
+        with open(os.path.join(self._month_dir(month), "files.json"), "w", encoding="utf-8") as fh:
+            json.dump(files, fh, ensure_ascii=False, indent=1)
+        return IngestResult(month, deltas)
+
+    def _merge(self, month, profile, new, source, file_dates):
+        key = usage_key(new.columns)
+        fields = _fields(profile)
+        new = new.reset_index(drop=True)
+        ids = key_ids(new, key)
+        hashes = pd.util.hash_pandas_object(new, index=False).to_numpy()
+        dates = usage_dates(new[key.date]).to_numpy()
+        incoming = signatures(ids, hashes, dates)
+
+        rows, keys, totals = self._load(month, profile.customer)
+        if rows is None:
+            rows = new.iloc[0:0].assign(**{KEY_COLUMN: np.array([], dtype=np.uint64)})
+            keys = signatures(ids[:0], hashes[:0], dates[:0])
+
+        known = keys.index.isin(incoming.index)
+        # 파일에 있는 날짜의 키 가운데 파일에 없는 것은 지운다 (이 고객사 행이 없는 날짜도)
+        removed = keys.index[~known & keys["date"].isin(file_dates)]
+        common = incoming.index.intersection(keys.index)
+        before, after = keys.loc[common], incoming.loc[common]
+        changed = common[(before["signature"].to_numpy() != after["signature"].to_numpy())
+                         | (before["rows"].to_numpy() != after["rows"].to_numpy())]
+        added = incoming.index.difference(keys.index)
+        drop, take = removed.union(changed), added.union(changed)
+
+        stale = rows[KEY_COLUMN].isin(drop).to_numpy()
+        pick = np.isin(ids, take)
+        fresh = new[pick].assign(**{KEY_COLUMN: ids[pick]})
+        merged = pd.concat([rows[~stale], fresh], ignore_index=True)
+        keys = pd.concat([keys.drop(drop), incoming.loc[take]])
+        gone = running_totals(profile, rows[stale].drop(columns=KEY_COLUMN)) if stale.any() else None
+        totals = _combine(totals, gone, running_totals(profile, fresh.drop(columns=KEY_COLUMN)), fields)
+
+        delta = Delta(len(added), len(changed), len(removed), len(common) - len(changed), len(merged))
+        state = {"customer": profile.customer, "key": key.columns, "source": os.path.basename(source),
+                 "updated": datetime.now().isoformat(timespec="seconds"), "last": asdict(delta)}
+        self._save(month, profile.customer, merged, keys, totals, state)
+        return delta
+
+    # ── month end / preview ───────────────────────────────────────────────
+    def preview(self, customer, month):
+        """Running totals of ``customer``'s pivot value by its row fields.
+
+        Pivot filters with a value are applied first, as the report's pivot
+        would. Returns a frame with ``total`` and ``rows`` columns.
+        """
+        _, _, totals = self._load(month, customer)
+        if totals is None:
+            return None
+        pivot = CUSTOMER_PROFILES[customer].pivot
+        flat = totals.reset_index()
+        for name, value in pivot.filters.items():
+            if value is not None:
+                flat = flat[flat[name] == value]
+        return flat.groupby(list(pivot.rows), dropna=False)[["total", "rows"]].sum()
+
+    def finalize(self, save_dir, month=None, customers=None, today=None, chart=add_pivot_chart,
+                 should_stop=None, on_report=None):
+        """Write every stored customer's report of ``month`` into ``save_dir``.
+
+        Returns ``{customer: path}`` like :func:`billing.jobs.convert_all`.
+        """
+        month = month or self.month()
+        billing_month = datetime.strptime(month, "%Y-%m")
+        results = {}
+        for customer in customers or self.customers(month):
+            checkpoint(should_stop)
+            rows = self.rows(customer, month)
+            if rows is None or rows.empty:
+                results[customer] = None
+                continue
+            results[customer] = build_report(customer, rows, save_dir=save_dir, today=today, chart=chart,
+                                             billing_month=billing_month, should_stop=should_stop)
+            if on_report:
+                on_report(customer, results[customer])
+        return results
@@ -0,0 +1,98 @@
+"""The conversion steps behind BillingWorker, free of any UI.
+
+BillingProgram's workers and the command line (:mod:`billing.cli`) both
+call these, so a scheduled run does exactly what the buttons do.
+"""
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+from billing.automation import add_pivot_chart
+from billing.cache import default_cache
+from billing.plan import OUTPUT_FORMATS, compile_plan
+from billing.profiles import CUSTOMER_PROFILES
+from billing.progress import Progress
+from billing.readers import CSP_COLUMNS, read_export, read_filtered_csv
+
+# 단계별 작업량 비중 (합 100). csv 는 xlsx 보다 열 배쯤 빨리 읽힌다.
+# 차트는 측정할 수 없어 고객사당 예상 시간으로 보간한다
+REPORT_STAGES = {"read": 45, "write": 45, "chart": 10}
+CSV_REPORT_STAGES = {"read": 10, "write": 80, "chart": 10}
+CHART_SECONDS = 15
+
+
+def billing_period(today=None, billing_month=None):
+    """``(billing_month, today)``; the billing month defaults to the previous month."""
+    today = today or datetime.today()
+    return billing_month or today.replace(day=1) - timedelta(days=1), today
+
+
+def load_export(path, customers=None, progress=None, cache=default_cache, should_stop=None, on_chunk=None):
+    """Read an export; a CSP csv is streamed keeping only ``customers``' rows.
+
+    A CSP xlsx is read with only the ``PartnerId``...``BenefitType`` columns.
+    ``on_chunk`` sees every chunk of a streamed csv before it is filtered.
+    """
+    if customers and path.lower().endswith(".csv"):
+        # 대용량 CSP csv 는 청크 단위로 읽으면서 대상 고객사 행만 남긴다
+        return read_filtered_csv(path, "CustomerName", customers, progress=progress, should_stop=should_stop,
+                                 on_chunk=on_chunk)
+    if customers and path.lower().endswith(".xlsx"):
+        return read_export(path, progress=progress, cache=cache, should_stop=should_stop, project=CSP_COLUMNS,
+                           usecols=["CustomerName"])
+    return read_export(path, progress=progress, cache=cache, should_stop=should_stop)
+
+
+def report_progress(customers, source=None, sink=None, interval=0.25):
+    """A :class:`Progress` over the read, write and chart stages of billing ``customers``.
+
+    ``source`` is the export's path; it picks the read/write weights. Pass
+    ``tracker.reporter("read", 100)`` as the reader's ``progress`` and
+    ``tracker.update`` as the plan's.
+    """
+    charts = sum(1 for c in customers if c in CUSTOMER_PROFILES and CUSTOMER_PROFILES[c].chart)
+    weights = CSV_REPORT_STAGES if source and source.lower().endswith(".csv") else REPORT_STAGES
+    stages = {name: weight for name, weight in weights.items() if name != "chart" or charts}
+    return Progress(stages, expected={"chart": CHART_SECONDS * charts}, sink=sink, interval=interval)
+
+
+def profile_for(customer, output_format=None):
+    profile = CUSTOMER_PROFILES.get(customer)
+    if profile is None:
+        raise Exception(f"{customer} 변환 설정이 없습니다.")
+    if output_format is not None and output_format != profile.output:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"알 수 없는 출력 형식 {output_format!r}")
+        profile = replace(profile, output=output_format)
+    return profile
+
+
+def build_report(customer, df, output_file=None, save_dir=None, today=None, chart=add_pivot_chart,
+                 billing_month=None, should_stop=None, progress=None, output_format=None):
+    """Write ``customer``'s report; returns its path (a list for split profiles).
+
+    ``output_file`` defaults to the profile's file name inside ``save_dir``.
+    ``output_format`` (``"pivot"`` or ``"summary"``) overrides the profile's
+    ``output``.
+    """
+    profile = profile_for(customer, output_format)
+    if profile.split and save_dir is None:
+        raise Exception("저장 폴더가 선택되지 않았습니다.")
+    billing_month, today = billing_period(today, billing_month)
+    outputs = {customer: output_file} if output_file else None
+    plan = compile_plan([profile])
+    return plan.execute(df, billing_month, outputs, save_dir=save_dir, chart=chart, should_stop=should_stop,
+                        today=today, progress=progress)[customer]
+
+
+def convert_all(df, customers, save_dir, today=None, chart=add_pivot_chart, should_stop=None, on_report=None,
+                billing_month=None, progress=None, output_format=None):
+    """Bill ``customers`` from one frame with a single fused plan.
+
+    Returns ``{customer: path}``, ``None`` for customers without rows.
+    ``output_format`` is as for :func:`build_report`.
+    """
+    billing_month, today = billing_period(today, billing_month)
+    # 고객사 프로필을 한 실행 계획으로 묶어 projection/groupby 를 한 번만 수행
+    plan = compile_plan([profile_for(c, output_format) for c in customers])
+    return plan.execute(df, billing_month, save_dir=save_dir, chart=chart, should_stop=should_stop,
+                        on_report=on_report, skip_empty=True, today=today, progress=progress)
@@ -0,0 +1,277 @@
+"""Batch composition of the monthly report mails.
+
+Every customer's mail is described by a :class:`MailTemplate`. The
+:class:`MailComposer` reads the Outlook signature once, builds all messages
+in one pass and hands them to a sink:
+
+* :class:`OutlookDraftSink` - saves (or displays) Outlook drafts,
+* :class:`EmlSink` - writes ``.eml`` files Outlook opens as unsent drafts,
+* :class:`SmtpSink` - sends to an SMTP server, e.g. a local stand-in such
+  as ``python -m aiosmtpd -n -l localhost:1025``.
+
+Templates take the :func:`billing.plan.month_fields` fields (``yy``,
+``mm``, ``year``, ...) plus ``customer``.
+"""
+import glob
+import mimetypes
+import os
+import smtplib
+import time
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+
+from billing import automation
+from billing.attachments import AttachmentIndex
+from billing.plan import month_fields
+
+DEFAULT_TO = ("abcd@abcd.com",)
+DEFAULT_CC = ("abcd@abcd.com",)
+DEFAULT_BODY = """
+<div style="font-family:'맑은 고딕'; font-size:10pt;">
+    mail content
+</div>
+"""
+ATTACHMENT_NAME = "{customer} {year}년 {mm}월 Azure 사용량.xlsx"
+
+_SIGNATURE_DIR = os.path.join(os.environ.get("APPDATA", ""), "Microsoft", "Signatures")
+
+
+@dataclass
+class MailTemplate:
+    """One customer's mail. ``reports`` names the report customers whose
+    files are attached (defaults to ``customer`` itself)."""
+    customer: str
+    subject: str
+    to: tuple = DEFAULT_TO
+    cc: tuple = DEFAULT_CC
+    body: str = DEFAULT_BODY
+    attachment: str = ATTACHMENT_NAME
+    reports: tuple = None
+
+    @property
+    def report_customers(self):
+        return self.reports or (self.customer,)
+
+
+@dataclass
+class Message:
+    customer: str
+    subject: str
+    to: tuple
+    cc: tuple
+    html: str
+    attachments: list = field(default_factory=list)
+
+
+MAIL_TEMPLATES = {t.customer: t for t in [
+    MailTemplate("CustomerA", "[CustomerA] {yy}년 {mm}월 Azure 사용량 송부 건"),
+    MailTemplate("CustomerB", "[CustomerB] {mm}월 비용보고서&점검 보고서 전달드립니다"),
+    MailTemplate("CustomerC/D", "[CustomerC/D] {yy}.{mm}월 빌링 안내", reports=("CustomerC", "CustomerD")),
+    MailTemplate("CustomerE", "[CustomerE] {yy}년 {mm}월 사용량 보고서"),
+    MailTemplate("CustomerF", "[CustomerF] {yy}년 {mm}월 Azure 사용량 송부의 건"),
+    MailTemplate("CustomerG", "[CustomerG] Azure {yy}년 {mm}월 사용량 파일 전달"),
+    MailTemplate("CustomerH", "[CustomerH] Azure {yy}년 {mm}월 한달 사용비용"),
+    MailTemplate("CustomerI", "[CustomerI] {yy}.{mm} Microsoft Azure 사용량"),
+    MailTemplate("CustomerJ", "[Azure 청구 금액] CustomerJ {yy}년 {mm}월"),
+    MailTemplate("CustomerK", "[CustomerK] {yy}년 {mm}월 사용 비용"),
+    MailTemplate("CustomerL", "[CustomerL] {mm}월 비용보고서 전달드립니다."),
+    MailTemplate("CustomerM", "[CustomerM] {mm}월 비용보고서 전달드립니다."),
+]}
+
+
+def template_fields(customer, billing_month):
+    return dict(month_fields(billing_month), customer=customer)
+
+
+def attachment_index(folder, templates=MAIL_TEMPLATES):
+    """An :class:`AttachmentIndex` over ``folder`` for every mailed report."""
+    customers = list(dict.fromkeys(c for t in templates.values() for c in t.report_customers))
+    extra = {t.customer: [t.attachment] for t in templates.values() if t.customer in customers}
+    return AttachmentIndex(folder, customers, extra)
+
+
+def resolve_attachments(index, billing_month, templates=MAIL_TEMPLATES):
+    """``{mail customer: [paths]}`` for every template with at least one file in ``index``."""
+    found = {}
+    for customer, template in templates.items():
+        files = [p for c in template.report_customers for p in index.lookup(c, billing_month)]
+        if files:
+            found[customer] = list(dict.fromkeys(files))
+    return found
+
+
+def signature_from_files(directory=_SIGNATURE_DIR):
+    """HTML of the newest Outlook signature file, or ``None``."""
+    files = glob.glob(os.path.join(directory, "*.htm"))
+    if not files:
+        return None
+    newest = max(files, key=os.path.getmtime)
+    for encoding in ("utf-8-sig", "cp949"):
+        try:
+            with open(newest, encoding=encoding) as fh:
+                return fh.read()
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def signature_from_outlook(outlook, timeout=5.0):
+    """Open one throw-away inspector and read the signature Outlook inserts."""
+    mail = outlook.CreateItem(0)
+    mail.Display(False)
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            automation.pump_messages()
+            html = mail.HTMLBody
+            if html and "</html>" in html.lower():
+                return html
+            time.sleep(0.05)
+        return mail.HTMLBody or ""
+    finally:
+        mail.Close(1)  # olDiscard
+
+
+class MailComposer:
+    """Builds every customer's message with one captured signature."""
+
+    def __init__(self, templates=MAIL_TEMPLATES, signature=None):
+        self.templates = templates
+        self.signature = signature
+
+    def compose(self, customers, billing_month, attachments):
+        """``attachments`` maps a customer to its file paths; customers without files are skipped."""
+        messages = []
+        for customer in customers:
+            template = self.templates.get(customer)
+            files = attachments.get(customer) or []
+            if template is None or not files:
+                continue
+            fields = template_fields(customer, billing_month)
+            messages.append(Message(
+                customer=customer,
+                subject=template.subject.format(**fields),
+                to=tuple(template.to),
+                cc=tuple(template.cc),
+                html=template.body + (self.signature or ""),
+                attachments=list(files),
+            ))
+        return messages
+
+
+class OutlookDraftSink:
+    """Creates an Outlook mail per message; saved to Drafts, or shown with ``display``."""
+
+    def __init__(self, outlook=None, display=False):
+        self.outlook = outlook
+        self.display = display
+
+    def signature(self):
+        return signature_from_files() or signature_from_outlook(self._outlook())
+
+    def _outlook(self):
+        if self.outlook is None:
+            self.outlook = automation.dispatch("Outlook.Application")
+        return self.outlook
+
+    def emit(self, message):
+        mail = self._outlook().CreateItem(0)
+        mail.To = "; ".join(message.to)
+        mail.CC = "; ".join(message.cc)
+        mail.Subject = message.subject
+        mail.HTMLBody = message.html
+        for path in message.attachments:
+            mail.Attachments.Add(os.path.abspath(path))
+        if self.display:
+            mail.Display(False)
+        else:
+            mail.Save()
+        return mail
+
+
+def to_email(message, sender=None):
+    msg = EmailMessage()
+    if sender:
+        msg["From"] = sender
+    msg["To"] = ", ".join(message.to)
+    if message.cc:
+        msg["Cc"] = ", ".join(message.cc)
+    msg["Subject"] = message.subject
+    msg["Date"] = formatdate(localtime=True)
+    msg["Message-ID"] = make_msgid()
+    msg.set_content("이 메일은 HTML 형식입니다.")
+    msg.add_alternative(message.html, subtype="html")
+    for path in message.attachments:
+        ctype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        maintype, subtype = ctype.split("/", 1)
+        with open(path, "rb") as fh:
+            msg.add_attachment(fh.read(), maintype=maintype, subtype=subtype,
+                               filename=os.path.basename(path))
+    return msg
+
+
+class EmlSink:
+    """Writes ``{customer}.eml`` files flagged ``X-Unsent`` so Outlook opens them as drafts."""
+
+    def __init__(self, directory, sender=None):
+        self.directory = directory
+        self.sender = sender
+
+    def signature(self):
+        return signature_from_files()
+
+    def emit(self, message):
+        os.makedirs(self.directory, exist_ok=True)
+        msg = to_email(message, self.sender)
+        msg["X-Unsent"] = "1"
+        name = "".join("_" if ch in '\\/:*?"<>|' else ch for ch in message.customer)
+        path = os.path.join(self.directory, f"{name}.eml")
+        with open(path, "wb") as fh:
+            fh.write(msg.as_bytes())
+        return path
+
+
+class SmtpSink:
+    """Sends every message over one SMTP connection."""
+
+    def __init__(self, host="localhost", port=1025, sender="billing@localhost"):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self._smtp = None
+
+    def signature(self):
+        return signature_from_files()
+
+    def emit(self, message):
+        if self._smtp is None:
+            self._smtp = smtplib.SMTP(self.host, self.port)
+        self._smtp.send_message(to_email(message, self.sender))
+        return f"smtp://{self.host}:{self.port}"
+
+    def close(self):
+        if self._smtp is not None:
+            self._smtp.quit()
+            self._smtp = None
+
+
+def send_batch(customers, billing_month, attachments, sink, templates=MAIL_TEMPLATES):
+    """Compose every customer's mail and emit it through ``sink``.
+
+    Returns ``{customer: sink result}``. The signature is read once per batch.
+    """
+    composer = MailComposer(templates, signature=sink.signature())
+    return emit_batch(composer.compose(customers, billing_month, attachments), sink)
+
+
+def emit_batch(messages, sink):
+    """Emit already composed ``messages`` through ``sink``; returns ``{customer: sink result}``."""
+    results = {}
+    try:
+        for message in messages:
+            results[message.customer] = sink.emit(message)
+    finally:
+        if hasattr(sink, "close"):
+            sink.close()
+    return results
@@ -0,0 +1,116 @@
+"""In-memory merge of the CustomerK CSP source files.
+
+Each source frame is classified by its content (the value the old flow
+peeked at in ``G2``), the frames are stacked under a single header and the
+result is written in one :class:`billing.xlsx.XlsxWorkbook` pass together
+with the source sheets and their pivots. Nothing is appended row by row or
+copied through the clipboard.
+"""
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from billing import trace
+from billing.xlsx import PivotSpec, PivotTable, XlsxWorkbook, row_fraction
+
+
+@dataclass
+class SourceRule:
+    """A source file whose ``column``-th field (0-based) starts with ``value``.
+
+    The default column 6 is "G", the cell the sheets used to be named by.
+    """
+    sheet: str
+    value: object
+    column: int = 6
+
+    def matches(self, frame):
+        return len(frame) > 0 and frame.shape[1] > self.column and frame.iat[0, self.column] == self.value
+
+
+@dataclass
+class MergeLayout:
+    """Sheets of the merged workbook.
+
+    ``pivots`` is a list of ``(sheet, PivotSpec)``; ``sheet`` is either the
+    data sheet or one of the source sheets named by ``rules``.
+    """
+    pivot_sheet: str
+    data_sheet: str
+    rules: list
+    pivots: list = field(default_factory=list)
+    titles: dict = field(default_factory=dict)
+
+
+def classify_sources(frames, rules):
+    """Map each rule's sheet name to the frame it matches.
+
+    Every rule takes the first not yet claimed frame that matches it, so two
+    files with the same marker still land on different sheets.
+    """
+    claimed = {}
+    remaining = list(frames)
+    for rule in rules:
+        for i, frame in enumerate(remaining):
+            if rule.matches(frame):
+                claimed[rule.sheet] = remaining.pop(i)
+                break
+        else:
+            raise ValueError(f"{rule.sheet} 원본 파일을 찾을 수 없습니다. (열 {rule.column + 1} = {rule.value!r})")
+    return claimed
+
+
+def stack_frames(frames):
+    """Concatenate frames under the first frame's header.
+
+    Frames of the same width are stacked by position, like pasting the rows
+    below the first sheet; otherwise columns are matched by name.
+    """
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame()
+    first = frames[0]
+    aligned = [first]
+    for frame in frames[1:]:
+        if frame.shape[1] == first.shape[1] and list(frame.columns) != list(first.columns):
+            frame = frame.set_axis(first.columns, axis=1)
+        aligned.append(frame)
+    return pd.concat(aligned, ignore_index=True)
+
+
+def write_merged_workbook(path, frames, layout, should_stop=None, progress=None):
+    """Classify ``frames``, stack them and write the merged workbook to ``path``."""
+    with trace.span("merge", sources=len(frames)) as s:
+        sources = classify_sources(frames, layout.rules)
+        data = stack_frames(sources[rule.sheet] for rule in layout.rules)
+        s.rows = len(data)
+
+    sizes = {layout.data_sheet: len(data)}
+    sizes.update((rule.sheet, len(sources[rule.sheet])) for rule in layout.rules)
+    total = sum(sizes.values()) + sum(sizes[sheet] for sheet, _ in layout.pivots)
+    with XlsxWorkbook(path, should_stop, row_fraction(progress, total)) as wb:
+        refs = {layout.data_sheet: (wb.add_dataframe(layout.data_sheet, data), data)}
+        for rule in layout.rules:
+            refs[rule.sheet] = (wb.add_dataframe(rule.sheet, sources[rule.sheet]), sources[rule.sheet])
+        pivots = [PivotTable(spec, refs[sheet][1], refs[sheet][0]) for sheet, spec in layout.pivots]
+        pivot_sheet = wb.add_pivot_sheet(layout.pivot_sheet, pivots, titles=layout.titles)
+        wb.order_sheets([pivot_sheet] + [ref.name for ref, _ in refs.values()])
+    return path
+
+
+def csp_layout(year, month):
+    """Layout the CustomerK CSP billing workbook has always had."""
+    aoai, entraid = "CustomerB", "CustomerB1"
+    detail_rows = ["SubscriptionName", "ServiceName", "Product"]
+    return MergeLayout(
+        pivot_sheet=f"CustomerB{year}{month}",
+        data_sheet=f"CustomerB{year}{month}_비용데이터",
+        rules=[SourceRule(aoai, "CustomerB"), SourceRule(entraid, "CustomerB")],
+        pivots=[
+            (f"CustomerB{year}{month}_비용데이터",
+             PivotSpec("PivotSumCost", ["SubscriptionName"], "Cost", "합계 Cost", location="A3")),
+            (entraid, PivotSpec("PivotEntraid", detail_rows, "Cost", "합계 Cost", location="A13")),
+            (aoai, PivotSpec("PivotAOAI", detail_rows, "Cost", "합계 Cost", location="D13")),
+        ],
+        titles={"A2": "1. CustomerB", "A12": "2. CustomerB"},
+    )
@@ -0,0 +1,272 @@
+"""Customer profiles compiled into a fused execution plan.
+
+A :class:`CustomerProfile` describes one report as data: which rows belong
+to the customer, which columns are kept, the markup, the pivot and the file
+name. :func:`compile_plan` groups profiles that read the same rows so a
+whole batch of customers costs one projection and one groupby per source
+column, however many profiles there are.
+"""
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+
+from billing import trace
+from billing.cancel import checkpoint
+from billing.pricing import apply_markups
+from billing.xlsx import PivotSpec, write_pivot_report, write_summary_report
+
+
+@dataclass
+class ChartSpec:
+    title: str
+    width: int
+    height: int
+    major_unit: int
+
+
+@dataclass
+class SplitSpec:
+    """Write one workbook per value of ``column`` instead of a single report.
+
+    ``groups`` maps each value to its file name template; values listed in
+    ``skip_nonpositive`` are skipped when that column sums to zero or less.
+    The workbooks are written one after another in ``groups`` order, so of
+    two groups with the same file name the later one is kept.
+    """
+    column: str
+    groups: dict
+    skip_nonpositive: dict = field(default_factory=dict)
+
+OUTPUT_FORMATS = ("pivot", "summary")
+
+
+@dataclass
+class CustomerProfile:
+    """One customer's report.
+
+    ``output`` is ``"pivot"`` for a refreshable pivot table or
+    ``"summary"`` for a static summary sheet with the same totals.
+    """
+    customer: str
+    pivot: PivotSpec
+    file_name: str
+    filter_column: str = None
+    filter_value: str = None
+    project: tuple = None
+    markups: list = field(default_factory=list)
+    lowercase: list = field(default_factory=list)
+    data_sheet: str = "{month_name} Azure 사용량"
+    pivot_sheet: str = "{month_name} Pivot"
+    chart: ChartSpec = None
+    split: SplitSpec = None
+    output: str = "pivot"
+
+    @property
+    def source_key(self):
+        """Profiles with the same key read the same projected partition source."""
+        return (self.filter_column, self.project)
+
+
+def month_fields(billing_month, today=None):
+    today = today or datetime.today()
+    return {
+        "year": billing_month.year,
+        "yy": billing_month.year % 100,
+        "month": billing_month.month,
+        "mm": f"{billing_month.month:02d}",
+        "month_name": f"{billing_month.year}년 {billing_month.month}월",
+        "today": today.strftime("%Y%m%d"),
+    }
+
+
+@dataclass
+class _Source:
+    column: str
+    project: tuple
+    profiles: list
+
+    def partitions(self, df):
+        """Project once, then split by ``column`` in a single pass."""
+        frame = df if self.project is None else df.loc[:, self.project[0]:self.project[1]]
+        if self.column is None:
+            return {None: frame}
+        wanted = {p.filter_value for p in self.profiles}
+        keys = df[self.column]
+        if len(wanted) == 1:
+            value = next(iter(wanted))
+            return {value: frame[keys == value]}
+        parts = {value: frame.iloc[0:0] for value in wanted}
+        parts.update((value, part) for value, part in frame.groupby(keys, sort=False) if value in wanted)
+        return parts
+
+
+class ExecutionPlan:
+    def __init__(self, sources):
+        self.sources = sources
+
+    @property
+    def profiles(self):
+        return [p for s in self.sources for p in s.profiles]
+
+    def execute(self, df, billing_month, outputs=None, save_dir=None, chart=None,
+                should_stop=None, on_report=None, skip_empty=False, today=None, progress=None):
+        """Run every profile against ``df``.
+
+        ``outputs`` maps a customer to its report path (defaults to the
+        profile's file name inside ``save_dir``). ``chart(path, sheet, spec,
+        should_stop=...)`` is called for profiles that need a pivot chart,
+        once every report has been written. Returns a dict of customer ->
+        written path(s), ``None`` for customers without rows.
+
+        ``should_stop`` is checked between profiles, transform steps and
+        written row chunks; :class:`billing.cancel.Cancelled` is raised once
+        it returns true, after the report being written has been removed.
+
+        ``progress(stage, fraction)`` is told how far the ``"write"`` stage
+        (weighted by rows) and the ``"chart"`` stage have got.
+        """
+        fields = month_fields(billing_month, today)
+        outputs = outputs or {}
+        progress = progress or _no_progress
+        work = []
+        for source in self.sources:
+            with trace.span("partition", column=source.column, profiles=len(source.profiles)) as s:
+                parts = source.partitions(df)
+                s.rows = len(df)
+            work += [(profile, parts[profile.filter_value]) for profile in source.profiles]
+        total = sum(len(frame) for _, frame in work) or 1
+
+        results = {}
+        charts = []
+        written = 0
+        for profile, frame in work:
+            checkpoint(should_stop)
+            if skip_empty and frame.empty:
+                results[profile.customer] = None
+                continue
+            path = outputs.get(profile.customer)
+            if path is None and not profile.split:
+                path = _join(save_dir, profile.file_name.format(**fields))
+            rows = len(frame)
+            report = lambda f, base=written, rows=rows: progress("write", (base + f * rows) / total)
+            with trace.span("report", customer=profile.customer) as s:
+                results[profile.customer] = self._run(profile, frame, path, save_dir, fields, should_stop, report)
+                s.rows, s.bytes = rows, _size(results[profile.customer])
+            written += rows
+            if profile.chart and chart and profile.output == "pivot" and not profile.split:
+                charts.append(profile)
+            elif on_report:
+                on_report(profile.customer, results[profile.customer])
+        progress("write", 1.0)
+
+        # 차트는 Excel 세션을 연달아 쓰도록 모든 보고서를 쓴 뒤에 그린다
+        for i, profile in enumerate(charts):
+            checkpoint(should_stop)
+            progress("chart", i / len(charts))
+            path = results[profile.customer]
+            with trace.span("chart", customer=profile.customer):
+                chart(path, profile.pivot_sheet.format(**fields), profile.chart, should_stop=should_stop)
+            if on_report:
+                on_report(profile.customer, path)
+        progress("chart", 1.0)
+        return results
+
+    @staticmethod
+    def _run(profile, frame, path, save_dir, fields, should_stop=None, progress=None):
+        frame = transform(profile, frame, should_stop)
+        checkpoint(should_stop)
+
+        data_sheet = profile.data_sheet.format(**fields)
+        pivot_sheet = profile.pivot_sheet.format(**fields)
+        if profile.split:
+            return _run_split(profile, frame, save_dir, fields, data_sheet, pivot_sheet, should_stop, progress)
+
+        _writer(profile)(path, frame, data_sheet, pivot_sheet, profile.pivot, should_stop, progress)
+        return path
+
+
+def transform(profile, frame, should_stop=None):
+    """``frame`` as ``profile`` reports it: lowercased columns and markups applied."""
+    with trace.span("transform", customer=profile.customer) as s:
+        for column in profile.lowercase:
+            frame = frame.assign(**{column: frame[column].str.lower()})
+            checkpoint(should_stop)
+        frame = apply_markups(frame, profile.markups)
+        s.rows = len(frame)
+    return frame
+
+
+def _no_progress(stage, fraction):
+    pass
+
+
+def _run_split(profile, frame, save_dir, fields, data_sheet, pivot_sheet, should_stop=None, progress=None):
+    """Partition ``frame`` by the split column once and write the groups one after another."""
+    split = profile.split
+    keys = frame[split.column]
+    fold = split.column in profile.lowercase
+    # 소문자로 바꾼 열이면 그룹 이름도 소문자로 맞춰 비교한다
+    wanted = {(value.lower() if fold else value): value for value in split.groups}
+    parts = {wanted[key]: part for key, part in frame.groupby(keys, sort=False) if key in wanted}
+
+    skip_columns = sorted({c for v, c in split.skip_nonpositive.items() if v in parts})
+    totals = frame.groupby(keys, sort=False)[skip_columns].sum() if skip_columns else None
+
+    # 같은 파일로 가는 그룹은 마지막 그룹이 남는다 (순서대로 덮어쓰던 동작과 같음)
+    jobs = {}
+    for value, file_pattern in split.groups.items():
+        if value not in parts:
+            continue
+        if value in split.skip_nonpositive:
+            key = value.lower() if fold else value
+            if totals.at[key, split.skip_nonpositive[value]] <= 0:
+                continue
+        save_path = _join(save_dir, file_pattern.format(**fields))
+        spec = replace(profile.pivot, name=profile.pivot.name.format(group=value))
+        jobs[save_path] = (parts[value], spec)
+
+    # 그룹별 진행률을 행 수로 가중해 하나로 합친다
+    sizes = [len(part) for part, _ in jobs.values()]
+    done = [0.0] * len(jobs)
+
+    def reporter(i):
+        if progress is None:
+            return None
+
+        def report(fraction):
+            done[i] = fraction * sizes[i]
+            progress(sum(done) / (sum(sizes) or 1))
+        return report
+
+    # 보고서 XML 은 GIL 을 잡은 채 파이썬으로 만들어지므로 스레드로 나눠도 빨라지지 않는다
+    writer = _writer(profile)
+    return [writer(path, part, data_sheet, pivot_sheet, spec, should_stop, reporter(i))
+            for i, (path, (part, spec)) in enumerate(jobs.items())]
+
+
+def _writer(profile):
+    if profile.output == "summary":
+        return write_summary_report
+    if profile.output != "pivot":
+        raise ValueError(f"{profile.customer}: 알 수 없는 출력 형식 {profile.output!r}")
+    return write_pivot_report
+
+
+def _size(paths):
+    """Bytes written to ``paths`` (one path or the list a split profile returns)."""
+    paths = paths if isinstance(paths, list) else [paths]
+    return sum(os.path.getsize(p) for p in paths if p and os.path.exists(p))
+
+
+def _join(directory, name):
+    return os.path.join(directory, name) if directory else name
+
+
+def compile_plan(profiles):
+    """Fuse profiles that share a (filter column, projection) source."""
+    grouped = defaultdict(list)
+    for profile in profiles:
+        grouped[profile.source_key].append(profile)
+    return ExecutionPlan([_Source(column, project, members)
+                          for (column, project), members in grouped.items()])
@@ -0,0 +1,195 @@
+"""Fixed-point markup engine for money columns.
+
+Amounts are coerced once per column and held as int64 fixed-point units,
+so markups, tiers and rounding are exact integer column operations instead
+of per-cell float arithmetic. Values only go back to floats when the column
+is written into the frame.
+
+A column's scale follows its source precision: at least ``SCALE`` units
+per won (four decimals), more when the export carries more decimals (unit
+prices with six), up to ``MAX_DECIMALS`` as far as the column's largest
+amount leaves room in int64. Input amounts are therefore never rounded
+unless they carry more decimals than that; the marked-up result is rounded
+half up to the column's scale.
+
+Markup factors are held as integer basis points (``1/FACTOR_SCALE``); at
+the base scale a row amount stays exact in int64 up to about 80 billion
+won under a 1.15 markup (``INT64_MAX / (SCALE * factor)``). Larger amounts,
+and infinite ones, raise instead of wrapping around.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# 1 won = 10,000 units 이상: 네 자리는 Excel 통화 형식의 정밀도
+SCALE = 10_000
+MAX_DECIMALS = 9
+FACTOR_SCALE = 10_000
+# 금액 × 단위 × 배율이 int64 안에 들도록 남겨 두는 배율의 여유 (100배까지)
+_FACTOR_HEADROOM = 100 * FACTOR_SCALE
+_INT64_MAX = np.iinfo(np.int64).max
+
+ROUND_HALF_UP = "half_up"
+ROUND_DOWN = "down"
+ROUND_UP = "up"
+
+
+@dataclass
+class Tier:
+    """Use ``factor`` for rows whose amount (before markup) is below ``upto`` won."""
+    upto: float
+    factor: float
+
+
+@dataclass
+class Rounding:
+    """Round to a multiple of ``step`` won (1 = whole won, 10 = 십원 단위, ...)."""
+    step: float = 1
+    mode: str = ROUND_HALF_UP
+
+
+@dataclass
+class Markup:
+    """Multiply ``column`` by ``factor``.
+
+    With ``target`` the result goes into a new column inserted just before
+    ``column``; otherwise ``column`` is replaced. ``tiers`` (ascending by
+    ``upto``) override ``factor`` by row amount; ``factor`` applies above
+    the last tier. Non-numeric cells are left as they are.
+    """
+    column: str
+    factor: float
+    target: str = None
+    tiers: list = field(default_factory=list)
+    rounding: Rounding = None
+
+    def apply(self, frame):
+        return apply_markups(frame, [self])
+
+
+class MoneyColumn:
+    """One money column coerced to fixed-point units.
+
+    ``mask`` marks the cells that hold numbers; the other cells keep their
+    original values when the column is written back.
+    """
+
+    def __init__(self, series):
+        self.source = series
+        if pd.api.types.is_bool_dtype(series):
+            numeric, mask = None, np.zeros(len(series), dtype=bool)
+        elif pd.api.types.is_numeric_dtype(series):
+            numeric = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            mask = ~np.isnan(numeric)
+        else:
+            if pd.api.types.infer_dtype(series, skipna=True) in ("integer", "floating", "mixed-integer-float"):
+                mask = series.notna().to_numpy()
+            else:
+                # 문자열로 들어온 숫자는 원래처럼 그대로 둔다
+                kinds = series.map(type)
+                mask = kinds.isin((int, float, np.int64, np.float64)).to_numpy() & series.notna().to_numpy()
+            numeric = pd.to_numeric(series.where(mask), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        self.mask = mask
+        self.units = np.zeros(len(series), dtype=np.int64)
+        self.scale = SCALE
+        if mask.any():
+            self.scale = column_scale(numeric[mask], series.name)
+            self.units[mask] = np.rint(numeric[mask] * self.scale).astype(np.int64)
+
+    def marked(self, markup):
+        factors = _factors(markup, self.units, self.scale)
+        if len(factors) and np.abs(self.units).max() > _INT64_MAX // max(int(np.abs(factors).max()), 1):
+            largest = np.abs(self.units).max() / self.scale
+            raise OverflowError(f"'{self.source.name}' 열의 금액 {largest:,.0f} 원은 배율 {markup.factor} 을(를) "
+                                f"곱하면 고정소수점 범위를 넘습니다.")
+        units = _div_round(self.units * factors, FACTOR_SCALE, ROUND_HALF_UP)
+        if markup.rounding:
+            step = int(round(markup.rounding.step * self.scale))
+            units = _div_round(units, step, markup.rounding.mode) * step
+        return units
+
+    def to_series(self, units):
+        values = units.astype(np.float64) / self.scale
+        if self.mask.all():
+            return pd.Series(values, index=self.source.index, name=self.source.name)
+        if pd.api.types.is_numeric_dtype(self.source) and not pd.api.types.is_bool_dtype(self.source):
+            values[~self.mask] = np.nan
+            return pd.Series(values, index=self.source.index, name=self.source.name)
+        out = self.source.astype(object).copy()
+        out[self.mask] = values[self.mask]
+        return out
+
+
+def column_scale(values, name=None):
+    """Units per won for ``values``: ``SCALE`` or finer, enough for the decimals they carry.
+
+    Raises ``ValueError`` for infinite values and ``OverflowError`` when the
+    largest amount doesn't fit in int64 even at ``SCALE``.
+    """
+    if not np.all(np.isfinite(values)):
+        raise ValueError(f"'{name}' 열에 유한하지 않은 금액(inf)이 있습니다.")
+    largest = float(np.abs(values).max())
+    if largest * SCALE * FACTOR_SCALE >= _INT64_MAX:
+        raise OverflowError(f"'{name}' 열의 금액 {largest:,.0f} 원은 고정소수점 범위를 넘습니다.")
+    decimals = 4
+    while decimals < MAX_DECIMALS:
+        scaled = values * 10 ** decimals
+        if np.all(np.abs(scaled - np.rint(scaled)) < 1e-3):
+            break
+        # 자릿수를 늘리면 int64 를 넘는 열은 여기서 멈춘다
+        if largest * 10 ** (decimals + 1) * _FACTOR_HEADROOM >= _INT64_MAX:
+            break
+        decimals += 1
+    return 10 ** decimals
+
+
+def _factors(markup, units, scale=SCALE):
+    base = _basis(markup.factor)
+    if not markup.tiers:
+        return np.full(len(units), base, dtype=np.int64)
+    bounds = np.array([int(round(t.upto * scale)) for t in markup.tiers], dtype=np.int64)
+    table = np.array([_basis(t.factor) for t in markup.tiers] + [base], dtype=np.int64)
+    return table[np.searchsorted(bounds, units, side="right")]
+
+
+def _basis(factor):
+    return int(round(factor * FACTOR_SCALE))
+
+
+def _div_round(numer, denom, mode):
+    """Integer ``numer / denom`` rounded by ``mode``, symmetric around zero."""
+    sign = np.where(numer < 0, -1, 1)
+    magnitude = np.abs(numer)
+    if mode == ROUND_HALF_UP:
+        q = (magnitude + denom // 2) // denom
+    elif mode == ROUND_DOWN:
+        q = magnitude // denom
+    elif mode == ROUND_UP:
+        q = (magnitude + denom - 1) // denom
+    else:
+        raise ValueError(f"알 수 없는 반올림 방식: {mode!r}")
+    return sign * q
+
+
+def apply_markups(frame, markups):
+    """Apply ``markups`` to ``frame``, coercing each money column only once.
+
+    Markups on the same column without a ``target`` compound in order.
+    """
+    markups = [m for m in markups if m.column in frame.columns]
+    if not markups:
+        return frame
+    frame = frame.copy()
+    columns = {}
+    for markup in markups:
+        money = columns.get(markup.column)
+        if money is None:
+            money = columns[markup.column] = MoneyColumn(frame[markup.column])
+        units = money.marked(markup)
+        if markup.target:
+            frame.insert(frame.columns.get_loc(markup.column), markup.target, money.to_series(units))
+        else:
+            money.units = units
+            frame[markup.column] = money.to_series(units)
+    return frame
@@ -0,0 +1,154 @@
+"""Per-customer report profiles.
+
+Adding a customer means adding an entry here; BillingWorker and the batch
+run pick it up through :func:`billing.plan.compile_plan`.
+
+File name templates take ``year``, ``yy``, ``month``, ``mm``, ``month_name``
+and ``today`` (YYYYMMDD).
+"""
+from datetime import datetime
+
+from billing.plan import ChartSpec, CustomerProfile, SplitSpec, month_fields
+from billing.pricing import Markup
+from billing.readers import CSP_COLUMNS
+from billing.xlsx import PivotSpec
+
+EA_ROWS = [
+    "청구계정이름 (BillingAccountName)",
+    "구독이름 (SubscriptionName)",
+    "미터범주 (MeterCategory)",
+    "미터하위범주 (MeterSubCategory)",
+    "요금제이름 (MeterName)"
+]
+
+
+def _csp(customer, pivot, file_name, **kwargs):
+    return CustomerProfile(customer, pivot, file_name, filter_column="CustomerName",
+                           filter_value=customer, project=CSP_COLUMNS, **kwargs)
+
+
+PROFILES = [
+    _csp(
+        "CustomerA",
+        PivotSpec("CustomerA Pivot", ["CustomerName", "SubscriptionId", "MeterSubCategory", "MeterName"],
+                  "BillingPreTaxTotal"),
+        "iCustomerA {year}년 {mm}월 Azure 사용량.xlsx",
+        markups=[Markup("BillingPreTaxTotal", 1.15)],
+    ),
+    _csp(
+        "CustomerB",
+        PivotSpec("CustomerB", ["CustomerName", "MeterCategory", "MeterSubCategory", "MeterName"],
+                  "BillingPreTaxTotal"),
+        "CustomerB {month}월 비용보고서.xlsx",
+    ),
+    _csp(
+        "CustomerC",
+        PivotSpec("CustomerCPivot",
+                  ["CustomerName", "SubscriptionId", "MeterCategory", "MeterSubCategory", "MeterName"],
+                  "BillingPreTaxTotal"),
+        "CustomerC {yy}년 {mm}월 Azure 사용량.xlsx",
+    ),
+    _csp(
+        "CustomerD",
+        PivotSpec("CustomerD_Pivot", ["MeterCategory", "MeterName"], "BillingPreTaxTotal",
+                  filters={"EntitlementDescription": None}),
+        "{today}_{mm}월Billing.xlsx",
+    ),
+    _csp(
+        "CustomerE",
+        PivotSpec("CustomerEPivot", ["MeterCategory", "MeterName"], "BillingPreTaxTotal",
+                  filters={"CustomerName": "CustomerE"}, location="A1"),
+        "CustomerF {year}년 {month}월 Azure 사용량.xlsx",
+        chart=ChartSpec("CustomerE", 500, 200, 1000),
+    ),
+    CustomerProfile(
+        "CustomerF",
+        PivotSpec("CustomerFPivot", ["미터범주 (MeterCategory)"], "비용 (Cost)",
+                  filters={"청구계정이름 (BillingAccountName)": "CustomerF"}, location="A1"),
+        "CustomerF {year}-{mm}.xlsx",
+        chart=ChartSpec("CustomerF", 450, 300, 100000),
+    ),
+    CustomerProfile(
+        "CustomerG",
+        PivotSpec("CustomerGPivot", ["제품 (Product)", "수량 (Quantity)"], "비용 (Cost)",
+                  columns=["날짜 (Date)"],
+                  filters={
+                      "구독이름 (SubscriptionName)": "CustomerG",
+                      "청구프로필이름 (BillingProfileName)": "CustomerG",
+                      "청구프로필Id (BillingProfileId)": 58075352,
+                  },
+                  location="A1"),
+        "{yy}년 {month}월 사용 금액_Stand Egg (Azure Portal).xlsx",
+    ),
+    CustomerProfile(
+        "CustomerH",
+        PivotSpec("CustomerHPivot", ["미터범주 (MeterCategory)", "요금제이름 (MeterName)"], "비용 (Cost)",
+                  filters={"구독이름 (SubscriptionName)": "CustomerH"}, location="A1"),
+        "CustomerI {year}년 {month}월_{today}.xlsx",
+        filter_column="계정소유자Id (AccountOwnerId)",
+        filter_value="CustomerH",
+    ),
+    CustomerProfile(
+        "CustomerI",
+        PivotSpec("CustomerIPivot", EA_ROWS, "비용 (Cost)"),
+        "CustomerI {year}-{mm}.xlsx",
+    ),
+    CustomerProfile(
+        "CustomerJ",
+        PivotSpec("CustomerJPivot", EA_ROWS, "비용 (Cost)"),
+        "CustomerK {year}{mm}비용.xlsx",
+        markups=[Markup(col, 1.07) for col in ["유효가격 (EffectivePrice)", "비용 (Cost)", "단가 (UnitPrice)"]],
+    ),
+    CustomerProfile(
+        "CustomerK",
+        PivotSpec("CustomerKPivot", EA_ROWS, "비용 (Cost)"),
+        "CustomerK {year}-{mm}.xlsx",
+    ),
+    _csp(
+        "CustomerL",
+        PivotSpec("{group}_Pivot",
+                  ["CustomerName", "ResourceGroup", "MeterCategory", "MeterSubCategory", "MeterName"],
+                  "BillingTotal"),
+        "CustomerM {month}월 비용보고서.xlsx",
+        markups=[Markup("BillingPreTaxTotal", 1.1, target="BillingTotal")],
+        lowercase=["ResourceGroup"],
+        split=SplitSpec(
+            "ResourceGroup",
+            {
+                "CustomerL": "CustomerL {month}월 비용보고서(CustomerL).xlsx",
+                "CustomerL-1": "CustomerL {month}월 비용보고서(CustomerL).xlsx",
+                "CustomerL-2": "CustomerL {month}월 비용보고서(CustomerL).xlsx"
+            },
+            skip_nonpositive={"CustomerL-2": "PricingPreTaxTotal"},
+        ),
+    ),
+]
+
+CUSTOMER_PROFILES = {p.customer: p for p in PROFILES}
+
+# CustomerName 으로 나뉘는 CSP 파트너 export 고객사
+CSP_CUSTOMERS = [p.customer for p in PROFILES if p.filter_column == "CustomerName"]
+
+# 변환 프로필은 없지만 저장 파일명이 정해진 고객사
+_OTHER_FILE_NAMES = {
+    "CustomerN": "CustomerO {month}월 비용보고서.xlsx",
+    "CustomerP": "CustomerQ {mm}월 비용.xlsx",
+}
+
+
+def file_name_templates(customer):
+    """Every file name template a report for ``customer`` may be saved under."""
+    profile = CUSTOMER_PROFILES.get(customer)
+    if profile is None:
+        return [_OTHER_FILE_NAMES.get(customer, "{customer} {year}-{mm}.xlsx")]
+    templates = [profile.file_name]
+    if profile.split:
+        templates += [t for t in profile.split.groups.values() if t not in templates]
+    return templates
+
+
+def report_file_name(customer, billing_month, today=None):
+    today = today or datetime.today()
+    profile = CUSTOMER_PROFILES.get(customer)
+    template = profile.file_name if profile else _OTHER_FILE_NAMES.get(customer, "{customer} {year}-{mm}.xlsx")
+    return template.format(customer=customer, **month_fields(billing_month, today))
@@ -0,0 +1,111 @@
+"""Stage-weighted progress with an ETA.
+
+A run declares its stages and their share of the work up front, e.g.
+``{"read": 45, "transform": 5, "write": 40, "chart": 10}``; each stage then
+reports its own completion as a fraction with ``tracker.update(stage, f)``.
+Updates are plain assignments, cheap enough to make at every chunk.
+
+Readers of the tracker get a coalesced view instead of one event per update:
+
+* :meth:`Progress.snapshot` can be polled at a fixed rate (the GUI does so
+  from a ``QTimer``);
+* a ``sink`` is pushed a :class:`Snapshot` at most every ``interval``
+  seconds, plus once when the run finishes.
+
+The ETA is the remaining fraction at the throughput measured so far. Stages
+whose work cannot be measured (an Excel job) can declare an ``expected``
+duration; their fraction is then interpolated from the time spent in them,
+so the bar keeps moving while Excel is busy.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class Snapshot:
+    fraction: float
+    eta: float
+    stage: str
+    elapsed: float
+
+    @property
+    def percent(self):
+        return int(self.fraction * 100)
+
+
+def format_eta(seconds):
+    """``"약 1분 20초"``-style remaining time, or ``""`` when unknown."""
+    if seconds is None:
+        return ""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"약 {seconds}초"
+    minutes, seconds = divmod(seconds, 60)
+    return f"약 {minutes}분 {seconds:02d}초"
+
+
+class Progress:
+    """Tracks weighted stages; ``update`` is safe to call from any thread."""
+
+    def __init__(self, stages, expected=None, sink=None, interval=0.25, clock=time.monotonic):
+        self.weights = dict(stages)
+        self.expected = dict(expected or {})
+        self.sink = sink
+        self.interval = interval
+        self._clock = clock
+        self._total = sum(self.weights.values()) or 1
+        self._done = dict.fromkeys(self.weights, 0.0)
+        self._entered = {}
+        self._stage = None
+        self._started = clock()
+        self._pushed = None
+        self._lock = threading.Lock()
+
+    def update(self, stage, fraction):
+        """Set ``stage``'s completion (0-1); earlier stages count as finished."""
+        now = self._clock()
+        with self._lock:
+            if stage not in self.weights:
+                return
+            for name in self.weights:
+                if name == stage:
+                    break
+                self._done[name] = 1.0
+            self._entered.setdefault(stage, now)
+            self._stage = stage
+            self._done[stage] = max(self._done[stage], min(1.0, max(0.0, fraction)))
+        if self.sink is not None and (self._pushed is None or now - self._pushed >= self.interval):
+            self._pushed = now
+            self.sink(self.snapshot())
+
+    def reporter(self, stage, scale=1.0):
+        """``update`` bound to ``stage``; ``scale=100`` accepts whole percentages."""
+        return lambda value: self.update(stage, value / scale)
+
+    def finish(self):
+        with self._lock:
+            self._done = dict.fromkeys(self.weights, 1.0)
+        if self.sink is not None:
+            self.sink(self.snapshot())
+
+    def _stage_fraction(self, name, now):
+        done = self._done[name]
+        expected = self.expected.get(name)
+        if expected and done < 1.0 and name == self._stage:
+            # 측정할 수 없는 단계는 예상 시간으로 보간하되 끝나기 전에는 95% 에서 멈춘다
+            done = max(done, min(0.95, (now - self._entered[name]) / expected))
+        return done
+
+    def snapshot(self):
+        now = self._clock()
+        with self._lock:
+            fraction = sum(self.weights[n] * self._stage_fraction(n, now) for n in self.weights) / self._total
+            stage = self._stage
+        elapsed = now - self._started
+        eta = None
+        if fraction >= 1.0:
+            eta = 0.0
+        elif fraction >= 0.02 and elapsed >= 0.5:
+            eta = elapsed * (1.0 - fraction) / fraction
+        return Snapshot(fraction, eta, stage, elapsed)
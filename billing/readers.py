@@ -0,0 +1,295 @@
+"""Readers for the partner / EA usage exports.
+
+Progress is measured from the bytes the parser has pulled off disk, so the
+caller gets an accurate figure while the file is read instead of a second
+pass over the parsed frame. The same hook is the readers' cancellation
+point: ``should_stop`` is checked for every block the parser pulls.
+
+An .xlsx is read by :mod:`billing.xlsxreader` (calamine, or a stream of
+the sheet's XML) rather than by openpyxl cell by cell.
+
+A csv read without an explicit ``encoding`` is decoded with the codec
+:func:`detect_encoding` picks from the start of the file, so a CP949 export
+is parsed once instead of failing as UTF-8 first.
+"""
+import codecs
+import io
+import os
+from dataclasses import dataclass
+
+import pandas as pd
+
+from billing import trace
+from billing.cancel import checkpoint
+from billing.xlsxreader import read_xlsx
+
+
+class ProgressFile(io.RawIOBase):
+    """Read-only binary file that reports how far into the file the parser is.
+
+    ``callback`` receives whole percentages (0-100) and is only called when
+    the value changes, so at most ~100 notifications reach the UI thread.
+    Zip-based .xlsx readers jump to the central directory at the end of the
+    archive first, so progress counts the bytes actually consumed rather
+    than the file offset. Every read raises :class:`billing.cancel.Cancelled`
+    once ``should_stop()`` is true.
+    """
+
+    def __init__(self, path, callback=None, should_stop=None):
+        super().__init__()
+        self._fh = open(path, "rb")
+        self._size = os.fstat(self._fh.fileno()).st_size or 1
+        self._callback = callback
+        self._should_stop = should_stop
+        self._consumed = 0
+        self._last = -1
+
+    @property
+    def bytes_read(self):
+        return self._consumed
+
+    @property
+    def size(self):
+        return self._size
+
+    def _report(self, n):
+        checkpoint(self._should_stop)
+        if not n:
+            return
+        self._consumed += n
+        # 100 is reserved for the caller once parsing has finished
+        pct = min(99, self._consumed * 100 // self._size)
+        if pct != self._last:
+            self._last = pct
+            if self._callback:
+                self._callback(pct)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._fh.readinto(buffer)
+        self._report(n)
+        return n
+
+    def read(self, size=-1):
+        data = self._fh.read(size)
+        self._report(len(data))
+        return data
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._fh.seek(offset, whence)
+
+    def tell(self):
+        return self._fh.tell()
+
+    def close(self):
+        if not self.closed:
+            self._fh.close()
+        super().close()
+
+
+_BOMS = [(codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")]
+# 앞부분의 ASCII 는 빠르게 건너뛰고, 처음 나오는 비 ASCII 줄부터 이만큼을 디코딩해 본다
+_SCAN_LIMIT = 64 * 1024 * 1024
+_SAMPLE_BYTES = 1024 * 1024
+_SCAN_BLOCK = 4 * 1024 * 1024
+_KOREAN_CODECS = ("utf-8", "cp949")
+
+
+@dataclass(frozen=True)
+class Detected:
+    """A csv's codec; ``certain`` is false when the sniffed prefix was plain ASCII."""
+    encoding: str
+    certain: bool = True
+
+
+_detected = {}
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+def _validates(codec, sample, final):
+    try:
+        codecs.getincrementaldecoder(codec)().decode(sample, final)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _sniff(path):
+    with open(path, "rb") as fh:
+        head = fh.read(4)
+        for bom, codec in _BOMS:
+            if head.startswith(bom):
+                return Detected(codec)
+        fh.seek(0)
+        offset = 0
+        while offset < _SCAN_LIMIT:
+            block = fh.read(_SCAN_BLOCK)
+            if not block:
+                return Detected("utf-8")
+            if not block.isascii():
+                break
+            offset += len(block)
+        else:
+            return Detected("utf-8", certain=False)
+        # 첫 비 ASCII 바이트가 있는 줄의 처음부터 (줄바꿈은 어느 코덱이든 한 바이트)
+        first = next(i for i, b in enumerate(block) if b >= 0x80)
+        start = block.rfind(b"\n", 0, first) + 1
+        fh.seek(offset + start)
+        sample = fh.read(_SAMPLE_BYTES)
+        final = len(sample) < _SAMPLE_BYTES
+    for codec in _KOREAN_CODECS:
+        if _validates(codec, sample, final):
+            return Detected(codec)
+    raise Exception(f"{os.path.basename(path)}: 파일 인코딩을 알 수 없습니다. (UTF-8/CP949 아님)")
+
+
+def detect_encoding(path):
+    """The :class:`Detected` codec of the csv at ``path``, remembered per file.
+
+    A byte-order mark decides outright. Otherwise the leading ASCII is
+    skipped (up to 64 MB) and 1 MB from the first line with other bytes is
+    validated as UTF-8, then as CP949 (a superset of EUC-KR).
+    """
+    stamp = _stamp(path)
+    if stamp not in _detected:
+        with trace.span("detect encoding", "io", file=os.path.basename(path)) as s:
+            _detected[stamp] = _sniff(path)
+            s.note(encoding=_detected[stamp].encoding)
+    return _detected[stamp]
+
+
+def _csv_encoding(path, kwargs):
+    """Add the detected ``encoding`` to ``kwargs``; returns the detection (``None`` if given)."""
+    if "encoding" in kwargs:
+        return None
+    detected = detect_encoding(path)
+    kwargs["encoding"] = detected.encoding
+    return detected
+
+
+def _parse_csv(path, kwargs, parse, detected):
+    """``parse(kwargs)`` with the encoding :func:`_csv_encoding` put in ``kwargs``.
+
+    Only when the ASCII scan ran out before any other byte is a decode
+    error retried once as CP949, and that is remembered for the file.
+    """
+    try:
+        return parse(kwargs)
+    except UnicodeDecodeError:
+        if detected is None or detected.certain:
+            raise
+        _detected[_stamp(path)] = Detected("cp949")
+        return parse({**kwargs, "encoding": "cp949"})
+
+
+def read_export(path, progress=None, cache=None, should_stop=None, **kwargs):
+    """Load an export (.xlsx or .csv) reporting read progress in percent.
+
+    An .xlsx goes through :func:`billing.xlsxreader.read_xlsx`, so
+    ``project``/``usecols``/``dtype`` are applied while the sheet is read.
+
+    With ``cache`` (an :class:`billing.cache.ExportCache`) a file that was
+    parsed before is loaded from its columnar copy instead.
+    """
+    is_excel = path.lower().endswith((".xlsx", ".xls"))
+
+    def read(options):
+        with trace.span("parse", "io") as s, ProgressFile(path, progress, should_stop) as fh:
+            if path.lower().endswith(".xlsx"):
+                df = read_xlsx(fh, **options)
+            elif is_excel:
+                df = pd.read_excel(fh, **options)
+            else:
+                df = pd.read_csv(io.BufferedReader(fh), **options)
+            s.rows, s.bytes = len(df), fh.bytes_read
+            return df
+
+    # 캐시 키에도 인코딩이 들어가도록 먼저 정한다
+    detected = None if is_excel else _csv_encoding(path, kwargs)
+
+    def parse():
+        return read(kwargs) if is_excel else _parse_csv(path, kwargs, read, detected)
+
+    with trace.span("read", "io", file=os.path.basename(path)) as s:
+        if cache is not None:
+            df = cache.fetch(path, parse, variant=_variant(kwargs), should_stop=should_stop)
+        else:
+            df = parse()
+        s.rows, s.bytes = len(df), os.path.getsize(path)
+    if progress:
+        progress(100)
+    return df
+
+
+def _variant(kwargs):
+    return repr(sorted(kwargs.items()))
+
+
+def cached_export(path, cache, should_stop=None, **kwargs):
+    """What :func:`read_export` would load from ``cache``, or ``None``; never parses the file."""
+    if not path.lower().endswith((".xlsx", ".xls")):
+        _csv_encoding(path, kwargs)
+    return cache.lookup(path, _variant(kwargs), should_stop)
+
+
+# CSP 파트너 export 에서 실제로 쓰는 열 범위 (loc[:, "PartnerId":"BenefitType"])
+CSP_COLUMNS = ("PartnerId", "BenefitType")
+
+
+def column_range(columns, first, last):
+    """Columns from ``first`` to ``last`` inclusive, like ``df.loc[:, first:last]``."""
+    columns = list(columns)
+    return columns[columns.index(first):columns.index(last) + 1]
+
+
+def read_filtered_csv(path, column, values, project=CSP_COLUMNS, chunksize=100_000, progress=None,
+                      should_stop=None, on_chunk=None, **kwargs):
+    """Stream a csv export, keeping only rows whose ``column`` is in ``values``.
+
+    Only the ``project`` column range is parsed and each chunk is filtered
+    before the next one is read, so peak memory is one chunk plus the rows
+    that are kept, however large the partner-wide file is. The original row
+    labels are preserved, so the result indexes like ``df[mask]`` would.
+    ``on_chunk`` is called with every chunk before it is filtered.
+    """
+    if isinstance(values, str):
+        values = [values]
+
+    def read(options):
+        header = pd.read_csv(path, nrows=0, **options).columns
+        usecols = column_range(header, *project) if project else list(header)
+        keep_cols = list(usecols)
+        if column not in usecols:
+            usecols.append(column)
+
+        parts = []
+        with trace.span("read filtered", "io", file=os.path.basename(path), column=column) as s, \
+                ProgressFile(path, progress, should_stop) as fh:
+            reader = pd.read_csv(io.BufferedReader(fh), usecols=usecols, chunksize=chunksize, **options)
+            scanned = 0
+            for chunk in reader:
+                scanned += len(chunk)
+                if on_chunk:
+                    on_chunk(chunk)
+                chunk = chunk[chunk[column].isin(values)]
+                if not chunk.empty:
+                    parts.append(chunk[keep_cols])
+            s.rows, s.bytes = scanned, fh.bytes_read
+            s.note(kept=sum(len(p) for p in parts))
+        return parts, keep_cols
+
+    parts, keep_cols = _parse_csv(path, kwargs, read, _csv_encoding(path, kwargs))
+    if progress:
+        progress(100)
+    if not parts:
+        return pd.DataFrame(columns=keep_cols)
+    return pd.concat(parts)
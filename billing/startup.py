@@ -0,0 +1,168 @@
+"""Start-up import accounting.
+
+:class:`ImportTimer` sits in front of the import system and records how long
+every module takes to load: ``total`` includes the modules it imports in
+turn, ``self`` does not. It works the same in the PyInstaller build, where
+``python -X importtime`` is not available.
+
+``BILLING_IMPORT_PROFILE=1`` makes BillingProgram print the report to stderr
+once its window is shown; any other value is taken as a file to write it
+to. To check a start-up budget, e.g. in a release script::
+
+    python -m billing.startup --module BillingProgram --budget 1.5
+
+exits with status 1 when importing the module takes longer than the budget.
+"""
+import argparse
+import importlib
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class _TimedLoader:
+    """Wraps a loader so module creation and execution are timed."""
+
+    def __init__(self, loader, timer):
+        self._loader = loader
+        self._timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        with self._timer.measure(spec.name):
+            return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # the module sees its real loader from here on
+        module.__spec__.loader = module.__loader__ = self._loader
+        with self._timer.measure(module.__name__):
+            self._loader.exec_module(module)
+
+
+class ImportTimer:
+    """Meta path hook recording ``{module: [total, self]}`` in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records = defaultdict(lambda: [0.0, 0.0])
+        self.marks = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path, target=None):
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, self)
+                    return spec
+            return None
+        finally:
+            self._local.finding = False
+
+    @contextmanager
+    def measure(self, name):
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                record = self.records[name]
+                record[0] += elapsed
+                record[1] += elapsed - children
+
+    def mark(self, label):
+        """Record the time since the timer started, e.g. ``"window shown"``."""
+        self.marks.append((label, time.perf_counter() - self.started))
+
+    def packages(self):
+        """Self time summed per top-level package, slowest first."""
+        totals = defaultdict(float)
+        for name, (_, own) in self.records.items():
+            totals[name.partition(".")[0]] += own
+        return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+
+    def report(self, limit=25):
+        lines = [f"{label}: {seconds * 1000:.0f} ms" for label, seconds in self.marks]
+        lines.append(f"imports: {sum(own for _, own in self.records.values()) * 1000:.0f} ms"
+                     f" in {len(self.records)} modules")
+        lines.append("")
+        lines.append(f"{'self ms':>9} package")
+        lines += [f"{own * 1000:9.1f} {name}" for name, own in self.packages()[:limit]]
+        lines.append("")
+        lines.append(f"{'self ms':>9} {'total ms':>9} module")
+        slowest = sorted(self.records.items(), key=lambda kv: kv[1][1], reverse=True)[:limit]
+        lines += [f"{own * 1000:9.1f} {total * 1000:9.1f} {name}" for name, (total, own) in slowest]
+        return "\n".join(lines)
+
+
+def install_from_env(variable="BILLING_IMPORT_PROFILE"):
+    """An installed :class:`ImportTimer` if ``variable`` is set, else ``None``."""
+    if not os.environ.get(variable):
+        return None
+    return ImportTimer().install()
+
+
+def finish(timer, label, variable="BILLING_IMPORT_PROFILE"):
+    """Mark ``label``, stop timing and write the report where ``variable`` says."""
+    if timer is None:
+        return
+    timer.mark(label)
+    timer.uninstall()
+    target = os.environ.get(variable, "1")
+    if target in ("1", "stderr"):
+        print(timer.report(), file=sys.stderr)
+    else:
+        with open(target, "w", encoding="utf-8") as fh:
+            fh.write(timer.report() + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="billing.startup", description="Time the imports of a module.")
+    parser.add_argument("--module", default="BillingProgram")
+    parser.add_argument("--budget", type=float, help="fail when the import takes longer (seconds)")
+    parser.add_argument("--limit", type=int, default=25)
+    args = parser.parse_args(argv)
+
+    timer = ImportTimer().install()
+    try:
+        importlib.import_module(args.module)
+    finally:
+        timer.mark(f"import {args.module}")
+        timer.uninstall()
+    print(timer.report(args.limit))
+    elapsed = timer.marks[-1][1]
+    if args.budget is not None and elapsed > args.budget:
+        print(f"start-up budget exceeded: {elapsed:.2f}s > {args.budget:.2f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Subscription-split workbook for the CustomerK EA report.
+
+The workbook holds a summary sheet, the ``{yymm}_비용데이터`` main sheet and
+one sheet per subscription, each with a ResourceGroup pivot on the summary
+sheet. It is built from a single normalisation of the subscription column
+and one groupby, and written in one streaming pass, so no cell goes through
+Excel.
+"""
+from dataclasses import dataclass, field
+
+from billing import trace
+from billing.xlsx import PivotSpec, PivotTable, XlsxWorkbook, row_fraction, split_cell
+
+SUBSCRIPTION_COLUMN = "구독이름 (SubscriptionName)"
+RESOURCE_GROUP_COLUMN = "리소스그룹 (ResourceGroup)"
+COST_COLUMN = "비용 (Cost)"
+
+
+@dataclass
+class SubscriptionSplit:
+    """Layout of the EA workbook.
+
+    ``subscriptions`` maps a subscription name to the cell its ResourceGroup
+    pivot is placed at on the summary sheet; subscriptions without rows are
+    left out.
+    """
+    summary_sheet: str
+    main_sheet: str
+    subscriptions: dict
+    summary_title: str
+    detail_title: str
+    summary_location: str = "A3"
+    column: str = SUBSCRIPTION_COLUMN
+    group_column: str = RESOURCE_GROUP_COLUMN
+    value_field: str = COST_COLUMN
+    value_caption: str = "합계 Cost"
+    summary_pivot: str = "EA_Summary"
+    titles: dict = field(default_factory=dict)
+
+
+def normalize_subscriptions(df, column=SUBSCRIPTION_COLUMN):
+    """Strip and lowercase ``column`` once, the way the sheets are matched."""
+    return df.assign(**{column: df[column].str.strip().str.lower()})
+
+
+def write_subscription_workbook(path, df, split, should_stop=None, progress=None):
+    """Write the summary, main and per-subscription sheets of ``df`` to ``path``.
+
+    ``df`` must already be normalised with :func:`normalize_subscriptions`.
+    Returns the subscriptions that got a sheet.
+    """
+    wanted = {name.lower(): name for name in split.subscriptions}
+    with trace.span("split", column=split.column) as s:
+        parts = {wanted[key]: part for key, part in df.groupby(split.column, sort=False) if key in wanted}
+        s.rows = len(df)
+
+    summary_row, _ = split_cell(split.summary_location)
+    detail_row = min((split_cell(cell)[0] for cell in split.subscriptions.values()), default=summary_row)
+    titles = {f"A{summary_row - 1}": split.summary_title, f"A{detail_row - 1}": split.detail_title}
+    titles.update(split.titles)
+
+    # 시트와 피벗 캐시에 주 시트와 구독별 시트 행이 한 번씩 쓰인다
+    total = 2 * (len(df) + sum(len(parts[name]) for name in split.subscriptions if name in parts))
+    with XlsxWorkbook(path, should_stop, row_fraction(progress, total)) as wb:
+        main = wb.add_dataframe(split.main_sheet, df, fit_header=True)
+        pivots = [PivotTable(
+            PivotSpec(split.summary_pivot, [split.column], split.value_field, split.value_caption,
+                      location=split.summary_location),
+            df, main,
+        )]
+        sheets = []
+        for name, cell in split.subscriptions.items():
+            if name not in parts:
+                continue
+            source = wb.add_dataframe(name, parts[name], fit_header=True)
+            sheets.append(source.name)
+            pivots.append(PivotTable(
+                PivotSpec(f"{name}_Pivot", [split.group_column], split.value_field, split.value_caption,
+                          location=cell),
+                parts[name], source,
+            ))
+        summary = wb.add_pivot_sheet(split.summary_sheet, pivots, titles=titles)
+        wb.order_sheets([summary, main.name] + sheets)
+    return [name for name in split.subscriptions if name in parts]
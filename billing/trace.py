@@ -0,0 +1,221 @@
+"""Per-stage tracing spans, exported as a Chrome trace.
+
+The stages of a run open spans around themselves::
+
+    with trace.span("read", file=name) as s:
+        df = ...
+        s.rows, s.bytes = len(df), size
+
+Each span records its wall time, the CPU time of its thread and, where the
+stage knows them, the rows and bytes it handled. Spans only cost anything
+while a run is being recorded; otherwise :func:`span` hands out a shared
+do-nothing span.
+
+A run is recorded with :func:`recording` (or the :func:`traced` decorator),
+which writes a Chrome trace JSON file on exit. Open it in Perfetto
+(ui.perfetto.dev) or ``chrome://tracing``: every thread gets its own track,
+so the Excel session thread shows next to the worker. ``BILLING_TRACE``
+turns recording on for BillingProgram: a directory (or ``1`` for the temp
+directory) gets one ``trace-<run>-<time>.json`` per run, anything else is
+taken as the file to write.
+"""
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class Span:
+    """One timed stage; set ``rows``/``bytes`` or :meth:`note` arguments before it ends."""
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.rows = None
+        self.bytes = None
+        self.thread = threading.current_thread()
+        self._start = time.perf_counter()
+        self._cpu = time.thread_time()
+        self._ended = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.end()
+
+    def note(self, **args):
+        self.args.update(args)
+
+    def end(self):
+        if self._ended:
+            return
+        self._ended = True
+        wall = time.perf_counter() - self._start
+        cpu = time.thread_time() - self._cpu
+        self.tracer.record(self, wall, cpu)
+
+
+class _NullSpan:
+    """Stands in for :class:`Span` when nothing is being recorded."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+    def note(self, **args):
+        pass
+
+    def end(self):
+        pass
+
+
+_NULL = _NullSpan()
+
+
+class Tracer:
+    """Collects finished spans from every thread."""
+
+    def __init__(self, label="run"):
+        self.label = label
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def span(self, name, cat="billing", **args):
+        return Span(self, name, cat, args)
+
+    def record(self, span, wall, cpu):
+        with self._lock:
+            self.spans.append((span, wall, cpu))
+
+    def events(self):
+        """The spans as Chrome trace "complete" events, plus thread names."""
+        pid = os.getpid()
+        events = [{"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": self.label}}]
+        threads = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span, wall, cpu in spans:
+            tid = span.thread.ident or 0
+            threads.setdefault(tid, span.thread.name)
+            args = dict(span.args)
+            args["cpu_ms"] = round(cpu * 1000, 3)
+            if span.rows is not None:
+                args["rows"] = int(span.rows)
+                if wall > 0:
+                    args["rows_per_s"] = round(span.rows / wall)
+            if span.bytes is not None:
+                args["bytes"] = int(span.bytes)
+            events.append({
+                "ph": "X", "name": span.name, "cat": span.cat, "pid": pid, "tid": tid,
+                "ts": round((span._start - self.started) * 1e6, 1), "dur": round(wall * 1e6, 1),
+                "tdur": round(cpu * 1e6, 1), "args": args,
+            })
+        events += [{"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}}
+                   for tid, name in threads.items()]
+        return events
+
+    def export(self, path):
+        """Write the trace to ``path`` (Chrome trace JSON object format)."""
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, fh, ensure_ascii=False)
+        return path
+
+    def summary(self, limit=20):
+        """Wall and CPU seconds per span name, slowest first."""
+        totals = {}
+        with self._lock:
+            for span, wall, cpu in self.spans:
+                entry = totals.setdefault(span.name, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += wall
+                entry[2] += cpu
+        lines = [f"{'wall s':>8} {'cpu s':>8} {'count':>6} span"]
+        ranked = sorted(totals.items(), key=lambda kv: kv[1][1], reverse=True)[:limit]
+        lines += [f"{wall:8.3f} {cpu:8.3f} {count:6d} {name}" for name, (count, wall, cpu) in ranked]
+        return "\n".join(lines)
+
+
+_active = None
+
+
+def current():
+    """The tracer recording right now, or ``None``."""
+    return _active
+
+
+def span(name, cat="billing", **args):
+    """A span on the active tracer; a shared no-op span when none is recording."""
+    tracer = _active
+    if tracer is None:
+        return _NULL
+    return tracer.span(name, cat, **args)
+
+
+def path_from_env(label, variable="BILLING_TRACE"):
+    """Where ``variable`` says the trace of run ``label`` goes, or ``None``."""
+    target = os.environ.get(variable)
+    if not target:
+        return None
+    if target == "1":
+        target = tempfile.gettempdir()
+    if os.path.isdir(target) or target.endswith(("/", os.sep)):
+        os.makedirs(target, exist_ok=True)
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)
+        return os.path.join(target, f"trace-{safe}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    return target
+
+
+@contextmanager
+def recording(label, path=None):
+    """Record the enclosed run under one ``label`` span and export it to ``path``.
+
+    ``path`` defaults to :func:`path_from_env`; with neither, nothing is
+    recorded and ``None`` is yielded.
+    """
+    global _active
+    path = path or path_from_env(label)
+    if path is None:
+        yield None
+        return
+    tracer, previous = Tracer(label), _active
+    _active = tracer
+    try:
+        with tracer.span(label, "run"):
+            yield tracer
+    finally:
+        _active = previous
+        try:
+            tracer.export(path)
+            print(f"trace: {path}", file=sys.stderr)
+        except OSError as e:
+            # 추적 파일을 못 써도 변환 결과에는 영향이 없다
+            print(f"⚠ Trace export failed: {e}", file=sys.stderr)
+
+
+def traced(label):
+    """Decorator: :func:`recording` around every call of the function."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with recording(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
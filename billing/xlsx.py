@@ -0,0 +1,859 @@
+"""Native .xlsx writer used instead of the Excel COM round-trip.
+
+Workbooks are written straight into the zip container in one pass. Data
+sheets are serialised row by row, and pivot tables are emitted as
+pivotCacheDefinition / pivotCacheRecords / pivotTable parts, so no Excel
+process is needed to produce a report. The cache is flagged
+``refreshOnLoad`` and the pivot sheet carries a pre-rendered copy of the
+table, so the file reads correctly both in Excel and in plain viewers.
+
+Reports that are never drilled into can be written as a static summary
+sheet instead: the same layout as plain formatted cells, with no pivot
+cache, so the file is a fraction of the size and opens immediately.
+"""
+import datetime
+import math
+import numbers
+import os
+import re
+import unicodedata
+import zipfile
+from collections import defaultdict
+from dataclasses import dataclass, field
+from xml.sax.saxutils import escape, quoteattr
+
+import pandas as pd
+
+from billing import trace
+from billing.aggregate import hierarchy_totals
+from billing.cancel import checkpoint
+
+WON_FORMAT = "₩#,##0"
+PIVOT_STYLE = "PivotStyleLight20"
+ROW_LABEL = "행 레이블"
+COL_LABEL = "열 레이블"
+GRAND_TOTAL = "총합계"
+BLANK_ITEM = "(비어 있음)"
+ALL_ITEMS = "(모두)"
+
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_NS_CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+_CT = "application/vnd.openxmlformats-officedocument.spreadsheetml."
+_XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_ILLEGAL_SHEET = re.compile(r"[\[\]:*?/\\]")
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+_ROW_CHUNK = 5000
+
+
+@dataclass
+class PivotSpec:
+    """What used to be set through PivotCaches().Create / CreatePivotTable.
+
+    ``filters`` maps a page field to its ``CurrentPage`` (``None`` leaves the
+    filter on "(모두)"), mirroring ``Orientation = 3``.
+    """
+    name: str
+    rows: list
+    value_field: str
+    value_caption: str = None
+    filters: dict = field(default_factory=dict)
+    columns: list = field(default_factory=list)
+    location: str = "A3"
+    style: str = PIVOT_STYLE
+    number_format: str = WON_FORMAT
+
+    @property
+    def caption(self):
+        return self.value_caption or f"합계 {self.value_field}"
+
+
+@dataclass
+class SheetRef:
+    name: str
+    columns: list
+    row_count: int
+
+    @property
+    def ref(self):
+        return f"A1:{column_letter(len(self.columns))}{self.row_count + 1}"
+
+
+def column_letter(index):
+    """1-based column index to Excel letters (1 -> A, 27 -> AA)."""
+    letters = ""
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def split_cell(cell):
+    """'B15' -> (15, 2)."""
+    m = re.fullmatch(r"([A-Za-z]+)(\d+)", cell)
+    if not m:
+        raise ValueError(f"잘못된 셀 주소: {cell}")
+    col = 0
+    for ch in m.group(1).upper():
+        col = col * 26 + ord(ch) - 64
+    return int(m.group(2)), col
+
+
+def _text(value):
+    return escape(_ILLEGAL_XML.sub("", value))
+
+
+def _attr(value):
+    return quoteattr(_ILLEGAL_XML.sub("", str(value)))
+
+
+def _is_missing(value):
+    if value is None or value is pd.NaT or value is pd.NA:
+        return True
+    return isinstance(value, float) and math.isnan(value)
+
+
+def _number(value):
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    value = float(value)
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _kind(value):
+    """Cache value kind as used by pivotCacheRecords (m, b, n, d, s)."""
+    if _is_missing(value):
+        return "m"
+    if isinstance(value, bool) or type(value).__name__ == "bool_":
+        return "b"
+    if isinstance(value, numbers.Number):
+        return "n" if math.isfinite(float(value)) else "m"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return "d"
+    return "s"
+
+
+def _iso(value):
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    return value.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _serial(value):
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return _number((value - _EXCEL_EPOCH).total_seconds() / 86400)
+
+
+def item_sort_key(value):
+    # Excel's ascending item order: numbers, dates, text, booleans, blanks.
+    kind = _kind(value)
+    if kind == "n":
+        return (0, float(value), "")
+    if kind == "d":
+        return (1, 0.0, _iso(value))
+    if kind == "s":
+        return (2, 0.0, str(value))
+    if kind == "b":
+        return (3, float(bool(value)), "")
+    return (4, 0.0, "")
+
+
+def _label(value):
+    if _is_missing(value):
+        return BLANK_ITEM
+    if isinstance(value, datetime.datetime) and value == datetime.datetime(value.year, value.month, value.day):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+class _Styles:
+    """cellXfs registry; styles.xml is written once the workbook closes."""
+
+    def __init__(self):
+        self._num_formats = {}
+        self._xfs = [(0, 0, 0)]
+        self._index = {(0, 0, 0): 0}
+        self.date = self.get(num_fmt_id=14)
+        self.title = self.get(font_id=1)
+        self.bold = self.get(font_id=2)
+
+    def number_format(self, code):
+        if code not in self._num_formats:
+            self._num_formats[code] = 164 + len(self._num_formats)
+        return self._num_formats[code]
+
+    def get(self, num_format=None, num_fmt_id=0, font_id=0, indent=0):
+        if num_format:
+            num_fmt_id = self.number_format(num_format)
+        key = (num_fmt_id, font_id, indent)
+        if key not in self._index:
+            self._index[key] = len(self._xfs)
+            self._xfs.append(key)
+        return self._index[key]
+
+    def xml(self):
+        out = [_XML_HEAD, f'<styleSheet xmlns="{_NS_MAIN}">']
+        if self._num_formats:
+            out.append(f'<numFmts count="{len(self._num_formats)}">')
+            for code, fmt_id in self._num_formats.items():
+                out.append(f'<numFmt numFmtId="{fmt_id}" formatCode={_attr(code)}/>')
+            out.append("</numFmts>")
+        out.append(
+            '<fonts count="3">'
+            '<font><sz val="11"/><name val="맑은 고딕"/><family val="3"/><charset val="129"/></font>'
+            '<font><b/><sz val="14"/><name val="맑은 고딕"/><family val="3"/><charset val="129"/></font>'
+            '<font><b/><sz val="11"/><name val="맑은 고딕"/><family val="3"/><charset val="129"/></font>'
+            '</fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        )
+        out.append(f'<cellXfs count="{len(self._xfs)}">')
+        for num_fmt_id, font_id, indent in self._xfs:
+            attrs = f'numFmtId="{num_fmt_id}" fontId="{font_id}" fillId="0" borderId="0" xfId="0"'
+            if num_fmt_id:
+                attrs += ' applyNumberFormat="1"'
+            if font_id:
+                attrs += ' applyFont="1"'
+            if indent:
+                out.append(f'<xf {attrs} applyAlignment="1"><alignment horizontal="left" indent="{indent}"/></xf>')
+            else:
+                out.append(f"<xf {attrs}/>")
+        out.append(
+            '</cellXfs><cellStyles count="1"><cellStyle name="표준" xfId="0" builtinId="0"/></cellStyles>'
+            '<dxfs count="0"/><tableStyles count="0"/></styleSheet>'
+        )
+        return "".join(out)
+
+
+def _cell(ref, value, styles, style=0):
+    if _is_missing(value):
+        return ""
+    s = f' s="{style}"' if style else ""
+    if isinstance(value, str):
+        if not value:
+            return ""
+        return f'<c r="{ref}"{s} t="inlineStr"><is><t xml:space="preserve">{_text(value)}</t></is></c>'
+    kind = _kind(value)
+    if kind == "b":
+        return f'<c r="{ref}"{s} t="b"><v>{int(value)}</v></c>'
+    if kind == "n":
+        return f'<c r="{ref}"{s}><v>{_number(value)}</v></c>'
+    if kind == "d":
+        return f'<c r="{ref}" s="{style or styles.date}"><v>{_serial(value)}</v></c>'
+    if kind == "m":
+        return ""
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t xml:space="preserve">{_text(str(value))}</t></is></c>'
+
+
+class _CacheField:
+    """One cacheField: shared items for axis fields, inline values otherwise."""
+
+    def __init__(self, name, series, shared):
+        self.name = str(name)
+        self.shared = shared
+        values = series.tolist()
+        self.items = []
+        self.codes = None
+        kinds = set()
+        num_min = num_max = date_min = date_max = None
+        all_int = True
+        if shared:
+            uniques = {}
+            for v in values:
+                key = None if _is_missing(v) else v
+                if key not in uniques:
+                    uniques[key] = None
+            ordered = sorted(uniques, key=item_sort_key)
+            lookup = {v: i for i, v in enumerate(ordered)}
+            self.items = ordered
+            self.codes = [lookup[None if _is_missing(v) else v] for v in values]
+            values = ordered
+        for v in values:
+            k = _kind(v)
+            kinds.add(k)
+            if k == "n":
+                f = float(v)
+                num_min = f if num_min is None else min(num_min, f)
+                num_max = f if num_max is None else max(num_max, f)
+                if not f.is_integer():
+                    all_int = False
+            elif k == "d":
+                iso = _iso(v)
+                date_min = iso if date_min is None else min(date_min, iso)
+                date_max = iso if date_max is None else max(date_max, iso)
+        self.attrs = self._attrs(kinds, num_min, num_max, all_int, date_min, date_max)
+
+    @staticmethod
+    def _attrs(kinds, num_min, num_max, all_int, date_min, date_max):
+        typed = kinds & {"s", "n", "d", "b"}
+        attrs = []
+        if not (kinds & {"s", "m", "b"}):
+            attrs.append('containsSemiMixedTypes="0"')
+        if "s" not in kinds:
+            attrs.append('containsString="0"')
+        if not (kinds & {"s", "n", "b"}) and "d" in kinds:
+            attrs.append('containsNonDate="0"')
+        if "d" in kinds:
+            attrs.append('containsDate="1"')
+        if len(typed) > 1:
+            attrs.append('containsMixedTypes="1"')
+        if "n" in kinds:
+            attrs.append('containsNumber="1"')
+            if all_int:
+                attrs.append('containsInteger="1"')
+        if "m" in kinds:
+            attrs.append('containsBlank="1"')
+        if "n" in kinds:
+            attrs.append(f'minValue="{_number(num_min)}" maxValue="{_number(num_max)}"')
+        if "d" in kinds:
+            attrs.append(f'minDate="{date_min}" maxDate="{date_max}"')
+        return "".join(" " + a for a in attrs)
+
+    def index_of(self, value):
+        for i, item in enumerate(self.items):
+            if item == value or (item is not None and str(item) == str(value)):
+                return i
+        return None
+
+    def xml(self):
+        head = f'<cacheField name={_attr(self.name)} numFmtId="0">'
+        if not self.shared:
+            return f"{head}<sharedItems{self.attrs}/></cacheField>"
+        items = "".join(_record_value(v) for v in self.items)
+        return (f'{head}<sharedItems{self.attrs} count="{len(self.items)}">'
+                f"{items}</sharedItems></cacheField>")
+
+
+def _record_value(value):
+    kind = _kind(value)
+    if kind == "m":
+        return "<m/>"
+    if kind == "n":
+        return f'<n v="{_number(value)}"/>'
+    if kind == "b":
+        return f'<b v="{int(bool(value))}"/>'
+    if kind == "d":
+        return f'<d v="{_iso(value)}"/>'
+    return f"<s v={_attr(value)}/>"
+
+
+@dataclass
+class PivotTable:
+    spec: PivotSpec
+    data: object
+    source: SheetRef
+
+
+class XlsxWorkbook:
+    """Single-pass workbook writer.
+
+    Sheets are streamed into the archive as they are added; workbook-level
+    parts (content types, relationships, styles) are written on close.
+    ``should_stop`` is checked every few thousand rows; if writing stops
+    with an exception (:class:`billing.cancel.Cancelled` included) the
+    partial file is deleted. ``on_rows`` is called at the same points with
+    the number of sheet and pivot cache rows written so far.
+    """
+
+    def __init__(self, path, should_stop=None, on_rows=None):
+        self.path = path
+        self.should_stop = should_stop
+        self.on_rows = on_rows
+        self.rows_written = 0
+        self.styles = _Styles()
+        self._span = trace.span("xlsx", "xlsx", file=os.path.basename(str(path)))
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1)
+        self._sheets = []
+        self._caches = []
+        self._pivot_tables = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+            if isinstance(self.path, (str, os.PathLike)) and os.path.exists(self.path):
+                os.remove(self.path)
+            self._span.note(error=exc_type.__name__)
+        self._span.rows = self.rows_written
+        if isinstance(self.path, (str, os.PathLike)) and os.path.exists(self.path):
+            self._span.bytes = os.path.getsize(self.path)
+        self._span.end()
+
+    def add_dataframe(self, name, df, **options):
+        """Write ``df`` the way ``df.to_excel(index=False)`` lays it out.
+
+        ``options`` are passed on to :meth:`add_sheet`.
+        """
+        columns = [str(c) for c in df.columns]
+
+        def rows():
+            for start in range(0, len(df), _ROW_CHUNK):
+                chunk = df.iloc[start:start + _ROW_CHUNK]
+                yield from chunk.itertuples(index=False, name=None)
+
+        return self.add_sheet(name, columns, rows(), **options)
+
+    def add_sheet(self, name, header, rows, header_style=0, fit_header=False):
+        """Stream ``header`` and an iterable of row tuples into a new sheet.
+
+        Rows are serialised and compressed as they are consumed, so memory
+        stays flat however many rows ``rows`` yields. The header is plain
+        (no border, not bold), as the COM code used to reset it; pass
+        ``header_style`` (e.g. ``styles.bold``) to change that. With
+        ``fit_header`` each column is made wide enough for its header,
+        counting Korean characters as double width.
+        """
+        name = self._sheet_name(name)
+        index = len(self._sheets) + 1
+        part = f"xl/worksheets/sheet{index}.xml"
+        letters = [column_letter(i + 1) for i in range(len(header))]
+        styles = self.styles
+        count = flushed = 0
+        with trace.span("sheet", "xlsx", sheet=name) as span, self._zip.open(part, "w", force_zip64=True) as fh:
+            fh.write(self._sheet_head().encode("utf-8"))
+            if fit_header and header:
+                fh.write(_cols_xml(header).encode("utf-8"))
+            fh.write(("<sheetData>" + self._row_xml(1, letters, header, header_style)).encode("utf-8"))
+            buf = []
+            for r, row in enumerate(rows, start=2):
+                buf.append(f'<row r="{r}">')
+                for letter, value in zip(letters, row):
+                    buf.append(_cell(f"{letter}{r}", value, styles))
+                buf.append("</row>")
+                count += 1
+                if len(buf) > 20000:
+                    self._tick(count - flushed)
+                    flushed = count
+                    fh.write("".join(buf).encode("utf-8"))
+                    buf.clear()
+            buf.append("</sheetData></worksheet>")
+            fh.write("".join(buf).encode("utf-8"))
+            span.rows = count
+        span.bytes = self._zip.getinfo(part).compress_size
+        self._tick(count - flushed)
+        ref = SheetRef(name, list(header), count)
+        self._sheets.append({"name": name, "part": part, "rels": []})
+        return ref
+
+    def add_pivot_sheet(self, name, pivots, titles=None):
+        """Add a sheet holding one or more pivot tables plus optional titles.
+
+        ``pivots`` is a list of :class:`PivotTable`; ``titles`` maps a cell
+        address to a heading written in the 14pt bold title style.
+        """
+        grid = self._title_grid(titles)
+        rels = []
+        for pivot in pivots:
+            with trace.span("pivot", "xlsx", pivot=pivot.spec.name) as span:
+                rels.append(self._write_pivot(pivot, grid))
+                span.rows = len(pivot.data)
+        return self._write_grid(name, grid, rels)
+
+    def add_summary_sheet(self, name, tables, titles=None):
+        """Add the pivot layout of each table as static cells.
+
+        ``tables`` is a list of :class:`PivotTable` (``source`` may be
+        ``None``). Totals come from :mod:`billing.aggregate`; no pivot cache
+        is written, so the sheet cannot be refreshed or drilled into.
+        """
+        grid = self._title_grid(titles)
+        for table in tables:
+            spec, df = table.spec, table.data
+            _check_fields(spec, df)
+            _render_pivot(df, spec, _summary_pages(df, spec.filters), self.styles, grid, static=True)
+        return self._write_grid(name, grid, [])
+
+    def _tick(self, rows):
+        checkpoint(self.should_stop)
+        self.rows_written += rows
+        if self.on_rows:
+            self.on_rows(self.rows_written)
+
+    def _title_grid(self, titles):
+        return {split_cell(cell): (text, self.styles.title) for cell, text in (titles or {}).items()}
+
+    def _sheet_name(self, name):
+        """Excel-legal, case-insensitively unique name ("Data" -> "Data (2)")."""
+        base = _ILLEGAL_SHEET.sub("_", str(name))[:31] or "Sheet"
+        taken = {s["name"].lower() for s in self._sheets}
+        candidate, n = base, 1
+        while candidate.lower() in taken:
+            n += 1
+            suffix = f" ({n})"
+            candidate = base[:31 - len(suffix)] + suffix
+        return candidate
+
+    def order_sheets(self, names):
+        """Move the sheets called ``names`` to the front, in that order."""
+        by_name = {s["name"]: s for s in self._sheets}
+        front = [by_name[n] for n in names if n in by_name]
+        self._sheets = front + [s for s in self._sheets if s not in front]
+
+    def _write_grid(self, name, grid, rels):
+        name = self._sheet_name(name)
+        index = len(self._sheets) + 1
+        part = f"xl/worksheets/sheet{index}.xml"
+        rows = defaultdict(list)
+        for (r, c), value in grid.items():
+            rows[r].append((c, value))
+        out = [self._sheet_head(), "<sheetData>"]
+        for r in sorted(rows):
+            out.append(f'<row r="{r}">')
+            for c, (value, style) in sorted(rows[r]):
+                out.append(_cell(f"{column_letter(c)}{r}", value, self.styles, style))
+            out.append("</row>")
+        out.append("</sheetData></worksheet>")
+        self._zip.writestr(part, "".join(out))
+        self._sheets.append({"name": name, "part": part, "rels": rels})
+        return name
+
+    def close(self):
+        with trace.span("finalize", "xlsx"):
+            self._close()
+
+    def _close(self):
+        z = self._zip
+        sheet_count = len(self._sheets)
+        overrides = [
+            ("/xl/workbook.xml", _CT + "sheet.main+xml"),
+            ("/xl/styles.xml", _CT + "styles+xml"),
+        ]
+        for sheet in self._sheets:
+            overrides.append((f"/{sheet['part']}", _CT + "worksheet+xml"))
+            if sheet["rels"]:
+                rel_part = sheet["part"].replace("worksheets/", "worksheets/_rels/") + ".rels"
+                z.writestr(rel_part, _rels_xml([
+                    (f"rId{i + 1}", "pivotTable", f"../pivotTables/pivotTable{n}.xml")
+                    for i, n in enumerate(sheet["rels"])
+                ]))
+        for n in range(1, self._pivot_tables + 1):
+            overrides.append((f"/xl/pivotTables/pivotTable{n}.xml", _CT + "pivotTable+xml"))
+        for n in range(1, len(self._caches) + 1):
+            overrides.append((f"/xl/pivotCache/pivotCacheDefinition{n}.xml", _CT + "pivotCacheDefinition+xml"))
+            overrides.append((f"/xl/pivotCache/pivotCacheRecords{n}.xml", _CT + "pivotCacheRecords+xml"))
+
+        types = [_XML_HEAD, f'<Types xmlns="{_NS_CT}">',
+                 '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>',
+                 '<Default Extension="xml" ContentType="application/xml"/>']
+        types += [f'<Override PartName="{p}" ContentType="{t}"/>' for p, t in overrides]
+        types.append("</Types>")
+        z.writestr("[Content_Types].xml", "".join(types))
+        z.writestr("_rels/.rels", _rels_xml([("rId1", "officeDocument", "xl/workbook.xml")]))
+
+        wb_rels = [(f"rId{i + 1}", "worksheet", s["part"][len("xl/"):]) for i, s in enumerate(self._sheets)]
+        wb_rels.append((f"rId{sheet_count + 1}", "styles", "styles.xml"))
+        caches = []
+        for n in range(1, len(self._caches) + 1):
+            rid = f"rId{sheet_count + 1 + n}"
+            wb_rels.append((rid, "pivotCacheDefinition", f"pivotCache/pivotCacheDefinition{n}.xml"))
+            caches.append(f'<pivotCache cacheId="{n}" r:id="{rid}"/>')
+        z.writestr("xl/_rels/workbook.xml.rels", _rels_xml(wb_rels))
+
+        sheets = "".join(
+            f'<sheet name={_attr(s["name"])} sheetId="{i + 1}" r:id="rId{i + 1}"/>'
+            for i, s in enumerate(self._sheets)
+        )
+        workbook = [_XML_HEAD, f'<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}">',
+                    '<bookViews><workbookView activeTab="0"/></bookViews>', f"<sheets>{sheets}</sheets>",
+                    '<calcPr calcId="191029"/>']
+        if caches:
+            workbook.append(f"<pivotCaches>{''.join(caches)}</pivotCaches>")
+        workbook.append("</workbook>")
+        z.writestr("xl/workbook.xml", "".join(workbook))
+        z.writestr("xl/styles.xml", self.styles.xml())
+        z.close()
+
+    def _sheet_head(self):
+        # no tabSelected: order_sheets() can still change which sheet is first,
+        # and Excel opens on the workbookView's activeTab anyway
+        return (f'{_XML_HEAD}<worksheet xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}">'
+                f'<sheetViews><sheetView workbookViewId="0"/></sheetViews>'
+                f'<sheetFormatPr defaultRowHeight="16.5"/>')
+
+    def _row_xml(self, r, letters, values, style=0):
+        cells = "".join(_cell(f"{letter}{r}", v, self.styles, style) for letter, v in zip(letters, values))
+        return f'<row r="{r}">{cells}</row>'
+
+    def _write_pivot(self, pivot, grid):
+        spec, df = pivot.spec, pivot.data
+        axis = _check_fields(spec, df)
+
+        fields = [_CacheField(c, df[c], shared=c in axis) for c in df.columns]
+        by_name = {f.name: i for i, f in enumerate(fields)}
+        cache_id = len(self._caches) + 1
+        self._caches.append(spec.name)
+        self._write_cache(cache_id, pivot.source, fields, df)
+
+        pages = []
+        for name, current in spec.filters.items():
+            item = None if current is None else fields[by_name[name]].index_of(current)
+            value = None if item is None else fields[by_name[name]].items[item]
+            pages.append((name, value, item))
+
+        layout = _render_pivot(df, spec, pages, self.styles, grid)
+        self._pivot_tables += 1
+        table_no = self._pivot_tables
+        self._zip.writestr(f"xl/pivotTables/pivotTable{table_no}.xml",
+                           _pivot_table_xml(spec, cache_id, fields, by_name, pages, layout,
+                                            self.styles.number_format(spec.number_format)))
+        self._zip.writestr(f"xl/pivotTables/_rels/pivotTable{table_no}.xml.rels", _rels_xml([
+            ("rId1", "pivotCacheDefinition", f"../pivotCache/pivotCacheDefinition{cache_id}.xml")
+        ]))
+        return table_no
+
+    def _write_cache(self, cache_id, source, fields, df):
+        definition = [
+            _XML_HEAD,
+            f'<pivotCacheDefinition xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}" r:id="rId1" '
+            f'refreshOnLoad="1" createdVersion="6" refreshedVersion="6" minRefreshableVersion="3" '
+            f'recordCount="{len(df)}">',
+            f'<cacheSource type="worksheet"><worksheetSource ref="{source.ref}" sheet={_attr(source.name)}/>'
+            f"</cacheSource>",
+            f'<cacheFields count="{len(fields)}">',
+        ]
+        definition += [f.xml() for f in fields]
+        definition.append("</cacheFields></pivotCacheDefinition>")
+        self._zip.writestr(f"xl/pivotCache/pivotCacheDefinition{cache_id}.xml", "".join(definition))
+        self._zip.writestr(f"xl/pivotCache/_rels/pivotCacheDefinition{cache_id}.xml.rels", _rels_xml([
+            ("rId1", "pivotCacheRecords", f"pivotCacheRecords{cache_id}.xml")
+        ]))
+
+        part = f"xl/pivotCache/pivotCacheRecords{cache_id}.xml"
+        with trace.span("pivot cache", "xlsx") as span, self._zip.open(part, "w", force_zip64=True) as fh:
+            fh.write((f'{_XML_HEAD}<pivotCacheRecords xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}" '
+                      f'count="{len(df)}">').encode("utf-8"))
+            for start in range(0, len(df), _ROW_CHUNK):
+                stop = min(start + _ROW_CHUNK, len(df))
+                self._tick(stop - start)
+                columns = []
+                for i, f in enumerate(fields):
+                    if f.shared:
+                        columns.append([f'<x v="{c}"/>' for c in f.codes[start:stop]])
+                    else:
+                        columns.append([_record_value(v) for v in df.iloc[start:stop, i].tolist()])
+                fh.write("".join("<r>" + "".join(row) + "</r>" for row in zip(*columns)).encode("utf-8"))
+            fh.write(b"</pivotCacheRecords>")
+            span.rows = len(df)
+        span.bytes = self._zip.getinfo(part).compress_size
+
+
+def _check_fields(spec, df):
+    """Return the axis fields of ``spec``; raise if any field is not in ``df``."""
+    axis = list(spec.rows) + list(spec.columns) + list(spec.filters)
+    missing = [f for f in axis + [spec.value_field] if f not in df.columns]
+    if missing:
+        raise KeyError(f"피벗 필드를 찾을 수 없습니다: {', '.join(missing)}")
+    return axis
+
+
+def display_width(text):
+    """Width of ``text`` in Excel character units; wide (Hangul/CJK) characters count 2."""
+    return sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in str(text))
+
+
+def _cols_xml(header):
+    cols = "".join(
+        f'<col min="{i}" max="{i}" width="{min(display_width(h) + 2, 80)}" customWidth="1"/>'
+        for i, h in enumerate(header, start=1)
+    )
+    return f"<cols>{cols}</cols>"
+
+
+def _rels_xml(rels):
+    body = "".join(f'<Relationship Id="{rid}" Type="{_NS_REL}/{kind}" Target="{target}"/>'
+                   for rid, kind, target in rels)
+    return f'{_XML_HEAD}<Relationships xmlns="{_NS_PKG_REL}">{body}</Relationships>'
+
+
+def pivot_totals(frame, rows, columns, value):
+    """Sum ``value`` over the row/column hierarchy the way a pivot shows it.
+
+    Returns ``(col_keys, entries, grand)`` where ``entries`` is a list of
+    ``(depth, item, values)`` in display order, with subtotals first.
+    """
+    totals = hierarchy_totals(frame, rows, value, columns)
+    return totals.col_keys, totals.entries, totals.grand
+
+
+def _summary_pages(df, filters):
+    """Page fields for a static summary, matched the way ``index_of`` would."""
+    pages = []
+    for name, current in filters.items():
+        if current is None:
+            pages.append((name, None, None))
+            continue
+        column = df[name]
+        mask = column == current
+        if not mask.any():
+            mask = column.astype(str) == str(current)
+        if mask.any():
+            pages.append((name, column[mask].iloc[0], 0))
+        else:
+            pages.append((name, None, None))
+    return pages
+
+
+def _render_pivot(df, spec, pages, styles, grid, static=False):
+    """Lay the pivot out into ``grid`` as Excel's compact form would show it.
+
+    With ``static`` the header, subtotal and grand total rows are bolded,
+    since there is no pivot style to do it.
+    """
+    top, left = split_cell(spec.location)
+    if pages:
+        # Excel keeps one blank row between the page fields and the table.
+        top = max(top, len(pages) + 2)
+        page_top = top - len(pages) - 1
+        for i, (name, current, _) in enumerate(pages):
+            grid[(page_top + i, left)] = (name, styles.bold if static else 0)
+            grid[(page_top + i, left + 1)] = (ALL_ITEMS if current is None else _label(current), 0)
+
+    frame = df
+    for name, current, item in pages:
+        if item is not None:
+            frame = frame[frame[name] == current]
+
+    col_keys, entries, grand = pivot_totals(frame, spec.rows, spec.columns, spec.value_field)
+    header = styles.bold if static else 0
+    bold_font = 2 if static else 0
+
+    r = top
+    if spec.columns:
+        grid[(r, left)] = (spec.caption, header)
+        grid[(r, left + 1)] = (COL_LABEL, header)
+        r += 1
+        grid[(r, left)] = (ROW_LABEL, header)
+        for j, ck in enumerate(col_keys):
+            label = _label(ck[0]) if len(ck) == 1 else " / ".join(str(_label(v)) for v in ck)
+            grid[(r, left + 1 + j)] = (label, header)
+        grid[(r, left + 1 + len(col_keys))] = (GRAND_TOTAL, header)
+    else:
+        grid[(r, left)] = (ROW_LABEL, header)
+        grid[(r, left + 1)] = (spec.caption, header)
+
+    def put(label, font_id, indent, values):
+        nonlocal r
+        r += 1
+        grid[(r, left)] = (label, styles.get(font_id=font_id, indent=indent))
+        number_style = styles.get(spec.number_format, font_id=font_id)
+        for j, v in enumerate(values):
+            if v is not None:
+                grid[(r, left + 1 + j)] = (v, number_style)
+
+    leaf = len(spec.rows) - 1
+    for depth, item, values in entries:
+        put(_label(item), bold_font if depth < leaf else 0, depth, values)
+    put(GRAND_TOTAL, bold_font, 0, grand)
+
+    width = len(grand)
+    return {
+        "ref": f"{column_letter(left)}{top}:{column_letter(left + width)}{r}",
+        "first_data_row": 2 if spec.columns else 1,
+        "pages": len(pages),
+    }
+
+
+def _pivot_table_xml(spec, cache_id, fields, by_name, pages, layout, num_fmt_id):
+    axis = {name: "axisRow" for name in spec.rows}
+    axis.update({name: "axisCol" for name in spec.columns})
+    axis.update({name: "axisPage" for name, _, _ in pages})
+
+    pivot_fields = []
+    for f in fields:
+        if f.name in axis:
+            items = "".join(f'<item x="{i}"/>' for i in range(len(f.items)))
+            pivot_fields.append(
+                f'<pivotField axis="{axis[f.name]}" showAll="0"><items count="{len(f.items) + 1}">'
+                f'{items}<item t="default"/></items></pivotField>'
+            )
+        elif f.name == spec.value_field:
+            pivot_fields.append('<pivotField dataField="1" showAll="0"/>')
+        else:
+            pivot_fields.append('<pivotField showAll="0"/>')
+
+    location = (f'<location ref="{layout["ref"]}" firstHeaderRow="1" '
+                f'firstDataRow="{layout["first_data_row"]}" firstDataCol="1"')
+    if layout["pages"]:
+        location += f' rowPageCount="{layout["pages"]}" colPageCount="1"'
+    out = [
+        _XML_HEAD,
+        f'<pivotTableDefinition xmlns="{_NS_MAIN}" name={_attr(spec.name)} cacheId="{cache_id}" '
+        'applyNumberFormats="0" applyBorderFormats="0" applyFontFormats="0" applyPatternFormats="0" '
+        'applyAlignmentFormats="0" applyWidthHeightFormats="1" dataCaption="값" updatedVersion="6" '
+        'minRefreshableVersion="3" useAutoFormatting="1" itemPrintTitles="1" createdVersion="6" '
+        'indent="0" outline="1" outlineData="1" multipleFieldFilters="0">',
+        location + "/>",
+        f'<pivotFields count="{len(fields)}">{"".join(pivot_fields)}</pivotFields>',
+        f'<rowFields count="{len(spec.rows)}">'
+        + "".join(f'<field x="{by_name[n]}"/>' for n in spec.rows) + "</rowFields>",
+    ]
+    if spec.columns:
+        out.append(f'<colFields count="{len(spec.columns)}">'
+                   + "".join(f'<field x="{by_name[n]}"/>' for n in spec.columns) + "</colFields>")
+    if pages:
+        page_fields = []
+        for name, _, item in pages:
+            selected = "" if item is None else f' item="{item}"'
+            page_fields.append(f'<pageField fld="{by_name[name]}"{selected} hier="-1"/>')
+        out.append(f'<pageFields count="{len(pages)}">{"".join(page_fields)}</pageFields>')
+    out.append(
+        f'<dataFields count="1"><dataField name={_attr(spec.caption)} fld="{by_name[spec.value_field]}" '
+        f'baseField="0" baseItem="0" numFmtId="{num_fmt_id}"/></dataFields>'
+        f'<pivotTableStyleInfo name={_attr(spec.style)} showRowHeaders="1" showColHeaders="1" '
+        'showRowStripes="0" showColStripes="0" showLastColumn="1"/></pivotTableDefinition>'
+    )
+    return "".join(out)
+
+
+def row_fraction(progress, total):
+    """``on_rows`` callback turning rows written into ``progress(fraction)``."""
+    if progress is None:
+        return None
+    return lambda rows: progress(min(1.0, rows / total) if total else 1.0)
+
+
+def write_pivot_report(path, df, sheet_name, pivot_sheet_name, spec, should_stop=None, progress=None):
+    """Data sheet plus one pivot sheet: the layout every BillingWorker report uses.
+
+    ``progress`` receives the fraction written, data sheet and pivot cache
+    counting alike.
+    """
+    with XlsxWorkbook(path, should_stop, row_fraction(progress, 2 * len(df))) as wb:
+        source = wb.add_dataframe(sheet_name, df)
+        wb.add_pivot_sheet(pivot_sheet_name, [PivotTable(spec, df, source)])
+    return path
+
+
+def write_frames(path, sheets, should_stop=None, progress=None, **options):
+    """Write several frames to one workbook, one sheet each, streaming every sheet.
+
+    ``sheets`` maps a sheet name to its frame; ``options`` go to
+    :meth:`XlsxWorkbook.add_sheet`.
+    """
+    total = sum(len(df) for df in sheets.values())
+    with XlsxWorkbook(path, should_stop, row_fraction(progress, total)) as wb:
+        for name, df in sheets.items():
+            wb.add_dataframe(name, df, **options)
+    return path
+
+
+def write_summary_report(path, df, sheet_name, summary_sheet_name, spec, should_stop=None, progress=None):
+    """Data sheet plus a static summary of ``spec`` in place of the pivot."""
+    with XlsxWorkbook(path, should_stop, row_fraction(progress, len(df))) as wb:
+        wb.add_dataframe(sheet_name, df)
+        wb.add_summary_sheet(summary_sheet_name, [PivotTable(spec, df, None)])
+    return path
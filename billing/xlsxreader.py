@@ -0,0 +1,301 @@
+"""Fast reader of .xlsx sheets into columnar frames.
+
+``pd.read_excel`` with openpyxl builds a cell object for every value of
+every column and then runs the rows through pandas' text parser.
+:func:`read_xlsx` instead
+
+* hands the workbook to the Rust calamine engine when ``python-calamine``
+  is installed, or
+* streams the sheet's XML straight out of the zip container, converting
+  only the cells of the projected columns and collecting each column in its
+  own list; the frame is built from those lists, with ``dtype`` applied per
+  column, once the sheet ends.
+
+Columns are chosen at read time, by name (``usecols``) or as the header
+range ``df.loc[:, first:last]`` would give (``project``). Anything else
+``pd.read_excel`` understands goes to openpyxl as before.
+"""
+import datetime
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+
+import pandas as pd
+
+from billing import trace
+
+try:
+    import python_calamine  # noqa: F401
+    HAVE_CALAMINE = True
+except ImportError:
+    HAVE_CALAMINE = False
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+_ROW, _V, _IS, _T, _R = (_MAIN + tag for tag in ("row", "v", "is", "t", "r"))
+_SHEET_DATA = _MAIN + "sheetData"
+
+# pandas 가 기본으로 결측값으로 보는 문자열 (read_excel 과 같은 결과가 나오도록)
+_NA_STRINGS = frozenset(["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+                         "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"])
+# 날짜 서식인 기본 numFmtId
+_DATE_FORMAT_IDS = frozenset(range(14, 23)) | {45, 46, 47}
+# 따옴표 안 글자, 이스케이프된 글자, [Red] 같은 대괄호 구역은 서식 판정에서 뺀다
+_FORMAT_LITERALS = re.compile(r'"[^"]*"|\\.|\[[^\]]*\]')
+_DATE_TOKENS = re.compile(r"[dmyhs]", re.IGNORECASE)
+_EPOCH = datetime.datetime(1899, 12, 30)
+_EPOCH_1904 = datetime.datetime(1904, 1, 1)
+
+
+def read_xlsx(source, sheet_name=0, usecols=None, dtype=None, project=None, engine=None, **kwargs):
+    """Read one sheet of ``source`` (a path or binary file) into a frame.
+
+    ``engine`` picks the reader: ``"calamine"``, ``"stream"`` (the native
+    XML stream) or ``"openpyxl"``; by default calamine where installed,
+    otherwise the stream. Options the stream doesn't handle (``header``,
+    ``skiprows``, several sheets, ...) fall back to openpyxl.
+    ``project=(first, last)`` keeps the header's columns from ``first`` to
+    ``last``; ``usecols`` names further columns to keep.
+    """
+    if engine is None:
+        engine = "calamine" if HAVE_CALAMINE else "stream"
+    if engine == "stream" and (kwargs or not isinstance(sheet_name, (str, int))
+                               or (usecols is not None and not isinstance(usecols, (list, tuple)))):
+        engine = "openpyxl"
+    with trace.span("xlsx read", "io", engine=engine):
+        if engine == "stream":
+            return _read_stream(source, sheet_name, usecols, dtype, project)
+        if project is not None:
+            usecols = projection(_header(source, sheet_name, engine), project, usecols)
+        return pd.read_excel(source, sheet_name=sheet_name, usecols=usecols, dtype=dtype, engine=engine,
+                             **kwargs)
+
+
+def projection(header, project=None, usecols=None):
+    """The header's columns from ``project[0]`` to ``project[1]`` plus ``usecols``, in sheet order."""
+    header = list(header)
+    keep = set(usecols or ())
+    if project is not None:
+        first, last = project
+        keep.update(header[header.index(first):header.index(last) + 1])
+    missing = keep.difference(header)
+    if missing:
+        raise ValueError(f"시트에 없는 열: {', '.join(map(str, sorted(missing, key=str)))}")
+    return [c for c in header if c in keep]
+
+
+def _header(source, sheet_name, engine):
+    header = pd.read_excel(source, sheet_name=sheet_name, nrows=0, engine=engine).columns
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return header
+
+
+def column_index(ref):
+    """0-based column of a cell reference (``"AB12"`` -> 27)."""
+    col = 0
+    for ch in ref:
+        if ch <= "9":
+            break
+        col = col * 26 + ord(ch) - 64
+    return col - 1
+
+
+def _resolve(base, target):
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), target))
+
+
+def _rels(zf, part):
+    path = posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+    if path not in zf.namelist():
+        return {}
+    root = ET.fromstring(zf.read(path))
+    return {rel.get("Id"): (rel.get("Type"), _resolve(part, rel.get("Target")))
+            for rel in root.iter(_PKG_REL + "Relationship")}
+
+
+def _rich_text(el):
+    """Text of an ``<si>`` / ``<is>``: plain ``<t>`` or rich-text runs, without phonetic runs."""
+    parts = []
+    for child in el:
+        if child.tag == _T:
+            parts.append(child.text or "")
+        elif child.tag == _R:
+            t = child.find(_T)
+            if t is not None:
+                parts.append(t.text or "")
+    return "".join(parts)
+
+
+def is_date_format(code):
+    return bool(_DATE_TOKENS.search(_FORMAT_LITERALS.sub("", code)))
+
+
+class _Workbook:
+    """The parts of a workbook the sheet stream needs: sheets, shared strings, date styles."""
+
+    def __init__(self, zf):
+        self.zf = zf
+        package = dict(_rels(zf, "").values())
+        self.part = package.get(_OFFICE_DOCUMENT, "xl/workbook.xml")
+        rels = _rels(zf, self.part)
+        root = ET.fromstring(zf.read(self.part))
+        pr = root.find(_MAIN + "workbookPr")
+        self.epoch = _EPOCH_1904 if pr is not None and pr.get("date1904") in ("1", "true") else _EPOCH
+        self.sheets = [(s.get("name"), rels[s.get(_REL + "id")][1]) for s in root.iter(_MAIN + "sheet")]
+        by_type = {t.rsplit("/", 1)[-1]: target for t, target in rels.values()}
+        self.strings = self._strings(by_type.get("sharedStrings"))
+        self.date_styles = self._date_styles(by_type.get("styles"))
+
+    def sheet(self, sheet_name):
+        if isinstance(sheet_name, int):
+            if not 0 <= sheet_name < len(self.sheets):
+                raise ValueError(f"시트 {sheet_name} 번이 없습니다.")
+            return self.sheets[sheet_name][1]
+        for name, part in self.sheets:
+            if name == sheet_name:
+                return part
+        raise ValueError(f"'{sheet_name}' 시트가 없습니다.")
+
+    def _strings(self, part):
+        if not part or part not in self.zf.namelist():
+            return []
+        strings = []
+        with self.zf.open(part) as fh:
+            for _, el in ET.iterparse(fh):
+                if el.tag == _MAIN + "si":
+                    strings.append(_rich_text(el))
+                    el.clear()
+        return strings
+
+    def _date_styles(self, part):
+        if not part or part not in self.zf.namelist():
+            return frozenset()
+        root = ET.fromstring(self.zf.read(part))
+        custom = {int(f.get("numFmtId")): f.get("formatCode", "") for f in root.iter(_MAIN + "numFmt")}
+        xfs = root.find(_MAIN + "cellXfs")
+        dates = set()
+        for index, xf in enumerate(xfs if xfs is not None else ()):
+            fmt = int(xf.get("numFmtId", 0))
+            if fmt in _DATE_FORMAT_IDS or (fmt in custom and is_date_format(custom[fmt])):
+                dates.add(index)
+        return frozenset(dates)
+
+
+def _number(text):
+    value = float(text)
+    # openpyxl 경로와 같이 정수 값은 int 로
+    return int(value) if value.is_integer() else value
+
+
+def _read_stream(source, sheet_name, usecols, dtype, project):
+    with zipfile.ZipFile(source) as zf:
+        book = _Workbook(zf)
+        with zf.open(book.sheet(sheet_name)) as fh:
+            # iterparse 가 16 KB 씩 읽으므로 압축된 원본도 그만큼씩 읽혀 진행률이 촘촘하다
+            return _parse_sheet(fh, book, usecols, dtype, project)
+
+
+def _parse_sheet(fh, book, usecols, dtype, project):
+    strings, date_styles, epoch = book.strings, book.date_styles, book.epoch
+
+    def value(c):
+        t = c.get("t")
+        if t == "inlineStr":
+            el = c.find(_IS)
+            text = _rich_text(el) if el is not None else ""
+            return None if text in _NA_STRINGS else text
+        v = c.find(_V)
+        if v is None or v.text is None:
+            return None
+        if t is None or t == "n":
+            s = c.get("s")
+            if s is not None and int(s) in date_styles:
+                return epoch + datetime.timedelta(days=float(v.text))
+            return _number(v.text)
+        if t == "s":
+            text = strings[int(v.text)]
+        elif t == "str":
+            text = v.text
+        elif t == "b":
+            return v.text == "1"
+        elif t == "d":
+            return datetime.datetime.fromisoformat(v.text)
+        else:
+            # 오류 값 (#N/A, #DIV/0! ...)
+            return None
+        return None if text in _NA_STRINGS else text
+
+    header = None
+    wanted = {}
+    columns = []
+    rows = 0
+    sheet_data = None
+    for event, el in ET.iterparse(fh, events=("start", "end")):
+        if event == "start":
+            if el.tag == _SHEET_DATA:
+                sheet_data = el
+            continue
+        if el.tag != _ROW:
+            continue
+        cells = [(column_index(c.get("r")) if c.get("r") else i, c) for i, c in enumerate(el)]
+        if header is None:
+            header = _header_names(cells, value)
+            names = projection(header, project, usecols) if (project or usecols) else header
+            positions = {name: i for i, name in enumerate(header)}
+            wanted = {positions[name]: k for k, name in enumerate(names)}
+            columns = [[] for _ in names]
+        else:
+            record = [None] * len(columns)
+            filled = False
+            for col, c in cells:
+                k = wanted.get(col)
+                if k is not None:
+                    record[k] = value(c)
+                    filled = filled or record[k] is not None
+            # 빈 줄은 read_excel 처럼 건너뛴다
+            if filled:
+                for k, v in enumerate(record):
+                    columns[k].append(v)
+                rows += 1
+        if sheet_data is not None:
+            sheet_data.clear()
+        else:
+            el.clear()
+
+    if header is None:
+        return pd.DataFrame()
+    dtype = dtype or {}
+    return pd.DataFrame({name: _column(values, dtype.get(name) if isinstance(dtype, dict) else dtype)
+                         for name, values in zip(names, columns)}, index=pd.RangeIndex(rows))
+
+
+def _header_names(cells, value):
+    """Header row names as read_excel gives them: ``Unnamed: n`` for blanks, ``.1`` for repeats."""
+    last = max((col for col, _ in cells), default=-1)
+    raw = [None] * (last + 1)
+    for col, c in cells:
+        raw[col] = value(c)
+    names, seen = [], {}
+    for i, name in enumerate(raw):
+        if name is None:
+            name = f"Unnamed: {i}"
+        base = name
+        while name in seen:
+            seen[base] += 1
+            name = f"{base}.{seen[base]}"
+        seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _column(values, dtype=None):
+    if dtype is None and all(v is None for v in values):
+        # 값이 하나도 없는 열은 read_excel 처럼 NaN (float64)
+        dtype = "float64"
+    return pd.Series(values, dtype=dtype)
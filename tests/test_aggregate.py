@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from billing.aggregate import hierarchy_totals, ordered_codes
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 500
+    return pd.DataFrame({
+        "A": rng.choice(["b", "a", "c", None], n),
+        "B": rng.choice([3, 1, 2], n),
+        "C": rng.choice(["x", "y"], n),
+        "M": rng.choice(["05", "06", "07"], n),
+        "V": rng.normal(100, 50, n).round(2),
+    })
+
+
+def _walk(totals):
+    """``{path: values}`` from the pre-order entries."""
+    out, path = {}, []
+    for depth, item, values in totals.entries:
+        path = path[:depth] + [item]
+        out[tuple(path)] = values
+    assert len(out) == len(totals.entries)
+    return out
+
+
+def _key(values):
+    return tuple(None if pd.isna(v) else v for v in values)
+
+
+def test_ordered_codes_puts_blanks_last():
+    codes, items = ordered_codes(pd.Series(["b", None, "a", "b"]))
+    assert items == ["a", "b", None]
+    assert codes.tolist() == [1, 2, 0, 1]
+
+
+def test_rows_only_match_groupby(frame):
+    rows = ["A", "B", "C"]
+    totals = hierarchy_totals(frame, rows, "V")
+    walked = _walk(totals)
+    for depth in range(1, len(rows) + 1):
+        sums = frame.groupby(rows[:depth], dropna=False)["V"].sum()
+        for key, total in sums.items():
+            key = _key(key if isinstance(key, tuple) else (key,))
+            assert walked[key] == [pytest.approx(total)]
+    assert len(walked) == sum(frame.groupby(rows[:d], dropna=False).ngroups for d in range(1, 4))
+    assert totals.grand == [pytest.approx(frame["V"].sum())]
+
+
+def test_entries_are_in_pivot_order(frame):
+    walked = list(_walk(hierarchy_totals(frame, ["A", "B"], "V")))
+    top = [key[0] for key in walked if len(key) == 1]
+    assert top == ["a", "b", "c", None]
+    # 소계 다음에 그 항목의 하위 항목이 온다
+    assert walked[:4] == [("a",), ("a", 1), ("a", 2), ("a", 3)]
+
+
+def test_column_fields_match_pivot_table(frame):
+    rows, columns = ["A", "B"], ["M", "C"]
+    totals = hierarchy_totals(frame, rows, "V", columns)
+    keyed = frame.assign(A=frame["A"].fillna("(blank)"))
+    table = keyed.pivot_table(index=rows, columns=columns, values="V", aggfunc="sum")
+    assert totals.col_keys == list(table.columns)
+
+    walked = _walk(totals)
+    for (a, b), values in table.iterrows():
+        expected = [None if np.isnan(v) else pytest.approx(v) for v in values]
+        expected.append(pytest.approx(np.nansum(values)))
+        assert walked[(None if a == "(blank)" else a, b)] == expected
+    assert totals.grand[:-1] == [pytest.approx(v) for v in table.sum()]
+    assert totals.grand[-1] == pytest.approx(frame["V"].sum())
+
+
+def test_non_numeric_values_count_as_zero():
+    df = pd.DataFrame({"A": ["a", "a", "b"], "V": [1.5, "n/a", None]})
+    totals = hierarchy_totals(df, ["A"], "V")
+    assert [(item, values) for _, item, values in totals.entries] == [("a", [1.5]), ("b", [0.0])]
+    assert totals.grand == [1.5]
+
+
+def test_empty_frame():
+    df = pd.DataFrame({"A": pd.Series([], dtype=object), "V": pd.Series([], dtype=float)})
+    totals = hierarchy_totals(df, ["A"], "V")
+    assert totals.entries == []
+    assert totals.grand == [0.0]
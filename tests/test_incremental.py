@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import csp_export
+from billing.incremental import DailyStore, usage_dates
+
+CUSTOMERS = ["CustomerA", "CustomerB", "CustomerC"]
+
+
+@pytest.fixture
+def export():
+    return csp_export(3000, customers=8, seed=1)
+
+
+def _write(df, path):
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def _recomputed(tmp_path, path, customers):
+    store = DailyStore(str(tmp_path / "full"))
+    store.ingest(path, customers)
+    return store
+
+
+def _assert_previews_match(store, full, month):
+    for customer in CUSTOMERS:
+        got, want = store.preview(customer, month), full.preview(customer, month)
+        assert len(got) == len(want), customer
+        if len(want):
+            pd.testing.assert_frame_equal(got.sort_index(), want.sort_index(), check_dtype=False,
+                                          check_exact=False, rtol=1e-9, obj=customer)
+
+
+@pytest.mark.parametrize("customers", [CUSTOMERS, None], ids=["csp-filtered", "all-profiles"])
+def test_reingest_removes_keys_the_file_no_longer_lists(tmp_path, export, customers):
+    store = DailyStore(str(tmp_path / "store"))
+    first = store.ingest(_write(export, tmp_path / "day1.csv"), customers)
+    month = first.month
+
+    dates = usage_dates(export["UsageDate"])
+    a = export[export["CustomerName"] == "CustomerA"]
+    b_day = dates[export["CustomerName"] == "CustomerB"].iloc[0]
+    revised = export.drop(index=a.index[:1])
+    # CustomerB 는 이 날짜에 행이 없어지고 (다른 고객사 행은 남는다), CustomerC 는 행이 모두 없어진다
+    revised = revised[~((revised["CustomerName"] == "CustomerB") & (usage_dates(revised["UsageDate"]) == b_day))]
+    revised = revised[revised["CustomerName"] != "CustomerC"]
+    assert (usage_dates(revised["UsageDate"]) == b_day).any()
+    path = _write(revised, tmp_path / "day2.csv")
+
+    second = store.ingest(path, customers)
+    assert second.month == month
+    assert second.customers["CustomerA"].removed >= 1
+    assert second.customers["CustomerB"].removed >= 1
+    assert second.customers["CustomerC"].rows == 0
+
+    _assert_previews_match(store, _recomputed(tmp_path, path, customers), month)
+    for customer in CUSTOMERS:
+        rows = store.rows(customer, month)
+        assert len(rows) == (revised["CustomerName"] == customer).sum()
+
+
+def test_single_day_file_keeps_other_dates(tmp_path, export):
+    store = DailyStore(str(tmp_path / "store"))
+    month = store.ingest(_write(export, tmp_path / "month.csv"), CUSTOMERS).month
+    before = {c: len(store.rows(c, month)) for c in CUSTOMERS}
+
+    dates = usage_dates(export["UsageDate"])
+    day = export[dates == dates.max()]
+    store.ingest(_write(day.assign(UnitPrice=day["UnitPrice"] + 1), tmp_path / "day.csv"), CUSTOMERS)
+    assert {c: len(store.rows(c, month)) for c in CUSTOMERS} == before
+    _assert_previews_match(store, _recomputed(tmp_path, str(tmp_path / "month.csv"), CUSTOMERS), month)
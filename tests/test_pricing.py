@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from billing.pricing import Markup, Rounding, Tier, apply_markups, column_scale
+
+
+def test_markup_matches_float_path():
+    df = pd.DataFrame({"x": [0.123456, 10.5, 1234.0001, -3.25, 0.0]})
+    out = apply_markups(df, [Markup("x", 1.15)])
+    np.testing.assert_allclose(out["x"], (df["x"] * 1.15).round(6), atol=5e-7)
+
+
+def test_six_decimal_prices_keep_their_precision():
+    assert column_scale(np.array([0.123456, 1.5])) == 10 ** 6
+    out = apply_markups(pd.DataFrame({"x": [0.123456]}), [Markup("x", 1.07)])
+    assert out["x"][0] == pytest.approx(0.132098, abs=5e-7)
+
+
+def test_target_tiers_and_rounding():
+    df = pd.DataFrame({"x": [50.0, 150.0, 1000.0]})
+    markup = Markup("x", 1.1, target="y", tiers=[Tier(100, 1.3), Tier(500, 1.2)], rounding=Rounding(10))
+    out = apply_markups(df, [markup])
+    assert list(out.columns) == ["y", "x"]
+    assert out["y"].tolist() == [70.0, 180.0, 1100.0]
+    assert out["x"].tolist() == df["x"].tolist()
+
+
+def test_non_numeric_cells_are_left_alone():
+    df = pd.DataFrame({"x": [100, "합계", None, 2.5]})
+    out = apply_markups(df, [Markup("x", 1.1)])
+    assert out["x"].tolist()[:2] == [110.0, "합계"]
+    assert pd.isna(out["x"][2])
+    assert out["x"][3] == pytest.approx(2.75)
+
+
+def test_amounts_near_the_int64_bound_stay_exact():
+    # SCALE 에서 1.15 배율로 약 800억 원까지
+    amount = 80_000_000_000.0
+    out = apply_markups(pd.DataFrame({"x": [amount, 5.0]}), [Markup("x", 1.15)])
+    assert out["x"].tolist() == [amount * 1.15, 5.75]
+
+
+@pytest.mark.parametrize("amount", [1e12, 90_000_000_000.0])
+def test_amounts_above_the_int64_bound_raise(amount):
+    with pytest.raises(OverflowError):
+        apply_markups(pd.DataFrame({"x": [amount, 5.0]}), [Markup("x", 1.15)])
+
+
+@pytest.mark.parametrize("amount", [np.inf, -np.inf])
+def test_infinite_amounts_raise(amount):
+    with pytest.raises(ValueError):
+        apply_markups(pd.DataFrame({"x": [amount, 5.0]}), [Markup("x", 1.15)])
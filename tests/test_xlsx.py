@@ -0,0 +1,98 @@
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+from billing.xlsx import BLANK_ITEM, GRAND_TOTAL, PivotSpec, write_pivot_report
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "Cat": ["b", "a", "a", "b", "a", None, "a"],
+        "Sub": ["x", "y", "x", "x", "x", "z", "y"],
+        "Mon": ["05", "06", "05", "06", "06", "05", "05"],
+        "Cust": ["C1", "C1", "C2", "C1", "C1", "C1", "C1"],
+        "Cost": [1.5, 2.0, 3.0, 4.0, 5.0, 6.0, 0.25],
+    })
+
+
+def _pivot(path):
+    ws = openpyxl.load_workbook(path)["Pivot"]
+    return ws, ws._pivots[0]
+
+
+def _rendered(ws, pivot, header_rows):
+    """``{(cat, sub): [values...]}`` from the pre-rendered table, keyed by each row's path."""
+    cells = list(ws[pivot.location.ref])
+    out, path = {}, []
+    for row in cells[header_rows:]:
+        label = row[0].value
+        if label == GRAND_TOTAL:
+            out[()] = [c.value for c in row[1:]]
+            continue
+        depth = int(row[0].alignment.indent)
+        path = path[:depth] + [label]
+        out[tuple(path)] = [c.value for c in row[1:]]
+    return out
+
+
+def _expected(df, columns):
+    df = df.assign(Cat=df["Cat"].fillna(BLANK_ITEM))
+    out = {}
+    for index in (["Cat"], ["Cat", "Sub"]):
+        table = df.pivot_table(index=index, columns=columns, values="Cost", aggfunc="sum", margins=True,
+                               margins_name="__all__")
+        for key, values in table.iterrows():
+            key = key if isinstance(key, tuple) else (key,)
+            if key[0] == "__all__":
+                key = ()
+            elif "__all__" in key:
+                continue
+            out[key] = [None if np.isnan(v) else v for v in values]
+    return out
+
+
+def test_pivot_report_with_row_column_and_page_fields(tmp_path, frame):
+    path = tmp_path / "pivot.xlsx"
+    spec = PivotSpec("P", ["Cat", "Sub"], "Cost", columns=["Mon"], filters={"Cust": "C1"})
+    write_pivot_report(str(path), frame, "Data", "Pivot", spec)
+    ws, pivot = _pivot(path)
+
+    cache = pivot.cache
+    assert cache.recordCount == len(frame)
+    assert len(cache.records.r) == len(frame)
+    items = {f.name: [getattr(i, "v", None) for i in f.sharedItems._fields] for f in cache.cacheFields}
+    assert items == {"Cat": ["a", "b", None], "Sub": ["x", "y", "z"], "Mon": ["05", "06"],
+                     "Cust": ["C1", "C2"], "Cost": []}
+
+    assert [pf.axis for pf in pivot.pivotFields] == ["axisRow", "axisRow", "axisCol", "axisPage", None]
+    assert [[i.x for i in pf.items] for pf in pivot.pivotFields[:4]] == [
+        [0, 1, 2, None], [0, 1, 2, None], [0, 1, None], [0, 1, None]]
+    assert [f.x for f in pivot.rowFields] == [0, 1]
+    assert [f.x for f in pivot.colFields] == [2]
+    assert [(d.fld, d.name) for d in pivot.dataFields] == [(4, "합계 Cost")]
+
+    # Cust = C1 이 선택된 페이지 필드
+    assert [(pf.fld, pf.item) for pf in pivot.pageFields] == [(3, 0)]
+    assert (ws["A1"].value, ws["B1"].value) == ("Cust", "C1")
+
+    # 페이지 필드 1줄 + 빈 줄 뒤 A3 부터: 머리글 2줄, 항목 7줄, 총합계 1줄
+    assert pivot.location.ref == "A3:D12"
+    assert pivot.location.rowPageCount == 1
+    selected = frame[frame["Cust"] == "C1"]
+    assert _rendered(ws, pivot, 2) == _expected(selected, "Mon")
+
+
+def test_pivot_report_with_rows_only(tmp_path, frame):
+    path = tmp_path / "pivot.xlsx"
+    spec = PivotSpec("P", ["Cat", "Sub"], "Cost")
+    write_pivot_report(str(path), frame, "Data", "Pivot", spec)
+    ws, pivot = _pivot(path)
+
+    assert pivot.location.ref == "A3:B11"
+    assert not pivot.pageFields
+    rendered = _rendered(ws, pivot, 1)
+    expected = {key: [values[-1]] for key, values in _expected(frame.assign(Mon="all"), "Mon").items()}
+    assert rendered == expected
+    assert rendered[()] == [pytest.approx(frame["Cost"].sum())]